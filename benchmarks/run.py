@@ -0,0 +1,349 @@
+"""
+Benchmark suite with regression gates.
+
+Times the backtester, strategy analysis, DataFrame conversion and the live
+bot loop on deterministic synthetic candles, records throughput and peak
+memory, and compares the results with a stored baseline. Cold imports of
+the entry-point modules are checked against fixed time budgets.
+
+Usage:
+    python -m benchmarks.run                    # compare with benchmarks/baseline.json
+    python -m benchmarks.run --sizes 1k,100k    # subset of sizes
+    python -m benchmarks.run --update-baseline  # store new baseline numbers
+    python -m benchmarks.run --benchmarks imports  # only the import budgets
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import logging
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+
+from src.backtesting import Backtester
+from src.bot import TradingBot
+from src.data import OHLCVBuffer
+from src.data.synthetic import synthetic_ohlcv
+from src.exchange import ExchangeConnector
+from src.strategies.sma_strategy import SimpleMovingAverage
+
+BASELINE_PATH = Path(__file__).parent / 'baseline.json'
+SIZES = {'1k': 1_000, '100k': 100_000, '1M': 1_000_000}
+
+# Allowed slowdown and memory growth relative to the baseline
+TIME_THRESHOLD = 0.25
+MEMORY_THRESHOLD = 0.25
+
+ANALYZE_CALLS = 10_000
+MAX_BOT_CYCLES = 10_000
+
+# Seconds a fresh interpreter may spend importing each entry-point module
+IMPORT_BUDGETS = {
+    'src.bot': 0.5,
+    'src.backtesting': 0.3,
+    'src.optimization.walk_forward': 0.4,
+}
+# Heavy dependencies that must only load when they are used
+LAZY_IMPORTS = ('ccxt', 'pandas', 'aiohttp')
+
+
+class ReplayExchange:
+    """Mock ccxt exchange revealing one more candle of a series per bot cycle."""
+
+    rateLimit = 0
+    enableRateLimit = False
+
+    def __init__(self, candles: OHLCVBuffer):
+        self.candles = candles
+        self.visible = 0
+
+    async def fetch_ohlcv(self, symbol, timeframe='1m', since=None, limit=None):
+        stop = self.visible
+        if since is None:
+            start = max(stop - limit, 0)
+        else:
+            start = int(np.searchsorted(self.candles.timestamp[:stop], since, side='left'))
+            stop = min(stop, start + limit)
+        return self.candles[start:stop].to_list()
+
+    async def fetch_ticker(self, symbol):
+        return {'symbol': symbol, 'last': float(self.candles.close[self.visible - 1])}
+
+    async def create_market_order(self, symbol, side, amount):
+        return {'id': str(self.visible), 'symbol': symbol, 'side': side, 'filled': amount, 'status': 'closed'}
+
+    async def close(self):
+        pass
+
+
+class ReplayClock:
+    """Clock placed just after the close of the newest visible candle."""
+
+    def __init__(self, exchange: ReplayExchange, timeframe_ms: int):
+        self.exchange = exchange
+        self.timeframe_ms = timeframe_ms
+
+    def time(self) -> float:
+        last = int(self.exchange.candles.timestamp[self.exchange.visible - 1])
+        return (last + self.timeframe_ms) / 1000 + 0.5
+
+    async def sleep(self, seconds: float) -> None:
+        pass
+
+
+def bench_backtest_run(candles: OHLCVBuffer) -> int:
+    """Candle-by-candle Backtester.run over the whole series."""
+    asyncio.run(Backtester().run(SimpleMovingAverage(), candles))
+    return len(candles)
+
+
+def bench_backtest_run_vectorized(candles: OHLCVBuffer) -> int:
+    """Backtester.run_vectorized over the whole series."""
+    Backtester().run_vectorized(SimpleMovingAverage(), candles)
+    return len(candles)
+
+
+def bench_sma_analyze(candles: OHLCVBuffer) -> int:
+    """SimpleMovingAverage.analyze on the full history, as the live bot calls it."""
+    strategy = SimpleMovingAverage()
+
+    async def analyze():
+        for _ in range(ANALYZE_CALLS):
+            await strategy.analyze(candles)
+
+    asyncio.run(analyze())
+    return ANALYZE_CALLS
+
+
+def bench_convert_to_dataframe(candles: OHLCVBuffer) -> int:
+    """Strategy.convert_to_dataframe of the whole series."""
+    SimpleMovingAverage().convert_to_dataframe(candles)
+    return len(candles)
+
+
+def bench_bot_loop(candles: OHLCVBuffer) -> int:
+    """TradingBot trading cycles against a mock exchange, one new candle per cycle."""
+    cycles = min(len(candles) - 1, MAX_BOT_CYCLES)
+    exchange = ReplayExchange(candles)
+    connector = ExchangeConnector({'name': 'binance'})
+    connector.exchange = exchange
+    timeframe_ms = int(candles.timestamp[1] - candles.timestamp[0])
+    bot = TradingBot({}, {'symbol': 'BTC/USDT', 'timeframe': '1m'}, SimpleMovingAverage(),
+                     exchange=connector, clock=ReplayClock(exchange, timeframe_ms))
+
+    async def loop():
+        # Start with the candles before the replayed ones as history
+        exchange.visible = len(candles) - cycles
+        for _ in range(cycles):
+            exchange.visible += 1
+            await bot._trading_loop()
+
+    asyncio.run(loop())
+    return cycles
+
+
+BENCHMARKS: Dict[str, Callable[[OHLCVBuffer], int]] = {
+    'backtest_run': bench_backtest_run,
+    'backtest_run_vectorized': bench_backtest_run_vectorized,
+    'sma_analyze': bench_sma_analyze,
+    'convert_to_dataframe': bench_convert_to_dataframe,
+    'bot_loop': bench_bot_loop,
+}
+
+
+def measure(bench: Callable[[OHLCVBuffer], int], candles: OHLCVBuffer,
+            repeat: int = 3) -> Dict[str, float]:
+    """
+    Time a benchmark and measure its peak memory.
+
+    Timing uses the best of repeat runs; peak memory comes from one extra
+    run under tracemalloc, which would otherwise distort the timings.
+
+    Args:
+        bench: Benchmark function returning the number of items processed
+        candles: Input series
+        repeat: Number of timed runs
+
+    Returns:
+        Dictionary with 'seconds', 'throughput' (items per second) and 'peak_mb'
+    """
+    best = float('inf')
+    items = 0
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        items = bench(candles)
+        best = min(best, time.perf_counter() - started)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        bench(candles)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {'seconds': best, 'throughput': items / best, 'peak_mb': peak / 2 ** 20}
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]],
+            time_threshold: float = TIME_THRESHOLD,
+            memory_threshold: float = MEMORY_THRESHOLD) -> List[str]:
+    """
+    Find regressions against a baseline.
+
+    Args:
+        results: Measurements keyed by 'benchmark@size'
+        baseline: Baseline measurements with the same keys
+        time_threshold: Allowed relative slowdown (0.25 = 25% slower)
+        memory_threshold: Allowed relative growth of peak memory
+
+    Returns:
+        One message per regression; empty when everything is within limits
+    """
+    regressions = []
+    for key, result in results.items():
+        reference = baseline.get(key)
+        if reference is None:
+            continue
+        if result['seconds'] > reference['seconds'] * (1 + time_threshold):
+            regressions.append(f"{key}: {result['seconds']:.4f}s vs baseline {reference['seconds']:.4f}s "
+                               f"(+{result['seconds'] / reference['seconds'] - 1:.0%})")
+        # Tiny allocations are dominated by noise
+        if result['peak_mb'] > max(reference['peak_mb'] * (1 + memory_threshold), reference['peak_mb'] + 1.0):
+            regressions.append(f"{key}: peak {result['peak_mb']:.1f} MB vs baseline {reference['peak_mb']:.1f} MB")
+    return regressions
+
+
+def measure_import(module: str, repeat: int = 3) -> Dict[str, Any]:
+    """
+    Time importing a module in fresh interpreters.
+
+    Args:
+        module: Dotted module name
+        repeat: Number of interpreters started (best is kept)
+
+    Returns:
+        Dictionary with 'seconds' and 'loaded', the LAZY_IMPORTS the import pulled in
+    """
+    code = (f"import sys, time\n"
+            f"started = time.perf_counter()\n"
+            f"import {module}\n"
+            f"print(time.perf_counter() - started)\n"
+            f"print(','.join(name for name in {LAZY_IMPORTS!r} if name in sys.modules))\n")
+    best = float('inf')
+    loaded: List[str] = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True,
+                                text=True, check=True).stdout.splitlines()
+        best = min(best, float(output[0]))
+        loaded = [name for name in output[1].split(',') if name] if len(output) > 1 else []
+    return {'seconds': best, 'loaded': loaded}
+
+
+def check_imports(results: Dict[str, Dict[str, Any]],
+                  budgets: Dict[str, float] = IMPORT_BUDGETS) -> List[str]:
+    """
+    Find imports over their time budget or loading heavy dependencies eagerly.
+
+    Args:
+        results: measure_import results keyed by module
+        budgets: Allowed seconds per module
+
+    Returns:
+        One message per violation; empty when every import is within budget
+    """
+    violations = []
+    for module, result in results.items():
+        if result['seconds'] > budgets[module]:
+            violations.append(f"import {module}: {result['seconds']:.3f}s vs budget {budgets[module]:.3f}s")
+        if result['loaded']:
+            violations.append(f"import {module}: loads {', '.join(result['loaded'])} eagerly")
+    return violations
+
+
+def run_imports(repeat: int = 3) -> Dict[str, Dict[str, Any]]:
+    """
+    Time the cold import of every module in IMPORT_BUDGETS.
+
+    Returns:
+        measure_import results keyed by module
+    """
+    results = {}
+    for module in IMPORT_BUDGETS:
+        results[module] = measure_import(module, repeat)
+        print(f"{'import ' + module:36s} {results[module]['seconds']:9.4f}s "
+              f"(budget {IMPORT_BUDGETS[module]:.2f}s)", flush=True)
+    return results
+
+
+def run(sizes: List[str], benchmarks: List[str], repeat: int = 3) -> Dict[str, Dict[str, float]]:
+    """
+    Run benchmarks on synthetic series of the given sizes.
+
+    Returns:
+        Measurements keyed by 'benchmark@size'
+    """
+    results = {}
+    for size in sizes:
+        candles = synthetic_ohlcv(SIZES[size])
+        for name in benchmarks:
+            key = f"{name}@{size}"
+            results[key] = measure(BENCHMARKS[name], candles, repeat)
+            print(f"{key:36s} {results[key]['seconds']:9.4f}s {results[key]['throughput']:14,.0f}/s "
+                  f"{results[key]['peak_mb']:9.1f} MB", flush=True)
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line entry point; returns a non-zero exit code on regressions."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default=','.join(SIZES), help="comma-separated sizes (1k, 100k, 1M)")
+    parser.add_argument('--benchmarks', default=','.join(list(BENCHMARKS) + ['imports']),
+                        help="comma-separated benchmark names ('imports' checks the import budgets)")
+    parser.add_argument('--repeat', type=int, default=3, help="timed runs per benchmark (best is kept)")
+    parser.add_argument('--baseline', type=Path, default=BASELINE_PATH, help="baseline JSON file")
+    parser.add_argument('--update-baseline', action='store_true', help="store the results as the new baseline")
+    parser.add_argument('--time-threshold', type=float, default=TIME_THRESHOLD)
+    parser.add_argument('--memory-threshold', type=float, default=MEMORY_THRESHOLD)
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.INFO)
+    names = args.benchmarks.split(',')
+    violations = check_imports(run_imports(args.repeat)) if 'imports' in names else []
+    results = run(args.sizes.split(','), [name for name in names if name != 'imports'], args.repeat)
+
+    if args.update_baseline:
+        baseline = json.loads(args.baseline.read_text())['results'] if args.baseline.exists() else {}
+        baseline.update(results)
+        args.baseline.write_text(json.dumps({
+            'machine': f"{platform.machine()} {platform.processor()} Python {platform.python_version()}",
+            'results': baseline,
+        }, indent=2, sort_keys=True) + '\n')
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    regressions = violations
+    if not args.baseline.exists():
+        print(f"No baseline at {args.baseline}; run with --update-baseline first")
+    else:
+        regressions += compare(results, json.loads(args.baseline.read_text())['results'],
+                               args.time_threshold, args.memory_threshold)
+    for message in regressions:
+        print(f"REGRESSION {message}")
+    print(f"{len(regressions)} regression(s) against {args.baseline}")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -6,6 +6,7 @@ import asyncio
 import json
 import logging
 import sys
+from datetime import datetime, timezone
 from pathlib import Path
 
 # Add src to path
@@ -13,13 +14,14 @@ sys.path.insert(0, str(Path(__file__).parent))
 
 from src.exchange import ExchangeConnector
 from src.backtesting import Backtester
+from src.backtesting.cache import ResultCache, candles_digest, result_key
+from src.backtesting.fills import FillModel
+from src.data.store import CandleStore
+from src.log import configure_logging
 from src.strategies.sma_strategy import SimpleMovingAverage
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+# Configure logging; records are written by a background thread
+configure_logging()
 
 logger = logging.getLogger(__name__)
 
@@ -46,6 +48,8 @@ async def run_backtest():
     
     # Load configuration
     config = load_config()
+    if 'logging' in config:
+        configure_logging(**config['logging'])
     
     # Initialize exchange connector to fetch historical data
     exchange = ExchangeConnector(config['exchange'])
@@ -59,21 +63,44 @@ async def run_backtest():
         timeframe = config['trading']['timeframe']
         logger.info(f"Fetching historical data for {symbol} ({timeframe})...")
         
-        # Fetch more data for better backtesting (500 candles)
-        ohlcv_data = await exchange.fetch_ohlcv(symbol, timeframe, limit=500)
-        logger.info(f"Fetched {len(ohlcv_data)} candles")
+        # Sync the local candle store and load the history memory-mapped
+        store = CandleStore(config['backtesting'].get('data_dir', 'data/candles'))
+        start_date = config['backtesting'].get('start_date')
+        since = None
+        if start_date:
+            since = int(datetime.fromisoformat(start_date).replace(tzinfo=timezone.utc).timestamp() * 1000)
+        await store.sync(exchange, symbol, timeframe, since=since)
+        ohlcv_data = store.load(exchange.exchange_name, symbol, timeframe, start=since)
+        logger.info(f"Loaded {len(ohlcv_data)} candles")
         
         # Initialize strategy
-        strategy = SimpleMovingAverage(short_window=10, long_window=30)
+        params = {'short_window': 10, 'long_window': 30}
+        strategy = SimpleMovingAverage(**params)
         logger.info(f"Strategy: {strategy.name}")
         
         # Initialize backtester
         initial_balance = config['backtesting']['initial_balance']
-        backtester = Backtester(initial_balance=initial_balance)
+        fill_model = FillModel(**config['backtesting'].get('fills', {}))
+        backtester = Backtester(initial_balance=initial_balance, fill_model=fill_model)
         
-        # Run backtest
-        logger.info("Running backtest...")
-        results = await backtester.run(strategy, ohlcv_data, trade_amount=0.5)
+        # Reuse the results of an identical earlier run
+        cache = ResultCache(config['backtesting'].get('cache_dir', 'data/backtest_cache'),
+                            int(config['backtesting'].get('cache_size_mb', 512) * 1024 * 1024))
+        key = result_key(candles_digest(ohlcv_data), SimpleMovingAverage, params,
+                         initial_balance, 0.5, fill_model)
+        results = cache.get(key)
+        
+        # Run backtest (limit orders are only simulated by the vectorized engine)
+        if results is not None:
+            logger.info("Backtest results loaded from the result cache")
+        elif fill_model.order_type == 'market':
+            logger.info("Running backtest...")
+            results = await backtester.run(strategy, ohlcv_data, trade_amount=0.5)
+            cache.put(key, results)
+        else:
+            logger.info("Running backtest...")
+            results = backtester.run_vectorized(strategy, ohlcv_data, trade_amount=0.5)
+            cache.put(key, results)
         
         # Save results
         with open('backtest_results.json', 'w') as f:
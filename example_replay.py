@@ -0,0 +1,98 @@
+"""
+Example script replaying stored candles through the live trading bot.
+"""
+
+import asyncio
+import json
+import logging
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from src.backtesting.fills import FillModel
+from src.bot import TradingBot
+from src.data.store import CandleStore
+from src.log import configure_logging
+from src.replay import ReplayConnector, run_replay
+from src.strategies.sma_strategy import SimpleMovingAverage
+
+# Configure logging; records are written by a background thread
+configure_logging()
+
+logger = logging.getLogger(__name__)
+
+
+def load_config(config_path: str = 'config.json') -> dict:
+    """Load configuration from JSON file."""
+    try:
+        with open(config_path, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        logger.warning(f"Config file not found: {config_path}, using defaults")
+        return {
+            'exchange': {'name': 'binance'},
+            'trading': {'symbol': 'BTC/USDT', 'timeframe': '1h'},
+            'backtesting': {},
+            'replay': {}
+        }
+
+
+def to_ms(date: str) -> int:
+    """Convert an ISO date to milliseconds since the epoch."""
+    return int(datetime.fromisoformat(date).replace(tzinfo=timezone.utc).timestamp() * 1000)
+
+
+async def run():
+    """Soak-test the trading bot on stored candles."""
+    logger.info("="*60)
+    logger.info("MESA - Replay Example")
+    logger.info("="*60)
+
+    # Load configuration
+    config = load_config()
+    if 'logging' in config:
+        configure_logging(**config['logging'])
+    replay_config = config.get('replay', {})
+    trading_config = config['trading']
+
+    # Every traded market is replayed from the local candle store (see example_backtest.py)
+    store = CandleStore(config.get('backtesting', {}).get('data_dir', 'data/candles'))
+    markets = [(trading_config['symbol'], trading_config.get('timeframe', '1m'), {}, None)]
+    markets += [(m['symbol'], m.get('timeframe', trading_config.get('timeframe', '1m')),
+                 m.get('strategy_params', {}), m.get('amount')) for m in trading_config.get('markets', [])]
+    start = to_ms(replay_config['start_date']) if 'start_date' in replay_config else None
+    end = to_ms(replay_config['end_date']) if 'end_date' in replay_config else None
+    candles = {}
+    for symbol, timeframe, _, _ in markets:
+        series = store.load(config['exchange'].get('name', 'binance'), symbol, timeframe, end=end)
+        if not len(series):
+            logger.error(f"No stored candles for {symbol} {timeframe}; run example_backtest.py first")
+            return
+        candles[(symbol, timeframe)] = series
+        logger.info(f"Loaded {len(series)} {symbol} {timeframe} candles")
+
+    # The bot runs unchanged on a paper exchange and a virtual clock
+    connector = ReplayConnector(
+        candles,
+        speed=replay_config.get('speed', 1000),
+        start=start,
+        balance=replay_config.get('balance'),
+        fill_model=FillModel(**config.get('backtesting', {}).get('fills', {})),
+        latency=replay_config.get('latency', 0.0)
+    )
+    bot = TradingBot({}, trading_config, SimpleMovingAverage(short_window=10, long_window=30),
+                     exchange=connector, clock=connector.clock)
+    for symbol, timeframe, params, amount in markets[1:]:
+        bot.add_market(symbol, timeframe, SimpleMovingAverage(**params), amount)
+
+    report = await run_replay(bot)
+    logger.info(f"Equity: {report['equity']:.2f}, balances: {report['balance']}")
+    logger.info(f"Cycles: {report['cycles']}, missed: {report['missed_cycles']}, "
+                f"max drift: {report['max_drift']:.1f}s")
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
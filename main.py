@@ -12,17 +12,12 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent))
 
 from src.bot import TradingBot
+from src.log import configure_logging
 from src.strategies.sma_strategy import SimpleMovingAverage
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('trading_bot.log'),
-        logging.StreamHandler()
-    ]
-)
+# Configure logging; records are written by a background thread
+LOG_DEFAULTS = {'file': 'trading_bot.log'}
+configure_logging(**LOG_DEFAULTS)
 
 logger = logging.getLogger(__name__)
 
@@ -49,6 +44,8 @@ async def main():
     
     # Load configuration
     config = load_config()
+    if 'logging' in config:
+        configure_logging(**{**LOG_DEFAULTS, **config['logging']})
     
     # Initialize strategy
     strategy = SimpleMovingAverage(short_window=10, long_window=30)
@@ -61,6 +58,15 @@ async def main():
         strategy=strategy
     )
     
+    # Additional markets traded over the same exchange connection
+    for market in config['trading'].get('markets', []):
+        bot.add_market(
+            market['symbol'],
+            market.get('timeframe', bot.timeframe),
+            SimpleMovingAverage(**market.get('strategy_params', {})),
+            market.get('amount')
+        )
+    
     try:
         # Start the bot
         await bot.start()
@@ -2,133 +2,300 @@
 Backtesting module for testing trading strategies on historical data.
 """
 
-from typing import Dict, Any, List
-import pandas as pd
+from typing import Dict, Any, Optional
+import numpy as np
 import logging
-from datetime import datetime
+from src.data import OHLCVData, as_ohlcv_buffer
+from .analytics import performance_metrics, periods_per_year
+from .fills import FillModel
+from .ledger import BUY, SELL, TradeLedger
 
 logger = logging.getLogger(__name__)
 
+# Minimum number of candles before the backtester starts acting on signals
+WARMUP_BARS = 30
+
 
 class Backtester:
     """
     Simple backtesting engine for strategy evaluation.
     """
     
-    def __init__(self, initial_balance: float = 10000.0):
+    def __init__(self, initial_balance: float = 10000.0, fill_model: Optional[FillModel] = None):
         """
         Initialize backtester.
         
         Args:
             initial_balance: Starting capital for backtesting
+            fill_model: Fees, slippage and order type of simulated fills
+                (defaults to fee-free market orders at the close)
         """
         self.initial_balance = initial_balance
+        self.fill_model = fill_model or FillModel()
         self.balance = initial_balance
         self.position = None
         self.position_size = 0.0
         self.entry_price = 0.0
-        self.trades: List[Dict[str, Any]] = []
+        self.trades = TradeLedger()
+        # Cash plus marked-to-market position, and position size, at every bar close
+        self.equity_curve = np.empty(0)
+        self.position_curve = np.empty(0)
+        self._periods = 0.0
         
-    async def run(self, strategy, ohlcv_data: List[List], 
-                  trade_amount: float = 0.1) -> Dict[str, Any]:
+    async def run(self, strategy, ohlcv_data: OHLCVData, 
+                  trade_amount: float = 0.1, start: int = 0) -> Dict[str, Any]:
         """
         Run backtest on historical data.
         
+        Market orders are filled with the fill model's slippage and taker
+        fee; limit orders are only simulated by run_vectorized().
+        
         Args:
             strategy: Trading strategy instance
-            ohlcv_data: Historical OHLCV data
+            ohlcv_data: Historical OHLCV data (raw rows or OHLCVBuffer)
             trade_amount: Percentage of balance to use per trade (0.0 to 1.0)
+            start: Index of the first candle traded on; earlier candles only
+                warm up the strategy and are left out of the equity curve
             
         Returns:
             Dictionary with backtest results
         """
+        if self.fill_model.order_type != 'market':
+            raise ValueError("Limit orders are only simulated by run_vectorized()")
         logger.info(f"Starting backtest with {self.initial_balance} initial balance")
         
-        # Convert to DataFrame for easier processing
-        df = pd.DataFrame(
-            ohlcv_data,
-            columns=['timestamp', 'open', 'high', 'low', 'close', 'volume']
-        )
-        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
+        n = len(ohlcv_data)
+        equity = np.empty(n)
+        position = np.zeros(n)
+        # Checked once: quiet mode skips per-trade logging entirely
+        log_trades = logger.isEnabledFor(logging.INFO)
         
-        # Iterate through data points
-        for i in range(len(df)):
-            # Get data up to current point
-            current_data = ohlcv_data[:i+1]
+        # Feed candles to the strategy one at a time
+        strategy.reset()
+        for i, candle in enumerate(ohlcv_data):
+            signal = await strategy.on_candle(candle)
+            current_price = candle[4]
             
             # Skip if not enough data
-            if len(current_data) < 30:
+            if i + 1 < WARMUP_BARS or i < start:
+                equity[i] = self.balance + self.position_size * current_price
                 continue
             
-            # Get signal from strategy
-            signal = await strategy.analyze(current_data)
-            current_price = df.iloc[i]['close']
-            current_time = df.iloc[i]['timestamp']
-            
             # Execute trades based on signal
             if signal == 'buy' and self.position is None:
-                # Open long position
+                # Open long position, paying the taker fee out of the invested amount
+                fill_price = self.fill_model.market_price(current_price, BUY)
+                fee_rate = self.fill_model.taker_fee
                 amount_to_invest = self.balance * trade_amount
-                self.position_size = amount_to_invest / current_price
-                self.entry_price = current_price
+                self.position_size = amount_to_invest / (fill_price * (1 + fee_rate))
+                self.entry_price = fill_price
                 self.position = 'long'
                 self.balance -= amount_to_invest
                 
-                self.trades.append({
-                    'timestamp': current_time,
-                    'action': 'buy',
-                    'price': current_price,
-                    'size': self.position_size,
-                    'balance': self.balance
-                })
+                self.trades.record(candle[0], BUY, fill_price, self.position_size, self.balance,
+                                   fee=amount_to_invest * fee_rate / (1 + fee_rate))
                 
-                strategy.set_position('long', current_price)
-                logger.info(f"BUY: {self.position_size:.4f} at {current_price:.2f}")
+                strategy.set_position('long', fill_price)
+                if log_trades:
+                    logger.info("BUY: %.4f at %.2f", self.position_size, fill_price)
                 
             elif signal == 'sell' and self.position == 'long':
                 # Close long position
-                proceeds = self.position_size * current_price
-                profit = proceeds - (self.position_size * self.entry_price)
-                self.balance += proceeds
-                
-                self.trades.append({
-                    'timestamp': current_time,
-                    'action': 'sell',
-                    'price': current_price,
-                    'size': self.position_size,
-                    'balance': self.balance,
-                    'profit': profit
-                })
-                
-                logger.info(f"SELL: {self.position_size:.4f} at {current_price:.2f}, Profit: {profit:.2f}")
+                profit = self._sell(candle[0], current_price)
+                if log_trades:
+                    logger.info("SELL: %.4f at %.2f, Profit: %.2f", self.position_size, current_price, profit)
                 
                 self.position = None
                 self.position_size = 0.0
                 self.entry_price = 0.0
                 strategy.set_position(None)
+            
+            equity[i] = self.balance + self.position_size * current_price
+            position[i] = self.position_size
         
         # Close any open position at the end
         if self.position == 'long':
-            final_price = df.iloc[-1]['close']
-            proceeds = self.position_size * final_price
-            profit = proceeds - (self.position_size * self.entry_price)
-            self.balance += proceeds
-            
-            self.trades.append({
-                'timestamp': df.iloc[-1]['timestamp'],
-                'action': 'sell',
-                'price': final_price,
-                'size': self.position_size,
-                'balance': self.balance,
-                'profit': profit
-            })
-            
-            logger.info(f"FINAL SELL: {self.position_size:.4f} at {final_price:.2f}, Profit: {profit:.2f}")
+            final_price = ohlcv_data[-1][4]
+            profit = self._sell(ohlcv_data[-1][0], final_price)
+            logger.info("FINAL SELL: %.4f at %.2f, Profit: %.2f", self.position_size, final_price, profit)
+        
+        self.equity_curve = equity[start:]
+        self.position_curve = position[start:]
+        if n > 1:
+            self._periods = periods_per_year((ohlcv_data[-1][0] - ohlcv_data[0][0]) / (n - 1))
         
         # Calculate results
         results = self._calculate_results()
         return results
     
+    def _sell(self, timestamp: int, price: float) -> float:
+        """
+        Sell the whole position with a market order and record the trade.
+        
+        Args:
+            timestamp: Candle timestamp in milliseconds
+            price: Candle close
+            
+        Returns:
+            Realized profit after fees on both sides
+        """
+        fill_price = self.fill_model.market_price(price, SELL)
+        fee_rate = self.fill_model.taker_fee
+        value = self.position_size * fill_price
+        fee = value * fee_rate
+        profit = value - fee - self.position_size * self.entry_price * (1 + fee_rate)
+        self.balance += value - fee
+        self.trades.record(timestamp, SELL, fill_price, self.position_size, self.balance, profit, fee)
+        return profit
+    
+    def run_vectorized(self, strategy, ohlcv_data: OHLCVData,
+                       trade_amount: float = 0.1, start: int = 0) -> Dict[str, Any]:
+        """
+        Run backtest on historical data using array operations.
+        
+        Produces the same results as run() but asks the strategy for all
+        signals at once via generate_signals() and derives positions, fills
+        and balance with NumPy instead of replaying the history bar by bar.
+        Also simulates limit orders when the fill model uses them; pending
+        orders are matched against the candle highs and lows in bulk.
+        
+        Args:
+            strategy: Trading strategy instance supporting generate_signals()
+            ohlcv_data: Historical OHLCV data (raw rows or OHLCVBuffer)
+            trade_amount: Percentage of balance to use per trade (0.0 to 1.0)
+            start: Index of the first candle traded on; earlier candles only
+                warm up the strategy and are left out of the equity curve
+            
+        Returns:
+            Dictionary with backtest results
+        """
+        logger.info(f"Starting vectorized backtest with {self.initial_balance} initial balance")
+        
+        n = len(ohlcv_data)
+        if n == 0:
+            return self._calculate_results()
+        
+        candles = as_ohlcv_buffer(ohlcv_data)
+        closes = candles.close
+        
+        signals = np.array(strategy.generate_signals(candles), dtype=np.int8)
+        signals[:max(WARMUP_BARS - 1, start)] = 0
+        
+        # Long while the most recent non-zero signal is a buy
+        last_signal = np.where(signals != 0, np.arange(n), -1)
+        np.maximum.accumulate(last_signal, out=last_signal)
+        in_position = (last_signal >= 0) & (signals[last_signal] > 0)
+        was_in_position = np.concatenate(([False], in_position[:-1]))
+        
+        entries = np.flatnonzero(in_position & ~was_in_position)
+        exits = np.flatnonzero(~in_position & was_in_position)
+        # The last round trip may end with the data instead of a sell signal
+        forced = np.zeros(len(entries), dtype=bool)
+        if len(exits) < len(entries):
+            # Close any open position at the end
+            exits = np.append(exits, n - 1)
+            forced[-1] = True
+        
+        entries, entry_prices, entry_fees, exits, exit_prices, exit_fees, forced = self._fill_orders(
+            candles, entries, exits, forced)
+        
+        # Each round trip scales the balance by (1 - f) + f * exit / entry, net of fees
+        net_exit_prices = exit_prices * (1 - exit_fees)
+        gross_entry_prices = entry_prices * (1 + entry_fees)
+        growth = (1.0 - trade_amount) + trade_amount * net_exit_prices / gross_entry_prices
+        balance_after_sell = self.balance * np.cumprod(growth)
+        balance_before_buy = np.concatenate(([self.balance], balance_after_sell[:-1]))
+        
+        invested = balance_before_buy * trade_amount
+        sizes = invested / gross_entry_prices
+        balance_after_buy = balance_before_buy - invested
+        profits = sizes * net_exit_prices - invested
+        
+        # Interleave round trips as buy, sell, buy, sell, ...
+        timestamps = candles.timestamp
+        self.trades.extend(
+            np.column_stack((timestamps[entries], timestamps[exits])).ravel(),
+            np.tile(np.array([BUY, SELL], dtype=np.int8), len(entries)),
+            np.column_stack((entry_prices, exit_prices)).ravel(),
+            np.repeat(sizes, 2),
+            np.column_stack((balance_after_buy, balance_after_sell)).ravel(),
+            np.column_stack((np.full(len(entries), np.nan), profits)).ravel(),
+            np.column_stack((invested * entry_fees / (1 + entry_fees), sizes * exit_prices * exit_fees)).ravel(),
+        )
+        
+        # Per-bar cash and position: a round trip holds from its entry fill until its exit
+        # fill (through the last bar when the data ends it). Bars fall into states
+        # 0 (before the first trade), 2k + 1 (holding trade k) and 2k + 2 (flat after it).
+        held_until = np.where(forced, n, exits)
+        marks = np.zeros(n + 1, dtype=np.int8)
+        marks[entries] = 1
+        marks[held_until] = 1
+        state = np.cumsum(marks[:n], dtype=np.int32)
+        cash_by_state = np.column_stack((balance_after_buy, balance_after_sell)).ravel()
+        size_by_state = np.column_stack((sizes, np.zeros(len(sizes)))).ravel()
+        self.position_curve = np.concatenate(([0.0], size_by_state))[state]
+        self.equity_curve = self.position_curve * closes
+        self.equity_curve += np.concatenate(([self.balance], cash_by_state))[state]
+        self.equity_curve = self.equity_curve[start:]
+        self.position_curve = self.position_curve[start:]
+        if n > 1:
+            self._periods = periods_per_year((timestamps[-1] - timestamps[0]) / (n - 1))
+        
+        if len(entries):
+            self.balance = float(balance_after_sell[-1])
+        self.position = None
+        self.position_size = 0.0
+        self.entry_price = 0.0
+        
+        return self._calculate_results()
+    
+    def _fill_orders(self, candles, entries: np.ndarray, exits: np.ndarray, forced: np.ndarray):
+        """
+        Turn entry and exit signal bars into fills according to the fill model.
+        
+        Market orders fill on their signal bar. Limit entries wait for the price
+        until the exit signal (or their timeout) and skip the round trip when
+        they never fill; limit exits wait until the next entry signal (or their
+        timeout, or the last bar) and then become market orders.
+        
+        Args:
+            candles: Candle history as an OHLCVBuffer
+            entries: Entry signal bars
+            exits: Exit signal bars, one per entry
+            forced: Round trips closed by the end of the data rather than a signal
+            
+        Returns:
+            Tuple of (entry bars, entry prices, entry fee rates, exit bars,
+            exit prices, exit fee rates, forced) for the round trips that happen
+        """
+        model = self.fill_model
+        closes = candles.close
+        if model.order_type == 'market':
+            fees = np.full(len(entries), model.taker_fee)
+            return (entries, model.market_price(closes[entries], BUY), fees,
+                    exits, model.market_price(closes[exits], SELL), fees, forced)
+        
+        entry_deadline = exits - 1
+        exit_deadline = np.append(entries[1:], len(candles) - 1)
+        if model.limit_timeout is not None:
+            entry_deadline = np.minimum(entry_deadline, entries + model.limit_timeout)
+            exit_deadline = np.minimum(exit_deadline, exits + model.limit_timeout)
+        
+        entry_bars, entry_prices = model.match_limit_orders(
+            candles, entries, BUY, model.limit_price(closes[entries], BUY), entry_deadline)
+        exit_bars, exit_prices = model.match_limit_orders(
+            candles, exits, SELL, model.limit_price(closes[exits], SELL), exit_deadline)
+        
+        # Exits still open at their deadline become market orders
+        missed = exit_bars < 0
+        exit_fees = np.where(missed, model.taker_fee, model.maker_fee)
+        exit_bars[missed] = exit_deadline[missed]
+        exit_prices[missed] = model.market_price(closes[exit_deadline[missed]], SELL)
+        
+        filled = entry_bars >= 0
+        return (entry_bars[filled], entry_prices[filled], np.full(int(filled.sum()), model.maker_fee),
+                exit_bars[filled], exit_prices[filled], exit_fees[filled], forced[filled])
+    
     def _calculate_results(self) -> Dict[str, Any]:
         """
         Calculate backtesting results and statistics.
@@ -139,14 +306,17 @@ class Backtester:
         total_return = self.balance - self.initial_balance
         return_percentage = (total_return / self.initial_balance) * 100
         
-        winning_trades = [t for t in self.trades if t.get('profit', 0) > 0]
-        losing_trades = [t for t in self.trades if t.get('profit', 0) < 0]
+        profits = self.trades.realized_profits
+        wins = profits[profits > 0]
+        losses = profits[profits < 0]
+        
+        total_trades = len(profits)
+        win_rate = (len(wins) / total_trades * 100) if total_trades > 0 else 0
         
-        total_trades = len([t for t in self.trades if 'profit' in t])
-        win_rate = (len(winning_trades) / total_trades * 100) if total_trades > 0 else 0
+        avg_win = float(wins.mean()) if len(wins) else 0
+        avg_loss = float(losses.mean()) if len(losses) else 0
         
-        avg_win = sum(t['profit'] for t in winning_trades) / len(winning_trades) if winning_trades else 0
-        avg_loss = sum(t['profit'] for t in losing_trades) / len(losing_trades) if losing_trades else 0
+        analytics = performance_metrics(self.equity_curve, self.position_curve, self.trades, self._periods)
         
         results = {
             'initial_balance': self.initial_balance,
@@ -154,11 +324,13 @@ class Backtester:
             'total_return': total_return,
             'return_percentage': return_percentage,
             'total_trades': total_trades,
-            'winning_trades': len(winning_trades),
-            'losing_trades': len(losing_trades),
+            'winning_trades': len(wins),
+            'losing_trades': len(losses),
             'win_rate': win_rate,
             'average_win': avg_win,
             'average_loss': avg_loss,
+            **analytics,
+            'fees_paid': float(self.trades.fee.sum()),
             'trades': self.trades
         }
         
@@ -172,6 +344,12 @@ class Backtester:
         logger.info(f"Win Rate: {win_rate:.2f}%")
         logger.info(f"Average Win: ${avg_win:.2f}")
         logger.info(f"Average Loss: ${avg_loss:.2f}")
+        logger.info(f"Sharpe Ratio: {analytics['sharpe_ratio']:.2f}")
+        logger.info(f"Sortino Ratio: {analytics['sortino_ratio']:.2f}")
+        logger.info(f"Max Drawdown: {analytics['max_drawdown']:.2f}%")
+        logger.info(f"Exposure: {analytics['exposure']:.2f}%")
+        logger.info(f"Turnover: {analytics['turnover']:.2f}")
+        logger.info(f"Fees Paid: ${float(self.trades.fee.sum()):.2f}")
         logger.info("="*50)
         
         return results
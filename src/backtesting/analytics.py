@@ -0,0 +1,141 @@
+"""
+Vectorized performance analytics for backtests.
+Risk and activity metrics computed with NumPy from a per-bar equity
+curve and a trade ledger.
+"""
+
+from typing import Dict
+import numpy as np
+from .ledger import TradeLedger
+
+YEAR_MS = 365 * 24 * 60 * 60 * 1000
+
+
+def periods_per_year(bar_ms: float) -> float:
+    """
+    Number of bars per year for a bar spacing (markets trade 24/7).
+
+    Args:
+        bar_ms: Average time between bars in milliseconds
+
+    Returns:
+        Bars per year, or 0 when the spacing is unknown
+    """
+    return YEAR_MS / bar_ms if bar_ms > 0 else 0.0
+
+
+def bar_returns(equity: np.ndarray) -> np.ndarray:
+    """Simple return of every bar after the first."""
+    if len(equity) < 2:
+        return np.empty(0)
+    return equity[1:] / equity[:-1] - 1.0
+
+
+def sharpe_ratio(returns: np.ndarray, periods: float) -> float:
+    """
+    Annualized Sharpe ratio with a zero risk-free rate.
+
+    Args:
+        returns: Per-bar returns
+        periods: Bars per year
+
+    Returns:
+        Sharpe ratio, 0 without variation
+    """
+    if len(returns) < 2:
+        return 0.0
+    deviation = returns.std(ddof=1)
+    if deviation == 0 or not np.isfinite(deviation):
+        return 0.0
+    return float(returns.mean() / deviation * np.sqrt(periods))
+
+
+def sortino_ratio(returns: np.ndarray, periods: float) -> float:
+    """
+    Annualized Sortino ratio: mean return over downside deviation.
+
+    Args:
+        returns: Per-bar returns
+        periods: Bars per year
+
+    Returns:
+        Sortino ratio, 0 without losing bars
+    """
+    if len(returns) < 2:
+        return 0.0
+    downside = np.sqrt(np.mean(np.minimum(returns, 0.0) ** 2))
+    if downside == 0:
+        return 0.0
+    return float(returns.mean() / downside * np.sqrt(periods))
+
+
+def max_drawdown(equity: np.ndarray) -> float:
+    """
+    Largest peak-to-trough decline of the equity curve.
+
+    Args:
+        equity: Per-bar equity
+
+    Returns:
+        Maximum drawdown as a fraction of the peak (0.25 = 25%)
+    """
+    if not len(equity):
+        return 0.0
+    peaks = np.maximum.accumulate(equity)
+    return float(np.max(1.0 - equity / peaks))
+
+
+def exposure(position: np.ndarray) -> float:
+    """
+    Fraction of bars spent holding a position.
+
+    Args:
+        position: Position size at the close of every bar
+
+    Returns:
+        Fraction between 0 and 1
+    """
+    if not len(position):
+        return 0.0
+    return float(np.count_nonzero(position) / len(position))
+
+
+def turnover(ledger: TradeLedger, equity: np.ndarray) -> float:
+    """
+    Traded notional relative to the average equity.
+
+    Args:
+        ledger: Executed trades
+        equity: Per-bar equity
+
+    Returns:
+        Total traded value divided by mean equity (2.0 = capital traded twice)
+    """
+    if not len(ledger) or not len(equity):
+        return 0.0
+    return float(np.sum(ledger.price * ledger.size) / equity.mean())
+
+
+def performance_metrics(equity: np.ndarray, position: np.ndarray, ledger: TradeLedger,
+                        periods: float) -> Dict[str, float]:
+    """
+    Compute risk and activity metrics of one backtest.
+
+    Args:
+        equity: Per-bar equity (cash plus marked-to-market position)
+        position: Position size at the close of every bar
+        ledger: Executed trades
+        periods: Bars per year, used to annualize the ratios
+
+    Returns:
+        Dictionary with 'sharpe_ratio', 'sortino_ratio', 'max_drawdown' (percent),
+        'exposure' (percent of bars in the market) and 'turnover'
+    """
+    returns = bar_returns(equity)
+    return {
+        'sharpe_ratio': sharpe_ratio(returns, periods),
+        'sortino_ratio': sortino_ratio(returns, periods),
+        'max_drawdown': max_drawdown(equity) * 100,
+        'exposure': exposure(position) * 100,
+        'turnover': turnover(ledger, equity),
+    }
@@ -0,0 +1,247 @@
+"""
+Content-addressed cache of backtest results.
+Results are stored on local disk under a hash of everything that decides
+them (candles, strategy class and version, parameters, capital, trade size
+and fill model), so repeated and overlapping experiments skip the backtest.
+"""
+
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Tuple, Union
+import hashlib
+import json
+import logging
+import os
+import numpy as np
+from src.data import OHLCVData, as_ohlcv_buffer
+from .fills import FillModel
+from .ledger import TradeLedger
+
+logger = logging.getLogger(__name__)
+
+# Bump when a backtester change alters the results of unchanged inputs
+CACHE_VERSION = 1
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+# Eviction frees space down to this fraction of max_bytes, so a full cache
+# is not rescanned on every store
+EVICT_TO = 0.9
+
+_LEDGER_COLUMNS = [name for name, _ in TradeLedger._FIELDS]
+
+
+def candles_digest(ohlcv_data: OHLCVData) -> str:
+    """
+    Hash the contents of a candle range.
+
+    Hashing a range once and passing the digest to result_key() saves
+    rehashing it for every parameter combination.
+
+    Args:
+        ohlcv_data: OHLCV candlestick data (raw rows or OHLCVBuffer)
+
+    Returns:
+        Hex digest of the timestamps, prices and volumes
+    """
+    candles = as_ohlcv_buffer(ohlcv_data)
+    hasher = hashlib.blake2b(digest_size=20)
+    hasher.update(len(candles).to_bytes(8, 'little'))
+    for column in (candles.timestamp, candles.open, candles.high, candles.low, candles.close, candles.volume):
+        hasher.update(np.ascontiguousarray(column).data)
+    return hasher.hexdigest()
+
+
+def result_key(digest: str, strategy_class, params: Mapping[str, Any], initial_balance: float,
+               trade_amount: float, fill_model: Optional[FillModel] = None) -> str:
+    """
+    Build the cache key of one backtest.
+
+    The strategy is identified by its module, name and version attribute;
+    bump Strategy.version when a change alters the signals it generates.
+
+    Args:
+        digest: candles_digest() of the backtested candles
+        strategy_class: Strategy class
+        params: Keyword arguments for the strategy
+        initial_balance: Starting capital
+        trade_amount: Percentage of balance to use per trade
+        fill_model: Fill model of the backtester (defaults to FillModel())
+
+    Returns:
+        Hex key naming the cache entry
+    """
+    fields = {
+        'cache_version': CACHE_VERSION,
+        'candles': digest,
+        'strategy': f"{strategy_class.__module__}.{strategy_class.__qualname__}",
+        'strategy_version': getattr(strategy_class, 'version', None),
+        'params': dict(params),
+        'initial_balance': float(initial_balance),
+        'trade_amount': float(trade_amount),
+        'fills': vars(fill_model or FillModel()),
+    }
+    encoded = json.dumps(fields, sort_keys=True, default=repr).encode()
+    return hashlib.blake2b(encoded, digest_size=20).hexdigest()
+
+
+def _json_value(value: Any) -> Any:
+    """Convert NumPy scalars in a result summary to Python numbers."""
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Cannot cache result value of type {type(value).__name__}")
+
+
+class ResultCache:
+    """
+    On-disk backtest results keyed by result_key().
+
+    Each entry is one .npz file holding the summary as JSON and the trade
+    ledger columns. Entries are written to a temporary file and renamed,
+    so worker processes can share a cache directory. Reading an entry
+    refreshes its modification time; once the directory grows beyond
+    max_bytes the least recently used entries are deleted.
+    """
+
+    def __init__(self, root: Union[str, Path] = 'data/backtest_cache',
+                 max_bytes: int = DEFAULT_MAX_BYTES):
+        """
+        Initialize result cache.
+
+        Args:
+            root: Directory holding the entries
+            max_bytes: Size the entries may take on disk
+        """
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        # Bytes stored, counted on the first store; None until then
+        self._size: Optional[int] = None
+
+    def path(self, key: str) -> Path:
+        """
+        Get the file of one entry.
+
+        Args:
+            key: Key from result_key()
+
+        Returns:
+            Entry path, fanned out over subdirectories by key prefix
+        """
+        return self.root / key[:2] / f"{key}.npz"
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Load the results stored under a key.
+
+        Args:
+            key: Key from result_key()
+
+        Returns:
+            Results as returned by the backtester, with 'trades' as a
+            TradeLedger, or None when the key is not cached
+        """
+        path = self.path(key)
+        try:
+            with np.load(path) as entry:
+                results = json.loads(entry['summary'].tobytes())
+                columns = {name: entry[name] for name in _LEDGER_COLUMNS}
+            os.utime(path)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning("Dropping unreadable backtest cache entry %s: %s", path, e)
+            path.unlink(missing_ok=True)
+            self.misses += 1
+            return None
+
+        trades = TradeLedger(len(columns['timestamp']))
+        trades.extend(**columns)
+        results['trades'] = trades
+        self.hits += 1
+        return results
+
+    def put(self, key: str, results: Mapping[str, Any]) -> None:
+        """
+        Store backtest results, evicting old entries when the cache is full.
+
+        Args:
+            key: Key from result_key()
+            results: Results returned by the backtester, including 'trades'
+        """
+        summary = {k: v for k, v in results.items() if k != 'trades'}
+        trades = results.get('trades', TradeLedger())
+        encoded = json.dumps(summary, default=_json_value).encode()
+
+        path = self.path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            replaced = path.stat().st_size
+        except FileNotFoundError:
+            replaced = 0
+        temporary = path.with_name(f"{path.stem}.{os.getpid()}.tmp")
+        with open(temporary, 'wb') as f:
+            np.savez(f, summary=np.frombuffer(encoded, dtype=np.uint8),
+                     **{name: trades.column(name) for name in _LEDGER_COLUMNS})
+        os.replace(temporary, path)
+
+        if self._size is None:
+            self._size = self.size()
+        else:
+            self._size += path.stat().st_size - replaced
+        if self._size > self.max_bytes:
+            self.evict()
+
+    def size(self) -> int:
+        """
+        Get the bytes taken by the stored entries.
+
+        Returns:
+            Total size of the entry files
+        """
+        return sum(entry[1] for entry in self._stat_entries())
+
+    def evict(self) -> int:
+        """
+        Delete least recently used entries until the cache fits max_bytes.
+
+        Returns:
+            Number of entries deleted
+        """
+        entries = sorted(self._stat_entries())
+
+        size = sum(entry[1] for entry in entries)
+        target = self.max_bytes * EVICT_TO if size > self.max_bytes else size
+        evicted = 0
+        for _, entry_size, path in entries:
+            if size <= target:
+                break
+            path.unlink(missing_ok=True)
+            size -= entry_size
+            evicted += 1
+        self._size = size
+        if evicted:
+            logger.info("Evicted %d backtest cache entries", evicted)
+        return evicted
+
+    def clear(self) -> None:
+        """Delete every entry."""
+        for path in self._entries():
+            path.unlink(missing_ok=True)
+        self._size = 0
+
+    def _entries(self) -> Iterator[Path]:
+        """Entry files currently in the cache directory."""
+        return self.root.glob('*/*.npz')
+
+    def _stat_entries(self) -> List[Tuple[float, int, Path]]:
+        """(modification time, size, path) of every entry; entries deleted meanwhile are skipped."""
+        entries = []
+        for path in self._entries():
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
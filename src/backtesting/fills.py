@@ -0,0 +1,137 @@
+"""
+Order fill simulation for backtests.
+Prices market orders with slippage and fees, and matches whole batches of
+limit orders against the candle high/low arrays at once.
+"""
+
+from typing import Optional, Tuple
+import numpy as np
+from src.data import OHLCVBuffer
+from .ledger import BUY
+
+ORDER_TYPES = ('market', 'limit')
+
+# Upper bound of (pending orders x bars) compared per matching step
+MATCH_CHUNK_CELLS = 4_000_000
+
+
+class FillModel:
+    """
+    Fill rules for simulated orders.
+
+    Market orders fill at the bar close moved against the trader by the
+    slippage fraction and pay the taker fee. Limit orders are placed at the
+    close of the signal bar, offset from it by limit_offset, and fill on the
+    first later bar whose low (buys) or high (sells) reaches the limit, at
+    the limit or at the open when the bar gaps through it, paying the maker
+    fee. Fees are fractions of the traded value.
+    """
+
+    def __init__(self, maker_fee: float = 0.0, taker_fee: float = 0.0,
+                 slippage: float = 0.0, order_type: str = 'market',
+                 limit_offset: float = 0.0, limit_timeout: Optional[int] = None):
+        """
+        Initialize fill model.
+
+        Args:
+            maker_fee: Fee of limit order fills (0.001 = 0.1%)
+            taker_fee: Fee of market order fills
+            slippage: Adverse price move of market orders as a fraction of the close
+            order_type: 'market' or 'limit'
+            limit_offset: Distance of limit prices from the signal bar close
+                (below it for buys, above it for sells) as a fraction
+            limit_timeout: Bars a limit order may wait before it is cancelled
+                (entries) or replaced by a market order (exits); unlimited when None
+        """
+        if order_type not in ORDER_TYPES:
+            raise ValueError(f"Unsupported order type: {order_type}")
+        self.maker_fee = maker_fee
+        self.taker_fee = taker_fee
+        self.slippage = slippage
+        self.order_type = order_type
+        self.limit_offset = limit_offset
+        self.limit_timeout = limit_timeout
+
+    def market_price(self, price, side: int):
+        """
+        Fill price of a market order including slippage.
+
+        Args:
+            price: Reference price (scalar or array)
+            side: BUY or SELL
+
+        Returns:
+            Price paid (buys) or received (sells)
+        """
+        return price * (1 + self.slippage * side)
+
+    def limit_price(self, price, side: int):
+        """
+        Limit price of an order placed at a reference price.
+
+        Args:
+            price: Reference price (scalar or array)
+            side: BUY or SELL
+
+        Returns:
+            Limit price, limit_offset below (buys) or above (sells) the reference
+        """
+        return price * (1 - self.limit_offset * side)
+
+    def match_limit_orders(self, candles: OHLCVBuffer, placed: np.ndarray, side: int,
+                           limit: np.ndarray, deadline: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find where a batch of limit orders fill.
+
+        Every order is compared against the bars after the one it was placed
+        on, up to and including its deadline bar. All pending orders are
+        checked together on growing blocks of bars, so the work is a few
+        array operations per block instead of a Python loop per order.
+
+        Args:
+            candles: Candle history
+            placed: Bar index each order was placed on
+            side: BUY or SELL for the whole batch
+            limit: Limit price of every order
+            deadline: Last bar index each order may fill on
+
+        Returns:
+            Tuple of (bar, price): the fill bar of every order (-1 when it
+            never filled) and its fill price (NaN when it never filled)
+        """
+        placed = np.asarray(placed, dtype=np.int64)
+        limit = np.asarray(limit, dtype=np.float64)
+        deadline = np.minimum(np.asarray(deadline, dtype=np.int64), len(candles) - 1)
+        bars = np.full(len(placed), -1, dtype=np.int64)
+
+        # Buys fill when the low reaches the limit, sells when the high does
+        reach = candles.low if side == BUY else candles.high
+        pending = np.flatnonzero(deadline > placed)
+        first = placed[pending] + 1
+        block = 16
+        while len(pending):
+            block = min(block, max(MATCH_CHUNK_CELLS // len(pending), 1))
+            window = first[:, None] + np.arange(block)
+            in_range = window <= deadline[pending, None]
+            window = np.minimum(window, len(candles) - 1)
+            if side == BUY:
+                hit = in_range & (reach[window] <= limit[pending, None])
+            else:
+                hit = in_range & (reach[window] >= limit[pending, None])
+            found = hit.any(axis=1)
+            bars[pending[found]] = window[found, hit[found].argmax(axis=1)]
+
+            first += block
+            remaining = ~found & (first <= deadline[pending])
+            pending, first = pending[remaining], first[remaining]
+            block *= 2
+
+        prices = np.full(len(placed), np.nan)
+        filled = bars >= 0
+        opens = candles.open[bars[filled]]
+        # A bar opening beyond the limit fills at its better open price
+        if side == BUY:
+            prices[filled] = np.minimum(opens, limit[filled])
+        else:
+            prices[filled] = np.maximum(opens, limit[filled])
+        return bars, prices
@@ -0,0 +1,217 @@
+"""
+Columnar trade ledger for backtests.
+Trades are stored in growable NumPy columns instead of one dict per trade.
+"""
+
+from typing import TYPE_CHECKING, Any, Dict, Iterator, Optional
+import numpy as np
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+BUY = 1
+SELL = -1
+
+# pandas.Timestamp, imported on first trade access so the ledger stays light to import
+_Timestamp = None
+
+
+def _timestamp_type() -> type:
+    """pandas.Timestamp, importing pandas once."""
+    global _Timestamp
+    if _Timestamp is None:
+        import pandas as pd
+        _Timestamp = pd.Timestamp
+    return _Timestamp
+
+
+class TradeLedger:
+    """
+    Append-only trade record stored column by column.
+
+    Columns are int64 millisecond timestamps, int8 sides (BUY or SELL) and
+    float64 prices, sizes, balances after the trade, profits (NaN for
+    buys) and fees paid. Storage doubles when full, so appends are amortized O(1).
+
+    Indexing and iteration give the trade dictionaries the backtester has
+    always returned ({'timestamp', 'action', 'price', 'size', 'balance',
+    'fee'} plus 'profit' for sells), built on demand.
+    """
+
+    _FIELDS = (('timestamp', np.int64), ('side', np.int8), ('price', np.float64),
+               ('size', np.float64), ('balance', np.float64), ('profit', np.float64),
+               ('fee', np.float64))
+
+    def __init__(self, capacity: int = 64):
+        """
+        Initialize an empty ledger.
+
+        Args:
+            capacity: Initial number of trades allocated
+        """
+        self._length = 0
+        self._data = {name: np.empty(max(capacity, 1), dtype=dtype) for name, dtype in self._FIELDS}
+
+    def _reserve(self, extra: int) -> None:
+        """Grow the columns to fit extra more trades."""
+        needed = self._length + extra
+        capacity = len(self._data['timestamp'])
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        for name, column in self._data.items():
+            grown = np.empty(capacity, dtype=column.dtype)
+            grown[:self._length] = column[:self._length]
+            self._data[name] = grown
+
+    def record(self, timestamp: int, side: int, price: float, size: float,
+               balance: float, profit: float = np.nan, fee: float = 0.0) -> None:
+        """
+        Append one trade.
+
+        Args:
+            timestamp: Fill time in milliseconds
+            side: BUY or SELL
+            price: Fill price
+            size: Position size in base currency
+            balance: Cash balance after the trade
+            profit: Realized profit of a sell
+            fee: Fee paid for the fill
+        """
+        self._reserve(1)
+        i = self._length
+        data = self._data
+        data['timestamp'][i] = timestamp
+        data['side'][i] = side
+        data['price'][i] = price
+        data['size'][i] = size
+        data['balance'][i] = balance
+        data['profit'][i] = profit
+        data['fee'][i] = fee
+        self._length += 1
+
+    def extend(self, timestamp: np.ndarray, side: np.ndarray, price: np.ndarray,
+               size: np.ndarray, balance: np.ndarray,
+               profit: Optional[np.ndarray] = None, fee: Optional[np.ndarray] = None) -> None:
+        """
+        Append many trades from arrays of equal length.
+
+        Args:
+            timestamp: Fill times in milliseconds
+            side: BUY or SELL per trade
+            price: Fill prices
+            size: Position sizes
+            balance: Cash balances after each trade
+            profit: Realized profits (NaN for buys); all NaN when omitted
+            fee: Fees paid; all zero when omitted
+        """
+        count = len(timestamp)
+        self._reserve(count)
+        columns = {'timestamp': timestamp, 'side': side, 'price': price, 'size': size,
+                   'balance': balance, 'profit': np.nan if profit is None else profit,
+                   'fee': 0.0 if fee is None else fee}
+        for name, values in columns.items():
+            self._data[name][self._length:self._length + count] = values
+        self._length += count
+
+    def clear(self) -> None:
+        """Remove every trade."""
+        self._length = 0
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __getitem__(self, index: int) -> Dict[str, Any]:
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("trade index out of range")
+        return self._trade(index, _timestamp_type())
+
+    def _trade(self, index: int, timestamp_type: type) -> Dict[str, Any]:
+        """Trade dictionary of a valid index."""
+        data = self._data
+        trade = {
+            'timestamp': timestamp_type(int(data['timestamp'][index]), unit='ms'),
+            'action': 'buy' if data['side'][index] == BUY else 'sell',
+            'price': float(data['price'][index]),
+            'size': float(data['size'][index]),
+            'balance': float(data['balance'][index]),
+            'fee': float(data['fee'][index]),
+        }
+        if data['side'][index] == SELL:
+            trade['profit'] = float(data['profit'][index])
+        return trade
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        timestamp_type = _timestamp_type()
+        for i in range(self._length):
+            yield self._trade(i, timestamp_type)
+
+    def column(self, name: str) -> np.ndarray:
+        """
+        Get one column as a read-only view.
+
+        Args:
+            name: 'timestamp', 'side', 'price', 'size', 'balance', 'profit' or 'fee'
+
+        Returns:
+            Array with one value per trade
+        """
+        view = self._data[name][:self._length]
+        view.flags.writeable = False
+        return view
+
+    @property
+    def timestamp(self) -> np.ndarray:
+        """Fill times in milliseconds."""
+        return self.column('timestamp')
+
+    @property
+    def side(self) -> np.ndarray:
+        """BUY or SELL per trade."""
+        return self.column('side')
+
+    @property
+    def price(self) -> np.ndarray:
+        """Fill prices."""
+        return self.column('price')
+
+    @property
+    def size(self) -> np.ndarray:
+        """Position sizes in base currency."""
+        return self.column('size')
+
+    @property
+    def balance(self) -> np.ndarray:
+        """Cash balances after each trade."""
+        return self.column('balance')
+
+    @property
+    def profit(self) -> np.ndarray:
+        """Realized profits, NaN for buys."""
+        return self.column('profit')
+
+    @property
+    def fee(self) -> np.ndarray:
+        """Fees paid per trade."""
+        return self.column('fee')
+
+    @property
+    def realized_profits(self) -> np.ndarray:
+        """Profit of every closed trade (sells), in order."""
+        return self.profit[self.side == SELL]
+
+    def to_dataframe(self) -> 'pd.DataFrame':
+        """
+        Convert the ledger to a DataFrame.
+
+        Returns:
+            DataFrame with one row per trade
+        """
+        import pandas as pd
+        df = pd.DataFrame({name: self.column(name) for name, _ in self._FIELDS})
+        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
+        df.insert(1, 'action', np.where(df.pop('side') == BUY, 'buy', 'sell'))
+        return df
@@ -0,0 +1,278 @@
+"""
+Multi-asset portfolio backtesting.
+Many symbols are simulated in lockstep on one timestamp index with shared
+capital; per-bar state is kept in (bars x assets) NumPy arrays.
+"""
+
+from typing import Any, Dict, Mapping, Optional, Tuple
+import logging
+import numpy as np
+from src.data import OHLCVData, as_ohlcv_buffer
+from . import WARMUP_BARS
+from .analytics import bar_returns, max_drawdown, periods_per_year, sharpe_ratio, sortino_ratio
+from .ledger import BUY, SELL, TradeLedger
+
+logger = logging.getLogger(__name__)
+
+# Bars valued per step when building the equity curve, bounding temporary memory
+EQUITY_CHUNK_BARS = 65536
+
+
+def align_closes(ohlcv_data: Mapping[str, OHLCVData]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Align the close prices of several symbols on the union of their timestamps.
+
+    Args:
+        ohlcv_data: Mapping of symbol to its candles
+
+    Returns:
+        Tuple of (timestamps, closes, available): the sorted union of candle
+        timestamps, a (bars x assets) array of closes with NaN where a symbol
+        has no candle, and the matching boolean mask of real candles
+    """
+    buffers = [as_ohlcv_buffer(candles) for candles in ohlcv_data.values()]
+    timestamps = buffers[0].timestamp if buffers else np.empty(0, dtype=np.int64)
+    if any(not np.array_equal(buffer.timestamp, timestamps) for buffer in buffers):
+        timestamps = np.unique(np.concatenate([buffer.timestamp for buffer in buffers]))
+    closes = np.full((len(timestamps), len(buffers)), np.nan)
+    for asset, buffer in enumerate(buffers):
+        closes[np.searchsorted(timestamps, buffer.timestamp), asset] = buffer.close
+    return timestamps, closes, ~np.isnan(closes)
+
+
+def _forward_fill(values: np.ndarray, available: np.ndarray) -> np.ndarray:
+    """Carry the last available value of every column over its gaps."""
+    rows = np.where(available, np.arange(len(values))[:, None], 0)
+    np.maximum.accumulate(rows, axis=0, out=rows)
+    return np.take_along_axis(values, rows, axis=0)
+
+
+class PortfolioBacktester:
+    """
+    Backtest one long-only strategy per symbol on a shared cash balance.
+
+    Candles of all symbols are aligned on the union of their timestamps;
+    a symbol only trades on bars where it has a candle and is valued at its
+    last close through gaps. Positions and prices are (bars x assets)
+    arrays, and the simulation only steps through bars where some asset
+    enters or exits, so baskets of 100+ symbols stay fast.
+    """
+
+    def __init__(self, initial_balance: float = 10000.0):
+        """
+        Initialize portfolio backtester.
+
+        Args:
+            initial_balance: Starting capital shared by all assets
+        """
+        self.initial_balance = initial_balance
+        self.balance = initial_balance
+        self.symbols: list = []
+        self.trades: Dict[str, TradeLedger] = {}
+        self.timestamps = np.empty(0, dtype=np.int64)
+        # Portfolio equity and fraction of it held in positions at every bar close
+        self.equity_curve = np.empty(0)
+        self.invested_curve = np.empty(0)
+
+    def run(self, strategies: Any, ohlcv_data: Mapping[str, OHLCVData],
+            weights: Optional[Mapping[str, float]] = None) -> Dict[str, Any]:
+        """
+        Run the backtest on every symbol at once.
+
+        Signals follow Backtester.run_vectorized: an asset is long while its
+        latest non-zero signal is a buy, nothing trades during a symbol's
+        first WARMUP_BARS candles, fills happen at the close and open
+        positions are closed on the last bar. Each entry invests its weight
+        times the current portfolio equity; when cash runs short, all entries
+        of that bar are scaled down to the remaining cash.
+
+        Args:
+            strategies: Strategy instance used for every symbol, or a mapping
+                of symbol to strategy; strategies must support generate_signals()
+            ohlcv_data: Mapping of symbol to its candles (raw rows or OHLCVBuffer)
+            weights: Fraction of equity invested per entry for each symbol
+                (defaults to an equal 1 / number of symbols)
+
+        Returns:
+            Dictionary with portfolio results and an 'assets' DataFrame of per-symbol statistics
+        """
+        self.symbols = list(ohlcv_data)
+        n_assets = len(self.symbols)
+        if not n_assets:
+            raise ValueError("Cannot run a portfolio backtest without symbols")
+        logger.info(f"Starting portfolio backtest of {n_assets} symbols with {self.initial_balance} initial balance")
+
+        timestamps, closes, available = align_closes(ohlcv_data)
+        signals = np.zeros(closes.shape, dtype=np.int8)
+        for asset, symbol in enumerate(self.symbols):
+            strategy = strategies[symbol] if isinstance(strategies, Mapping) else strategies
+            rows = np.flatnonzero(available[:, asset])
+            asset_signals = np.array(strategy.generate_signals(ohlcv_data[symbol]), dtype=np.int8)
+            asset_signals[:WARMUP_BARS - 1] = 0
+            signals[rows, asset] = asset_signals
+
+        weights = weights or {}
+        allocation = np.array([weights.get(symbol, 1.0 / n_assets) for symbol in self.symbols])
+
+        # Long while the most recent non-zero signal of the asset is a buy
+        n_bars = len(timestamps)
+        last_signal = np.where(signals != 0, np.arange(n_bars)[:, None], -1)
+        np.maximum.accumulate(last_signal, axis=0, out=last_signal)
+        in_position = (last_signal >= 0) & (np.take_along_axis(signals, np.maximum(last_signal, 0), axis=0) > 0)
+        was_in_position = np.zeros_like(in_position)
+        was_in_position[1:] = in_position[:-1]
+        entries = in_position & ~was_in_position
+        exits = ~in_position & was_in_position
+
+        # Assets are never held before their first candle, so those prices can read as zero
+        prices = np.nan_to_num(_forward_fill(closes, available), copy=False)
+        events = np.flatnonzero(entries.any(axis=1) | exits.any(axis=1))
+        if not len(events) or events[-1] != n_bars - 1:
+            events = np.append(events, n_bars - 1)
+        # Assets entering and exiting on each event bar, as slices of row-major index lists
+        exit_bars, exit_assets = np.nonzero(exits)
+        entry_bars, entry_assets = np.nonzero(entries)
+        exit_bounds = np.searchsorted(exit_bars, np.append(events, n_bars))
+        entry_bounds = np.searchsorted(entry_bars, np.append(events, n_bars))
+
+        # State after each event bar; row 0 is the state before the first one
+        cash_after = np.empty(len(events) + 1)
+        position_after = np.zeros((len(events) + 1, n_assets))
+        cash_after[0] = self.initial_balance
+
+        fills = []
+        cash = self.initial_balance
+        position = np.zeros(n_assets)
+        entry_price = np.zeros(n_assets)
+        for step, bar in enumerate(events, start=1):
+            price = prices[bar]
+
+            closing = exit_assets[exit_bounds[step - 1]:exit_bounds[step]]
+            closing = closing[position[closing] > 0]
+            if len(closing):
+                cash = self._sell(fills, bar, closing, price, position, entry_price, cash)
+
+            opening = entry_assets[entry_bounds[step - 1]:entry_bounds[step]]
+            if len(opening) and cash > 0:
+                equity = cash + np.dot(position, price)
+                invest = allocation[opening] * equity
+                if invest.sum() > cash:
+                    invest *= cash / invest.sum()
+                sizes = invest / price[opening]
+                balances = cash - np.cumsum(invest)
+                fills.append((bar, opening, BUY, price[opening], sizes, balances, np.full(len(opening), np.nan)))
+                cash = balances[-1]
+                position[opening] = sizes
+                entry_price[opening] = price[opening]
+
+            cash_after[step] = cash
+            position_after[step] = position
+
+        # Close any open positions at the end
+        closing = np.flatnonzero(position > 0)
+        if len(closing):
+            cash = self._sell(fills, n_bars - 1, closing, prices[-1], position, entry_price, cash)
+        self.balance = float(cash)
+        self._record_fills(fills, timestamps)
+
+        self.timestamps = timestamps
+        self._value_curves(prices, events, cash_after, position_after)
+        periods = periods_per_year((timestamps[-1] - timestamps[0]) / (n_bars - 1)) if n_bars > 1 else 0.0
+        return self._calculate_results(periods)
+
+    @staticmethod
+    def _sell(fills: list, bar: int, assets: np.ndarray, price: np.ndarray, position: np.ndarray,
+              entry_price: np.ndarray, cash: float) -> float:
+        """Close the positions of assets at the bar's prices and return the new cash balance."""
+        sizes = position[assets]
+        proceeds = sizes * price[assets]
+        balances = cash + np.cumsum(proceeds)
+        fills.append((bar, assets, SELL, price[assets], sizes, balances, proceeds - sizes * entry_price[assets]))
+        position[assets] = 0.0
+        return balances[-1]
+
+    def _record_fills(self, fills: list, timestamps: np.ndarray) -> None:
+        """Move the fills collected during the simulation into one ledger per symbol."""
+        self.trades = {symbol: TradeLedger(capacity=1) for symbol in self.symbols}
+        if not fills:
+            return
+        counts = [len(fill[1]) for fill in fills]
+        assets = np.concatenate([fill[1] for fill in fills])
+        columns = [np.repeat(timestamps[[fill[0] for fill in fills]], counts),
+                   np.repeat(np.array([fill[2] for fill in fills], dtype=np.int8), counts)]
+        columns += [np.concatenate([fill[field] for fill in fills]) for field in (3, 4, 5, 6)]
+        # Group by asset, keeping each asset's fills in time order
+        order = np.argsort(assets, kind='stable')
+        bounds = np.searchsorted(assets[order], np.arange(len(self.symbols) + 1))
+        for asset, symbol in enumerate(self.symbols):
+            rows = order[bounds[asset]:bounds[asset + 1]]
+            self.trades[symbol].extend(*(column[rows] for column in columns))
+
+    def _value_curves(self, prices: np.ndarray, events: np.ndarray,
+                      cash_after: np.ndarray, position_after: np.ndarray) -> None:
+        """Mark the positions held after each event bar to market on every bar."""
+        n_bars = len(prices)
+        state = np.searchsorted(events, np.arange(n_bars), side='right')
+        self.equity_curve = np.empty(n_bars)
+        self.invested_curve = np.empty(n_bars)
+        for start in range(0, n_bars, EQUITY_CHUNK_BARS):
+            stop = min(start + EQUITY_CHUNK_BARS, n_bars)
+            held = position_after[state[start:stop]]
+            invested = np.einsum('ij,ij->i', held, prices[start:stop])
+            self.equity_curve[start:stop] = cash_after[state[start:stop]] + invested
+            self.invested_curve[start:stop] = invested / self.equity_curve[start:stop]
+
+    def _calculate_results(self, periods: float) -> Dict[str, Any]:
+        """
+        Calculate portfolio results and statistics.
+
+        Args:
+            periods: Bars per year, used to annualize the ratios
+
+        Returns:
+            Dictionary with performance metrics
+        """
+        total_return = self.balance - self.initial_balance
+        return_percentage = (total_return / self.initial_balance) * 100
+
+        assets = []
+        notional = 0.0
+        for symbol, ledger in self.trades.items():
+            profits = ledger.realized_profits
+            wins = int(np.count_nonzero(profits > 0))
+            notional += float(np.sum(ledger.price * ledger.size))
+            assets.append({
+                'symbol': symbol,
+                'total_trades': len(profits),
+                'winning_trades': wins,
+                'losing_trades': int(np.count_nonzero(profits < 0)),
+                'win_rate': wins / len(profits) * 100 if len(profits) else 0,
+                'realized_profit': float(profits.sum()),
+            })
+        import pandas as pd
+        assets = pd.DataFrame(assets).set_index('symbol')
+        total_trades = int(assets['total_trades'].sum())
+        winning_trades = int(assets['winning_trades'].sum())
+
+        returns = bar_returns(self.equity_curve)
+        results = {
+            'initial_balance': self.initial_balance,
+            'final_balance': self.balance,
+            'total_return': total_return,
+            'return_percentage': return_percentage,
+            'total_trades': total_trades,
+            'winning_trades': winning_trades,
+            'losing_trades': int(assets['losing_trades'].sum()),
+            'win_rate': winning_trades / total_trades * 100 if total_trades else 0,
+            'sharpe_ratio': sharpe_ratio(returns, periods),
+            'sortino_ratio': sortino_ratio(returns, periods),
+            'max_drawdown': max_drawdown(self.equity_curve) * 100,
+            'exposure': float(np.count_nonzero(self.invested_curve) / len(self.invested_curve) * 100),
+            'average_invested': float(self.invested_curve.mean() * 100),
+            'turnover': notional / float(self.equity_curve.mean()),
+            'assets': assets,
+        }
+
+        logger.info(f"Portfolio backtest: {len(self.symbols)} symbols, {total_trades} trades, "
+                    f"return {return_percentage:.2f}%, max drawdown {results['max_drawdown']:.2f}%")
+        return results
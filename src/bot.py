@@ -3,148 +3,449 @@ Main trading bot that coordinates exchange connection, strategy execution, and t
 """
 
 import asyncio
-from typing import Dict, Any, Optional
+import time
+import numpy as np
+from typing import Dict, Any, List, Optional, Set, Tuple
 import logging
+from src.data import OHLCVBuffer, timeframe_to_ms
 from src.exchange import ExchangeConnector
+from src.executor import StrategyError, StrategyExecutor
+from src.indicators import IndicatorRegistry
+from src.metrics import REGISTRY, LoopLagMonitor, MetricsServer
+from src.scheduler import CandleScheduler, Clock
 from src.strategies import Strategy
+from src.streaming import MarketDataStream
 
 logger = logging.getLogger(__name__)
 
+STRATEGY_LATENCY = REGISTRY.histogram('mesa_strategy_seconds',
+                                      'Strategy evaluation time per candle', ['market'])
+CANDLE_TO_SIGNAL = REGISTRY.histogram('mesa_candle_close_to_signal_seconds',
+                                      'Time from a candle close to its signal', ['market'])
+SIGNAL_TO_ORDER = REGISTRY.histogram('mesa_signal_to_order_seconds',
+                                     'Time from a signal to the order confirmation', ['market', 'side'])
+SIGNALS = REGISTRY.counter('mesa_signals_total', 'Signals produced on the latest candle', ['market', 'signal'])
+ORDERS = REGISTRY.counter('mesa_orders_total', 'Orders placed', ['market', 'side'])
+ERRORS = REGISTRY.counter('mesa_errors_total', 'Trading loop errors', ['stage'])
+LOOP_LAG = REGISTRY.histogram('mesa_event_loop_lag_seconds', 'Delay of event loop wake-ups')
+
+
+class Market:
+    """
+    One (symbol, timeframe, strategy) combination traded by the bot.
+    """
+    
+    def __init__(self, symbol: str, timeframe: str, strategy: Strategy, amount: float):
+        """
+        Initialize market.
+        
+        Args:
+            symbol: Trading pair symbol (e.g., 'BTC/USDT')
+            timeframe: Candlestick timeframe (e.g., '1m')
+            strategy: Trading strategy instance, not shared with other markets
+            amount: Order size in base currency
+        """
+        self.symbol = symbol
+        self.timeframe = timeframe
+        self.strategy = strategy
+        self.amount = amount
+        self.last_candle_timestamp: Optional[int] = None
+        # Held while candles are processed, so streamed candles are handled one at a time, in order
+        self.lock = asyncio.Lock()
+        
+    def __repr__(self) -> str:
+        return f"{self.symbol} {self.timeframe} {self.strategy.name}"
+
 
 class TradingBot:
     """
     Main trading bot class that executes strategies in real-time.
+    
+    A bot can trade many markets at once over a single exchange connection.
+    Each timeframe runs its own loop that wakes just after every candle
+    close. A cycle fetches only the candles since the last one seen for
+    every (symbol, timeframe), in parallel, and each symbol is processed as
+    soon as its own data arrives. In streaming mode (trading config
+    'data_mode': 'stream') the bot instead reacts to each closed candle
+    pushed by the connector's market data stream, processing every market
+    in a task of its own so a slow order never holds up the stream.
     """
     
     def __init__(self, exchange_config: Dict[str, Any], 
                  trading_config: Dict[str, Any], 
-                 strategy: Strategy):
+                 strategy: Optional[Strategy] = None,
+                 exchange: Optional[ExchangeConnector] = None,
+                 clock: Optional[Clock] = None):
         """
         Initialize trading bot.
         
         Args:
             exchange_config: Exchange configuration
             trading_config: Trading parameters
-            strategy: Trading strategy instance
+            strategy: Trading strategy for the configured symbol and timeframe;
+                more markets can be added with add_market()
+            exchange: Optional connector shared with other bots
+            clock: Optional clock driving the schedule (defaults to the wall clock)
         """
-        self.exchange = ExchangeConnector(exchange_config)
+        self._owns_exchange = exchange is None
+        self.exchange = exchange or ExchangeConnector(exchange_config)
         self.trading_config = trading_config
-        self.strategy = strategy
         self.symbol = trading_config.get('symbol', 'BTC/USDT')
         self.timeframe = trading_config.get('timeframe', '1m')
         self.amount = trading_config.get('amount', 0.001)
+        self.history_size = trading_config.get('history_size', 1000)
+        self.fetch_timeout = trading_config.get('fetch_timeout', 10.0)
+        self.close_grace = trading_config.get('close_grace', 1.0)
+        self.data_mode = trading_config.get('data_mode', 'poll')
+        self.metrics_port = trading_config.get('metrics_port')
+        self.metrics_server: Optional[MetricsServer] = None
+        self.clock = clock or Clock()
         self.is_running = False
+        self.markets: List[Market] = []
+        self.schedulers: Dict[str, CandleScheduler] = {}
+        self._candles: Dict[Tuple[str, str], OHLCVBuffer] = {}
+        # Indicator series shared by the strategies trading the same candles
+        self.indicators = IndicatorRegistry(capacity=self.history_size)
+        # Strategies run inline, on threads or on warm worker processes
+        self.executor = StrategyExecutor(trading_config.get('strategy_executor', 'inline'),
+                                         trading_config.get('executor_workers'),
+                                         capacity=self.history_size)
+        self.loop_lag_monitor: Optional[LoopLagMonitor] = None
+        if trading_config.get('loop_lag_interval', 0.5):
+            self.loop_lag_monitor = LoopLagMonitor(LOOP_LAG, trading_config.get('loop_lag_interval', 0.5),
+                                                   trading_config.get('loop_lag_warning', 0.25))
+        self._tickers: Dict[str, Dict[str, Any]] = {}
+        self.stream: Optional[MarketDataStream] = None
+        self._tasks: List[asyncio.Task] = []
+        if strategy is not None:
+            self.add_market(self.symbol, self.timeframe, strategy, self.amount)
+        
+    def add_market(self, symbol: str, timeframe: str, strategy: Strategy,
+                   amount: Optional[float] = None) -> Market:
+        """
+        Trade a strategy on another symbol and timeframe.
+        
+        Args:
+            symbol: Trading pair symbol
+            timeframe: Candlestick timeframe
+            strategy: Trading strategy instance
+            amount: Order size in base currency (defaults to the configured amount)
+            
+        Returns:
+            The registered market
+        """
+        market = Market(symbol, timeframe, strategy, self.amount if amount is None else amount)
+        strategy.bind(symbol, timeframe, self.indicators)
+        self.markets.append(market)
+        if (symbol, timeframe) not in self._candles:
+            self._candles[(symbol, timeframe)] = OHLCVBuffer(capacity=self.history_size)
+        return market
+    
+    @property
+    def strategy(self) -> Optional[Strategy]:
+        """Strategy of the first market."""
+        return self.markets[0].strategy if self.markets else None
+    
+    @property
+    def candles(self) -> Optional[OHLCVBuffer]:
+        """Candle buffer of the first market."""
+        if not self.markets:
+            return None
+        return self._candles[(self.markets[0].symbol, self.markets[0].timeframe)]
+    
+    def get_candles(self, symbol: str, timeframe: str) -> OHLCVBuffer:
+        """
+        Get the local candle buffer of a symbol and timeframe.
+        
+        Returns:
+            Candle buffer shared by the markets trading that symbol and timeframe
+        """
+        return self._candles[(symbol, timeframe)]
         
     async def start(self) -> None:
         """Start the trading bot."""
-        logger.info(f"Starting trading bot for {self.symbol}")
+        logger.info(f"Starting trading bot for {', '.join(repr(m) for m in self.markets)}")
         
         try:
-            # Connect to exchange
-            await self.exchange.connect()
+            # Connect to exchange, unless a shared connector is already connected
+            if self._owns_exchange or self.exchange.exchange is None:
+                await self.exchange.connect()
+            
+            if self.metrics_port is not None:
+                self.metrics_server = MetricsServer(
+                    REGISTRY, self.trading_config.get('metrics_host', '127.0.0.1'), self.metrics_port
+                )
+                await self.metrics_server.start()
+            if self.loop_lag_monitor is not None:
+                self.loop_lag_monitor.start()
             
-            # Main trading loop
             self.is_running = True
-            while self.is_running:
-                await self._trading_loop()
-                
-                # Wait before next iteration
-                await asyncio.sleep(60)  # Check every minute
+            if self.data_mode == 'stream':
+                self._tasks = [asyncio.ensure_future(self._run_stream())]
+            else:
+                # One loop per timeframe, each aligned to its candle closes
+                timeframes = sorted({market.timeframe for market in self.markets})
+                self._tasks = [asyncio.ensure_future(self._run_timeframe(tf)) for tf in timeframes]
+            await asyncio.gather(*self._tasks)
                 
+        except asyncio.CancelledError:
+            if self.is_running:
+                raise
         except Exception as e:
             logger.error(f"Error in trading bot: {e}")
             raise
         finally:
-            await self.exchange.disconnect()
+            if self.loop_lag_monitor is not None:
+                await self.loop_lag_monitor.stop()
+            if self.metrics_server is not None:
+                await self.metrics_server.stop()
+            self.executor.close()
+            if self._owns_exchange:
+                await self.exchange.disconnect()
     
     async def stop(self) -> None:
         """Stop the trading bot."""
         logger.info("Stopping trading bot")
         self.is_running = False
+        for task in self._tasks:
+            task.cancel()
+    
+    async def _run_timeframe(self, timeframe: str) -> None:
+        """Run trading cycles for one timeframe just after each candle close."""
+        scheduler = CandleScheduler(timeframe, grace=self.close_grace, clock=self.clock)
+        self.schedulers[timeframe] = scheduler
+        while self.is_running:
+            await self._trading_loop(timeframe)
+            await scheduler.wait()
+            if scheduler.last_drift or scheduler.missed_cycles:
+                logger.debug("%s cycle drift: %.3fs, missed cycles: %d",
+                             timeframe, scheduler.last_drift, scheduler.missed_cycles)
     
-    async def _trading_loop(self) -> None:
-        """Execute one iteration of the trading loop."""
+    async def _run_stream(self) -> None:
+        """React to market data updates pushed by the connector."""
+        # Load history over REST first; the stream backfills anything newer
+        await self._trading_loop()
+        last_timestamps = {}
+        for market in self.markets:
+            key = (market.symbol, market.timeframe)
+            if market.last_candle_timestamp is not None:
+                last_timestamps[key] = max(last_timestamps.get(key, 0), market.last_candle_timestamp)
+        
+        self.stream = self.exchange.stream_market_data(
+            list(self._candles), sorted({market.symbol for market in self.markets}),
+            last_timestamps=last_timestamps, clock=self.clock
+        )
+        processing: Set[asyncio.Task] = set()
         try:
-            # Fetch market data
-            ohlcv_data = await self.exchange.fetch_ohlcv(
-                self.symbol, 
-                self.timeframe, 
-                limit=100
+            async for update in self.stream:
+                if not self.is_running:
+                    break
+                if update['type'] == 'ticker':
+                    self._tickers[update['symbol']] = update['ticker']
+                    continue
+                
+                key = (update['symbol'], update['timeframe'])
+                candles = self._candles[key]
+                candles.append(update['candle'])
+                for market in self.markets:
+                    if (market.symbol, market.timeframe) == key:
+                        task = asyncio.ensure_future(self._process_market_in_order(market, candles, update['candle'][0]))
+                        processing.add(task)
+                        task.add_done_callback(processing.discard)
+        finally:
+            for task in processing:
+                task.cancel()
+            await asyncio.gather(*processing, return_exceptions=True)
+    
+    async def _process_market_in_order(self, market: Market, candles: OHLCVBuffer,
+                                       closed_before: int) -> None:
+        """Process a market once the updates dispatched for it before have been handled."""
+        # asyncio.Lock wakes its waiters first in, first out
+        async with market.lock:
+            await self._process_market(market, candles, closed_before)
+    
+    async def _trading_loop(self, timeframe: Optional[str] = None) -> None:
+        """
+        Execute one iteration of the trading loop.
+        
+        Args:
+            timeframe: Only run markets of this timeframe (defaults to all markets)
+        """
+        groups: Dict[Tuple[str, str], List[Market]] = {}
+        for market in self.markets:
+            if timeframe is None or market.timeframe == timeframe:
+                groups.setdefault((market.symbol, market.timeframe), []).append(market)
+        
+        # One fetch per symbol and timeframe, all in flight together
+        await asyncio.gather(*(
+            self._process_markets(symbol, timeframe, markets)
+            for (symbol, timeframe), markets in groups.items()
+        ))
+    
+    async def _process_markets(self, symbol: str, timeframe: str,
+                               markets: List[Market]) -> None:
+        """Fetch candles for one symbol and timeframe and run its strategies."""
+        try:
+            # Fetch only candles since the last one seen, which may have been
+            # forming at the previous fetch, and merge them into the buffer
+            candles = self._candles[(symbol, timeframe)]
+            await asyncio.wait_for(
+                self.exchange.fetch_ohlcv_buffer(symbol, timeframe, limit=100,
+                                                 since=candles.last_timestamp, buffer=candles),
+                timeout=self.fetch_timeout
             )
+        except asyncio.TimeoutError:
+            ERRORS.inc(stage='fetch_timeout')
+            logger.warning(f"Timed out fetching {symbol} {timeframe}, skipping this cycle")
+            return
+        except Exception as e:
+            ERRORS.inc(stage='fetch')
+            logger.error(f"Error fetching {symbol} {timeframe}: {e}")
+            return
+        
+        # Candles that opened a full timeframe ago have closed
+        closed_before = int(self.clock.time() * 1000) - timeframe_to_ms(timeframe)
+        for market in markets:
+            await self._process_market(market, candles, closed_before)
+    
+    async def _process_market(self, market: Market, candles: OHLCVBuffer,
+                              closed_before: int) -> None:
+        """Feed new closed candles to one market's strategy and act on its signal."""
+        try:
+            # Candles that are still forming are not fed
+            timestamps = candles.timestamp
+            timestamps = timestamps[:int(np.searchsorted(timestamps, closed_before, side='right'))]
+            start = 0
+            if market.last_candle_timestamp is not None:
+                start = int(np.searchsorted(timestamps, market.last_candle_timestamp, side='right'))
+            if start >= len(timestamps):
+                logger.debug("No new closed candles for %s", market)
+                return
             
-            # Get signal from strategy
-            signal = await self.strategy.analyze(ohlcv_data)
+            # Feed new candles to the strategy, acting only on the latest signal
+            label = repr(market)
+            signal = await self._evaluate(market, candles[:len(timestamps)], start)
+            signal_time = time.perf_counter()
+            SIGNALS.inc(market=label, signal=signal)
+            close_time = (market.last_candle_timestamp + timeframe_to_ms(market.timeframe)) / 1000
+            CANDLE_TO_SIGNAL.observe(max(self.clock.time() - close_time, 0.0), market=label)
             
             # Execute trades based on signal
             if signal == 'buy':
-                await self._execute_buy()
+                await self._execute_buy(market, signal_time)
             elif signal == 'sell':
-                await self._execute_sell()
+                await self._execute_sell(market, signal_time)
             else:
-                logger.debug(f"Signal: {signal}, no action taken")
+                logger.debug("%s signal: %s, no action taken", market, signal)
                 
         except Exception as e:
-            logger.error(f"Error in trading loop: {e}")
+            ERRORS.inc(stage='strategy')
+            logger.error(f"Error in trading loop for {market}: {e}")
     
-    async def _execute_buy(self) -> None:
-        """Execute buy order."""
+    async def _evaluate(self, market: Market, closed: OHLCVBuffer, start: int) -> str:
+        """
+        Feed closed[start:] to a market's strategy and record them as fed.
+        
+        Returns:
+            Signal of the last candle
+        """
+        try:
+            signal, durations = await self.executor.evaluate(market.strategy, closed[start:], closed)
+        except StrategyError as e:
+            # Candles up to the failing one reached the strategy; the rest follow next cycle
+            if e.fed:
+                market.last_candle_timestamp = int(closed.timestamp[start + e.fed - 1])
+            raise
+        label = repr(market)
+        for seconds in durations:
+            STRATEGY_LATENCY.observe(seconds, market=label)
+        market.last_candle_timestamp = int(closed.timestamp[-1])
+        return signal
+    
+    async def _current_price(self, symbol: str) -> float:
+        """Get the latest price, from the streamed ticker when there is one."""
+        ticker = self._tickers.get(symbol)
+        if ticker is None:
+            ticker = await self.exchange.fetch_ticker(symbol)
+        return ticker['last']
+    
+    async def _execute_buy(self, market: Market, signal_time: Optional[float] = None) -> None:
+        """
+        Execute buy order.
+        
+        Args:
+            market: Market to trade
+            signal_time: perf_counter() time of the signal, for latency metrics
+        """
         try:
             # Check if already in position
-            position = self.strategy.get_position()
+            position = market.strategy.get_position()
             if position['position'] == 'long':
-                logger.info("Already in long position, skipping buy")
+                logger.info(f"Already in long position on {market}, skipping buy")
                 return
             
             # Get current price
-            ticker = await self.exchange.fetch_ticker(self.symbol)
-            current_price = ticker['last']
+            current_price = await self._current_price(market.symbol)
             
             # Create market buy order
-            logger.info(f"Executing BUY order: {self.amount} {self.symbol} at ~{current_price}")
+            logger.info(f"Executing BUY order: {market.amount} {market.symbol} at ~{current_price}")
             order = await self.exchange.create_market_order(
-                self.symbol, 
+                market.symbol, 
                 'buy', 
-                self.amount
+                market.amount
             )
             
             # Update strategy position
-            self.strategy.set_position('long', current_price)
+            market.strategy.set_position('long', current_price)
             logger.info(f"BUY order executed: {order['id']}")
+            ORDERS.inc(market=repr(market), side='buy')
+            if signal_time is not None:
+                SIGNAL_TO_ORDER.observe(time.perf_counter() - signal_time, market=repr(market), side='buy')
             
         except Exception as e:
+            ERRORS.inc(stage='order')
             logger.error(f"Error executing buy order: {e}")
     
-    async def _execute_sell(self) -> None:
-        """Execute sell order."""
+    async def _execute_sell(self, market: Market, signal_time: Optional[float] = None) -> None:
+        """
+        Execute sell order.
+        
+        Args:
+            market: Market to trade
+            signal_time: perf_counter() time of the signal, for latency metrics
+        """
         try:
             # Check if in position
-            position = self.strategy.get_position()
+            position = market.strategy.get_position()
             if position['position'] != 'long':
-                logger.info("No long position to close, skipping sell")
+                logger.info(f"No long position to close on {market}, skipping sell")
                 return
             
             # Get current price
-            ticker = await self.exchange.fetch_ticker(self.symbol)
-            current_price = ticker['last']
+            current_price = await self._current_price(market.symbol)
             
             # Calculate profit
             entry_price = position['entry_price']
             profit_pct = ((current_price - entry_price) / entry_price) * 100
             
             # Create market sell order
-            logger.info(f"Executing SELL order: {self.amount} {self.symbol} at ~{current_price}")
+            logger.info(f"Executing SELL order: {market.amount} {market.symbol} at ~{current_price}")
             logger.info(f"Profit: {profit_pct:.2f}%")
             order = await self.exchange.create_market_order(
-                self.symbol, 
+                market.symbol, 
                 'sell', 
-                self.amount
+                market.amount
             )
             
             # Update strategy position
-            self.strategy.set_position(None)
+            market.strategy.set_position(None)
             logger.info(f"SELL order executed: {order['id']}")
+            ORDERS.inc(market=repr(market), side='sell')
+            if signal_time is not None:
+                SIGNAL_TO_ORDER.observe(time.perf_counter() - signal_time, market=repr(market), side='sell')
             
         except Exception as e:
+            ERRORS.inc(stage='order')
             logger.error(f"Error executing sell order: {e}")
     
     async def get_account_info(self) -> Dict[str, Any]:
@@ -155,9 +456,10 @@ class TradingBot:
             Dictionary with account information
         """
         balance = await self.exchange.fetch_balance()
-        position = self.strategy.get_position()
+        position = self.strategy.get_position() if self.strategy else None
         
         return {
             'balance': balance,
-            'position': position
+            'position': position,
+            'positions': {repr(market): market.strategy.get_position() for market in self.markets}
         }
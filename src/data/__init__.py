@@ -0,0 +1,337 @@
+"""
+Columnar OHLCV candle storage shared by the exchange connector, bot,
+strategies and backtester.
+"""
+
+from typing import TYPE_CHECKING, Iterator, List, Optional, Sequence, Union
+import numpy as np
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+COLUMNS = ('timestamp', 'open', 'high', 'low', 'close', 'volume')
+
+# Rows converted to Python lists at a time when iterating a buffer
+_ITER_CHUNK = 65536
+
+_TIMEFRAME_UNITS_MS = {
+    's': 1000,
+    'm': 60 * 1000,
+    'h': 60 * 60 * 1000,
+    'd': 24 * 60 * 60 * 1000,
+    'w': 7 * 24 * 60 * 60 * 1000,
+    'M': 30 * 24 * 60 * 60 * 1000,
+    'y': 365 * 24 * 60 * 60 * 1000,
+}
+
+
+def timeframe_to_ms(timeframe: str) -> int:
+    """
+    Convert a ccxt timeframe string to its duration in milliseconds.
+
+    Args:
+        timeframe: Candlestick timeframe (e.g., '1m', '5m', '1h', '1d')
+
+    Returns:
+        Candle duration in milliseconds
+    """
+    amount, unit = timeframe[:-1], timeframe[-1]
+    if unit not in _TIMEFRAME_UNITS_MS or not amount.isdigit():
+        raise ValueError(f"Unsupported timeframe: {timeframe}")
+    return int(amount) * _TIMEFRAME_UNITS_MS[unit]
+
+
+class OHLCVBuffer:
+    """
+    Columnar candle container backed by a ring buffer.
+
+    Timestamps are stored as int64 milliseconds and prices/volumes as
+    float64 columns. Every slot of the ring is written twice (at i and
+    i + capacity) so the stored candles are always contiguous in memory:
+    column accessors and windows are zero-copy views, and appends never
+    reallocate. Once the buffer is full the oldest candle is dropped.
+    """
+
+    def __init__(self, capacity: int = 1000):
+        """
+        Initialize an empty buffer.
+
+        Args:
+            capacity: Maximum number of candles kept
+        """
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        self.capacity = capacity
+        self._timestamps = np.zeros(2 * capacity, dtype=np.int64)
+        self._columns = list(np.zeros((5, 2 * capacity), dtype=np.float64))
+        self._head = 0
+        self._length = 0
+        self._writable = True
+
+    @classmethod
+    def from_ohlcv(cls, ohlcv_data: Sequence[Sequence[float]],
+                   capacity: Optional[int] = None) -> 'OHLCVBuffer':
+        """
+        Build a buffer from raw OHLCV rows.
+
+        Args:
+            ohlcv_data: OHLCV data [[timestamp, open, high, low, close, volume], ...]
+            capacity: Buffer capacity, defaults to the number of rows
+
+        Returns:
+            New OHLCVBuffer holding the rows
+        """
+        buffer = cls(capacity or max(len(ohlcv_data), 1))
+        if len(ohlcv_data):
+            data = np.asarray(ohlcv_data, dtype=np.float64)
+            buffer._write(data[:, 0].astype(np.int64), data[:, 1:].T)
+        return buffer
+
+    @classmethod
+    def from_arrays(cls, timestamp: np.ndarray, open: np.ndarray, high: np.ndarray,
+                    low: np.ndarray, close: np.ndarray, volume: np.ndarray) -> 'OHLCVBuffer':
+        """
+        Build a buffer from column arrays, copying them into a new ring.
+
+        Returns:
+            New OHLCVBuffer holding the candles
+        """
+        buffer = cls(max(len(timestamp), 1))
+        if len(timestamp):
+            buffer._write(np.asarray(timestamp, dtype=np.int64), [open, high, low, close, volume])
+        return buffer
+
+    @classmethod
+    def wrap(cls, timestamp: np.ndarray, open: np.ndarray, high: np.ndarray,
+             low: np.ndarray, close: np.ndarray, volume: np.ndarray) -> 'OHLCVBuffer':
+        """
+        Wrap existing column arrays as a read-only buffer without copying.
+
+        Useful for candles living in shared or memory-mapped arrays.
+
+        Args:
+            timestamp: int64 array of candle timestamps in milliseconds
+            open, high, low, close, volume: float64 arrays of the same length
+
+        Returns:
+            Read-only OHLCVBuffer view
+        """
+        buffer = cls.__new__(cls)
+        buffer.capacity = len(timestamp)
+        buffer._timestamps = timestamp
+        buffer._columns = [open, high, low, close, volume]
+        buffer._head = 0
+        buffer._length = len(timestamp)
+        buffer._writable = False
+        return buffer
+
+    def _bounds(self):
+        """Return the [start, end) range of the stored candles in the storage arrays."""
+        if not self._writable:
+            return 0, self._length
+        end = self._head + self.capacity
+        return end - self._length, end
+
+    def _write(self, timestamps: np.ndarray, values: np.ndarray) -> None:
+        """Append candles given as a timestamp array and five value columns."""
+        if len(timestamps) > self.capacity:
+            timestamps = timestamps[-self.capacity:]
+            values = [column[-self.capacity:] for column in values]
+        slots = (self._head + np.arange(len(timestamps))) % self.capacity
+        for offset in (0, self.capacity):
+            self._timestamps[slots + offset] = timestamps
+            for column, column_values in zip(self._columns, values):
+                column[slots + offset] = column_values
+        self._head = (self._head + len(timestamps)) % self.capacity
+        self._length = min(self._length + len(timestamps), self.capacity)
+
+    def append(self, candle: Sequence[float]) -> None:
+        """
+        Append one candle.
+
+        A candle with the same timestamp as the newest stored candle replaces
+        it (e.g. a candle that was still forming when first fetched). Candles
+        older than the newest stored candle are ignored.
+
+        Args:
+            candle: OHLCV candle [timestamp, open, high, low, close, volume]
+        """
+        if not self._writable:
+            raise ValueError("Cannot append to a read-only OHLCV view")
+
+        timestamp = int(candle[0])
+        if self._length:
+            _, end = self._bounds()
+            last_timestamp = self._timestamps[end - 1]
+            if timestamp < last_timestamp:
+                return
+            if timestamp == last_timestamp:
+                self._set_values((self._head - 1) % self.capacity, candle)
+                return
+
+        self._timestamps[self._head] = timestamp
+        self._timestamps[self._head + self.capacity] = timestamp
+        self._set_values(self._head, candle)
+        self._head = (self._head + 1) % self.capacity
+        self._length = min(self._length + 1, self.capacity)
+
+    def _set_values(self, slot: int, candle: Sequence[float]) -> None:
+        """Write the price and volume fields of a candle into both copies of a slot."""
+        for column, value in zip(self._columns, candle[1:6]):
+            column[slot] = value
+            column[slot + self.capacity] = value
+
+    def extend(self, ohlcv_data: Sequence[Sequence[float]]) -> None:
+        """
+        Append several candles in chronological order.
+
+        Args:
+            ohlcv_data: OHLCV rows, see append() for merge rules
+        """
+        for candle in ohlcv_data:
+            self.append(candle)
+
+    def window(self, size: int) -> 'OHLCVBuffer':
+        """
+        Get a zero-copy, read-only view of the most recent candles.
+
+        Args:
+            size: Number of candles in the window
+
+        Returns:
+            OHLCVBuffer view sharing memory with this buffer
+        """
+        return self[max(self._length - size, 0):]
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[List, 'OHLCVBuffer']:
+        """
+        Get a candle as a list, or a zero-copy view for a contiguous slice.
+        """
+        start, end = self._bounds()
+        if isinstance(index, slice):
+            first, last, step = index.indices(self._length)
+            if step != 1:
+                raise ValueError("OHLCV views do not support slice steps")
+            last = max(first, last)
+            return OHLCVBuffer.wrap(self._timestamps[start + first:start + last],
+                                    *(column[start + first:start + last] for column in self._columns))
+
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("OHLCV index out of range")
+        position = start + index
+        return [int(self._timestamps[position])] + [float(column[position]) for column in self._columns]
+
+    def __iter__(self) -> Iterator[List]:
+        start, end = self._bounds()
+        # Convert a chunk at a time so long buffers are not duplicated as Python lists
+        for chunk in range(start, end, _ITER_CHUNK):
+            stop = min(chunk + _ITER_CHUNK, end)
+            columns = [self._timestamps[chunk:stop].tolist()]
+            columns += [column[chunk:stop].tolist() for column in self._columns]
+            for row in zip(*columns):
+                yield list(row)
+
+    def _column(self, row: int) -> np.ndarray:
+        start, end = self._bounds()
+        return self._columns[row][start:end]
+
+    @property
+    def timestamp(self) -> np.ndarray:
+        """Candle open times in milliseconds (zero-copy view)."""
+        start, end = self._bounds()
+        return self._timestamps[start:end]
+
+    @property
+    def open(self) -> np.ndarray:
+        """Open prices (zero-copy view)."""
+        return self._column(0)
+
+    @property
+    def high(self) -> np.ndarray:
+        """High prices (zero-copy view)."""
+        return self._column(1)
+
+    @property
+    def low(self) -> np.ndarray:
+        """Low prices (zero-copy view)."""
+        return self._column(2)
+
+    @property
+    def close(self) -> np.ndarray:
+        """Close prices (zero-copy view)."""
+        return self._column(3)
+
+    @property
+    def volume(self) -> np.ndarray:
+        """Volumes (zero-copy view)."""
+        return self._column(4)
+
+    @property
+    def last_timestamp(self) -> Optional[int]:
+        """Timestamp of the newest candle, or None when empty."""
+        if not self._length:
+            return None
+        _, end = self._bounds()
+        return int(self._timestamps[end - 1])
+
+    def copy(self, capacity: Optional[int] = None) -> 'OHLCVBuffer':
+        """
+        Copy the stored candles into a new writable buffer.
+
+        Args:
+            capacity: Capacity of the new buffer, defaults to this buffer's size
+
+        Returns:
+            New OHLCVBuffer
+        """
+        buffer = OHLCVBuffer(capacity or max(self._length, 1))
+        if self._length:
+            start, end = self._bounds()
+            buffer._write(self._timestamps[start:end], [column[start:end] for column in self._columns])
+        return buffer
+
+    def to_list(self) -> List[List]:
+        """
+        Convert to raw OHLCV rows.
+
+        Returns:
+            List of OHLCV data [[timestamp, open, high, low, close, volume], ...]
+        """
+        return list(self)
+
+    def to_dataframe(self) -> 'pd.DataFrame':
+        """
+        Convert to a pandas DataFrame.
+
+        Returns:
+            DataFrame with columns: timestamp, open, high, low, close, volume
+        """
+        import pandas as pd
+        start, end = self._bounds()
+        data = {'timestamp': pd.to_datetime(self._timestamps[start:end], unit='ms')}
+        for name, column in zip(COLUMNS[1:], self._columns):
+            data[name] = column[start:end]
+        return pd.DataFrame(data)
+
+
+OHLCVData = Union[List[List], OHLCVBuffer]
+
+
+def as_ohlcv_buffer(ohlcv_data: OHLCVData) -> OHLCVBuffer:
+    """
+    Return ohlcv_data as an OHLCVBuffer, converting raw rows if needed.
+
+    Args:
+        ohlcv_data: OHLCVBuffer or raw OHLCV rows
+
+    Returns:
+        OHLCVBuffer (the same object when one is passed in)
+    """
+    if isinstance(ohlcv_data, OHLCVBuffer):
+        return ohlcv_data
+    return OHLCVBuffer.from_ohlcv(ohlcv_data)
@@ -0,0 +1,320 @@
+"""
+Persistent local candle store.
+Keeps OHLCV history on disk in a binary columnar layout that is
+memory-mapped on load, and syncs only candles missing from the stored range.
+"""
+
+from pathlib import Path
+from typing import Optional, Sequence, Tuple, Union
+import logging
+import os
+import shutil
+import time
+import numpy as np
+from . import COLUMNS, OHLCVBuffer, timeframe_to_ms
+
+logger = logging.getLogger(__name__)
+
+_DTYPES = {'timestamp': np.dtype('<i8')}
+_DTYPES.update({name: np.dtype('<f8') for name in COLUMNS[1:]})
+
+
+def _increasing(timestamps: np.ndarray) -> np.ndarray:
+    """Mask keeping each timestamp that is newer than every one before it."""
+    keep = np.ones(len(timestamps), dtype=bool)
+    keep[1:] = timestamps[1:] > np.maximum.accumulate(timestamps)[:-1]
+    return keep
+
+
+class CandleStore:
+    """
+    On-disk OHLCV store keyed by exchange, symbol and timeframe.
+
+    Each series lives in its own directory with one raw little-endian file
+    per column (int64 timestamps, float64 prices and volumes). Files are
+    appended to and are memory-mapped when loaded, so multi-year histories
+    are read without copying them into memory. Only backfilling candles
+    older than the stored range rewrites a series.
+    """
+
+    def __init__(self, root: Union[str, Path] = 'data/candles'):
+        """
+        Initialize candle store.
+
+        Args:
+            root: Directory holding the stored series
+        """
+        self.root = Path(root)
+
+    def path(self, exchange: str, symbol: str, timeframe: str) -> Path:
+        """
+        Get the directory of one series.
+
+        Args:
+            exchange: Exchange name (e.g., 'binance')
+            symbol: Trading pair symbol (e.g., 'BTC/USDT')
+            timeframe: Candlestick timeframe (e.g., '1m')
+
+        Returns:
+            Directory path for the series
+        """
+        safe_symbol = symbol.replace('/', '-').replace(':', '_')
+        return self.root / exchange / safe_symbol / timeframe
+
+    def count(self, exchange: str, symbol: str, timeframe: str) -> int:
+        """
+        Get the number of complete candles stored for a series.
+
+        Returns:
+            Number of stored candles
+        """
+        directory = self.path(exchange, symbol, timeframe)
+        sizes = []
+        for name, dtype in _DTYPES.items():
+            file = directory / f'{name}.bin'
+            sizes.append(file.stat().st_size // dtype.itemsize if file.exists() else 0)
+        # An interrupted append can leave columns of different lengths
+        return min(sizes)
+
+    def first_timestamp(self, exchange: str, symbol: str, timeframe: str) -> Optional[int]:
+        """
+        Get the timestamp of the oldest stored candle.
+
+        Returns:
+            Timestamp in milliseconds, or None when nothing is stored
+        """
+        candles = self.load(exchange, symbol, timeframe)
+        return int(candles.timestamp[0]) if len(candles) else None
+
+    def last_timestamp(self, exchange: str, symbol: str, timeframe: str) -> Optional[int]:
+        """
+        Get the timestamp of the newest stored candle.
+
+        Returns:
+            Timestamp in milliseconds, or None when nothing is stored
+        """
+        count = self.count(exchange, symbol, timeframe)
+        if not count:
+            return None
+        timestamps = np.memmap(self.path(exchange, symbol, timeframe) / 'timestamp.bin',
+                               dtype=_DTYPES['timestamp'], mode='r', shape=(count,))
+        return int(timestamps[-1])
+
+    def load(self, exchange: str, symbol: str, timeframe: str,
+             start: Optional[int] = None, end: Optional[int] = None) -> OHLCVBuffer:
+        """
+        Load a series as a read-only, memory-mapped candle buffer.
+
+        Args:
+            exchange: Exchange name
+            symbol: Trading pair symbol
+            timeframe: Candlestick timeframe
+            start: Optional first timestamp to include (milliseconds)
+            end: Optional timestamp to stop before (milliseconds)
+
+        Returns:
+            OHLCVBuffer view over the stored columns
+        """
+        count = self.count(exchange, symbol, timeframe)
+        if not count:
+            return OHLCVBuffer.wrap(np.empty(0, dtype=np.int64), *(np.empty(0) for _ in range(5)))
+
+        directory = self.path(exchange, symbol, timeframe)
+        columns = [
+            np.memmap(directory / f'{name}.bin', dtype=dtype, mode='r', shape=(count,))
+            for name, dtype in _DTYPES.items()
+        ]
+        candles = OHLCVBuffer.wrap(*columns)
+
+        first = 0 if start is None else int(np.searchsorted(candles.timestamp, start, side='left'))
+        last = count if end is None else int(np.searchsorted(candles.timestamp, end, side='left'))
+        return candles[first:last]
+
+    def append(self, exchange: str, symbol: str, timeframe: str,
+               ohlcv_data: Sequence[Sequence[float]]) -> int:
+        """
+        Append candles newer than the last stored one.
+
+        Args:
+            exchange: Exchange name
+            symbol: Trading pair symbol
+            timeframe: Candlestick timeframe
+            ohlcv_data: OHLCV rows in chronological order
+
+        Returns:
+            Number of candles written
+        """
+        last = self.last_timestamp(exchange, symbol, timeframe)
+        if not len(ohlcv_data):
+            return 0
+        data = np.asarray(ohlcv_data, dtype=np.float64)
+        timestamps = data[:, 0].astype(np.int64)
+
+        # Keep strictly increasing timestamps newer than the stored history
+        keep = _increasing(timestamps)
+        if last is not None:
+            keep &= timestamps > last
+        if not keep.any():
+            return 0
+
+        directory = self.path(exchange, symbol, timeframe)
+        directory.mkdir(parents=True, exist_ok=True)
+        self._truncate_partial(directory, self.count(exchange, symbol, timeframe))
+        self._write_rows(directory, timestamps, data, keep)
+        return int(keep.sum())
+
+    def prepend(self, exchange: str, symbol: str, timeframe: str,
+                ohlcv_data: Sequence[Sequence[float]]) -> int:
+        """
+        Insert candles older than the first stored one.
+
+        The series is rewritten into a new directory that then replaces the
+        old one, so an interrupted backfill never leaves mixed columns; at
+        worst the series is missing and is downloaded again by the next sync.
+
+        Args:
+            exchange: Exchange name
+            symbol: Trading pair symbol
+            timeframe: Candlestick timeframe
+            ohlcv_data: OHLCV rows in chronological order
+
+        Returns:
+            Number of candles written
+        """
+        stored = self.load(exchange, symbol, timeframe)
+        if not len(stored):
+            return self.append(exchange, symbol, timeframe, ohlcv_data)
+
+        directory = self.path(exchange, symbol, timeframe)
+        rewritten = self._start_rewrite(directory)
+        try:
+            written, _ = self._write_older(rewritten, ohlcv_data, None, int(stored.timestamp[0]))
+            if written:
+                self._finish_rewrite(directory, rewritten, stored)
+            return written
+        finally:
+            shutil.rmtree(rewritten, ignore_errors=True)
+
+    def _start_rewrite(self, directory: Path) -> Path:
+        """Create an empty sibling directory that a series is rewritten into."""
+        rewritten = directory.with_name(f'{directory.name}.{os.getpid()}.tmp')
+        shutil.rmtree(rewritten, ignore_errors=True)
+        rewritten.mkdir(parents=True)
+        return rewritten
+
+    def _write_older(self, rewritten: Path, ohlcv_data: Sequence[Sequence[float]],
+                     after: Optional[int], before: int) -> Tuple[int, Optional[int]]:
+        """
+        Append a chunk of backfilled candles to a series being rewritten.
+
+        Args:
+            rewritten: Directory the series is rewritten into
+            ohlcv_data: OHLCV rows in chronological order
+            after: Timestamp of the newest candle already written, if any
+            before: Timestamp of the first stored candle
+
+        Returns:
+            Number of candles written and the newest written timestamp
+        """
+        if not len(ohlcv_data):
+            return 0, after
+        data = np.asarray(ohlcv_data, dtype=np.float64)
+        timestamps = data[:, 0].astype(np.int64)
+        keep = _increasing(timestamps) & (timestamps < before)
+        if after is not None:
+            keep &= timestamps > after
+        if not keep.any():
+            return 0, after
+        self._write_rows(rewritten, timestamps, data, keep)
+        return int(keep.sum()), int(timestamps[keep][-1])
+
+    def _finish_rewrite(self, directory: Path, rewritten: Path, stored: OHLCVBuffer) -> None:
+        """Append the stored candles after the backfilled ones and swap the directories."""
+        existing = [stored.timestamp, stored.open, stored.high, stored.low, stored.close, stored.volume]
+        for name, column in zip(_DTYPES, existing):
+            with open(rewritten / f'{name}.bin', 'ab') as f:
+                np.ascontiguousarray(column).tofile(f)
+        del existing
+
+        replaced = directory.with_name(f'{directory.name}.{os.getpid()}.old')
+        os.replace(directory, replaced)
+        os.replace(rewritten, directory)
+        shutil.rmtree(replaced, ignore_errors=True)
+
+    def _write_rows(self, directory: Path, timestamps: np.ndarray, data: np.ndarray, keep: np.ndarray) -> None:
+        """Append the kept rows to every column file."""
+        columns = [timestamps] + [data[:, i] for i in range(1, 6)]
+        for (name, dtype), values in zip(_DTYPES.items(), columns):
+            with open(directory / f'{name}.bin', 'ab') as f:
+                f.write(values[keep].astype(dtype, copy=False).tobytes())
+
+    def _truncate_partial(self, directory: Path, count: int) -> None:
+        """Drop trailing rows left by an interrupted append so all columns align."""
+        for name, dtype in _DTYPES.items():
+            file = directory / f'{name}.bin'
+            if file.exists() and file.stat().st_size != count * dtype.itemsize:
+                with open(file, 'r+b') as f:
+                    f.truncate(count * dtype.itemsize)
+
+    async def sync(self, connector, symbol: str, timeframe: str,
+                   since: Optional[int] = None, limit: int = 1000) -> int:
+        """
+        Download and store closed candles newer than the last stored one.
+
+        Candles from since up to the first stored one are backfilled first
+        when since is older than the stored history.
+
+        Args:
+            connector: Connected ExchangeConnector
+            symbol: Trading pair symbol
+            timeframe: Candlestick timeframe
+            since: Start timestamp (milliseconds) of the history to keep;
+                without it and without stored candles only the latest page
+                of candles is fetched
+            limit: Candles requested per page
+
+        Returns:
+            Number of candles written
+        """
+        exchange = connector.exchange_name
+        timeframe_ms = timeframe_to_ms(timeframe)
+        first = self.first_timestamp(exchange, symbol, timeframe)
+        written = 0
+        if since is not None and first is not None and since < first:
+            written += await self._backfill(connector, symbol, timeframe, since, first, limit)
+            logger.info(f"Backfilled {written} {symbol} {timeframe} candles before {first}")
+
+        last = self.last_timestamp(exchange, symbol, timeframe)
+        cursor = last + timeframe_ms if last is not None else since
+
+        # Only closed candles are stored; the current one is still forming
+        current_open = int(time.time() * 1000) // timeframe_ms * timeframe_ms
+        if cursor is None:
+            ohlcv_data = await connector.fetch_ohlcv(symbol, timeframe, limit=limit)
+            written += self.append(exchange, symbol, timeframe,
+                                   [candle for candle in ohlcv_data if candle[0] < current_open])
+        elif cursor < current_open:
+            async for chunk in connector.fetch_ohlcv_range(symbol, timeframe, cursor, current_open, limit=limit):
+                written += self.append(exchange, symbol, timeframe, chunk)
+
+        logger.info(f"Synced {written} {symbol} {timeframe} candles from {exchange}")
+        return written
+
+    async def _backfill(self, connector, symbol: str, timeframe: str,
+                        since: int, first: int, limit: int) -> int:
+        """Download candles from since up to the first stored one, writing each page as it arrives."""
+        exchange = connector.exchange_name
+        stored = self.load(exchange, symbol, timeframe)
+        directory = self.path(exchange, symbol, timeframe)
+        rewritten = self._start_rewrite(directory)
+        written, newest = 0, None
+        try:
+            async for chunk in connector.fetch_ohlcv_range(symbol, timeframe, since, first, limit=limit):
+                count, newest = self._write_older(rewritten, chunk, newest, first)
+                written += count
+            if written:
+                self._finish_rewrite(directory, rewritten, stored)
+            return written
+        finally:
+            # Removes the partial rewrite when the download fails
+            shutil.rmtree(rewritten, ignore_errors=True)
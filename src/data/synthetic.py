@@ -0,0 +1,45 @@
+"""
+Deterministic synthetic candle series.
+Used by benchmarks and tests that need realistic OHLCV data of any size
+without network access.
+"""
+
+import numpy as np
+from . import OHLCVBuffer, timeframe_to_ms
+
+
+def synthetic_ohlcv(n: int, seed: int = 0, timeframe: str = '1m',
+                    start: int = 1640995200000, price: float = 100.0,
+                    volatility: float = 0.001, drift: float = 0.0) -> OHLCVBuffer:
+    """
+    Generate a geometric random walk of candles.
+
+    The same arguments always produce the same series.
+
+    Args:
+        n: Number of candles
+        seed: Random seed
+        timeframe: Candlestick timeframe of the timestamps
+        start: Timestamp in milliseconds of the first candle
+        price: Open price of the first candle
+        volatility: Standard deviation of the log return per candle
+        drift: Mean log return per candle
+
+    Returns:
+        OHLCVBuffer holding the candles
+    """
+    rng = np.random.default_rng(seed)
+    timestamp = start + np.arange(n, dtype=np.int64) * timeframe_to_ms(timeframe)
+
+    log_returns = rng.normal(drift, volatility, n)
+    close = price * np.exp(np.cumsum(log_returns))
+    open_ = np.empty(n)
+    open_[:1] = price
+    open_[1:] = close[:-1]
+
+    # Wicks extend beyond the body by a fraction of the candle's volatility
+    wick = np.abs(rng.normal(0.0, volatility, (2, n)))
+    high = np.maximum(open_, close) * (1 + wick[0])
+    low = np.minimum(open_, close) * (1 - wick[1])
+    volume = rng.lognormal(2.0, 0.5, n)
+    return OHLCVBuffer.from_arrays(timestamp, open_, high, low, close, volume)
@@ -3,19 +3,87 @@ Exchange connector module using ccxt with asyncio support.
 Handles connection to cryptocurrency exchanges and provides async methods for trading operations.
 """
 
-import ccxt.async_support as ccxt
 import asyncio
-from typing import Optional, Dict, List, Any
+import hashlib
+import importlib
+import json
+import os
+import time
+from pathlib import Path
+from types import ModuleType
+from typing import (TYPE_CHECKING, Optional, Dict, List, Any, AsyncIterator, Awaitable, Callable,
+                    Sequence, Tuple)
 import logging
+from src.data import OHLCVBuffer, timeframe_to_ms
+from src.metrics import REGISTRY
+from src.ratelimit import RateLimiter, backoff_delay
+from src.scheduler import Clock
+from src.streaming import MarketDataStream
+
+if TYPE_CHECKING:
+    import ccxt.async_support as ccxt
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Seconds a response stays cached per endpoint (0 only merges identical in-flight calls)
+DEFAULT_CACHE_TTL = {
+    'ticker': 1.0,
+    'balance': 5.0,
+    'open_orders': 2.0,
+    'ohlcv': 0.0,
+}
+
+REQUEST_LATENCY = REGISTRY.histogram('mesa_exchange_request_seconds',
+                                     'Exchange request round trip time', ['endpoint'])
+QUEUE_WAIT = REGISTRY.histogram('mesa_exchange_queue_wait_seconds',
+                                'Time requests waited for the rate limiter', ['priority'])
+REQUEST_ERRORS = REGISTRY.counter('mesa_exchange_errors_total',
+                                  'Failed exchange requests', ['endpoint', 'error'])
+
+
+def _ccxt() -> ModuleType:
+    """
+    Import ccxt's asyncio API on first use.
+    
+    ccxt takes about a second to import, so it is only loaded once a
+    connector connects or handles an exchange error.
+    """
+    return importlib.import_module('ccxt.async_support')
+
+
+def load_exchange_class(name: str) -> type:
+    """
+    Load a ccxt exchange class by its ccxt id.
+    
+    Args:
+        name: ccxt exchange id (e.g., 'binance')
+        
+    Returns:
+        Exchange class
+    """
+    exchange_class = getattr(_ccxt(), name, None)
+    if not isinstance(exchange_class, type):
+        raise ValueError(f"Unknown exchange: {name}")
+    return exchange_class
+
 
 class ExchangeConnector:
     """
     Async exchange connector using ccxt library.
     Provides methods for fetching market data and executing trades.
+    
+    Read calls (ticker, balance, open orders, OHLCV) go through a small
+    cache: identical calls made while one is in flight share its request
+    (single-flight), and responses are reused for a per-endpoint TTL
+    (config 'cache_ttl', merged over DEFAULT_CACHE_TTL). Balance, open
+    orders and the symbol's ticker are invalidated when our own orders
+    fill or are cancelled. Cached responses are shared between callers and
+    must not be modified.
+    
+    With 'enableRateLimit' on, every request waits for a token from a
+    RateLimiter shared by all connectors of the same account, which serves
+    orders before cancels, account queries and market data. Rejected
+    requests are retried with jittered exponential backoff.
     """
     
     def __init__(self, exchange_config: Dict[str, Any]):
@@ -27,19 +95,48 @@ class ExchangeConnector:
         """
         self.exchange_name = exchange_config.get('name', 'binance')
         self.config = exchange_config
-        self.exchange: Optional[ccxt.Exchange] = None
+        self.exchange: Optional['ccxt.Exchange'] = None
+        self.cache_ttl = {**DEFAULT_CACHE_TTL, **exchange_config.get('cache_ttl', {})}
+        self.cache_stats = {'hits': 0, 'misses': 0, 'coalesced': 0}
+        self._cache: Dict[Tuple, Tuple[float, Any]] = {}
+        self._in_flight: Dict[Tuple, asyncio.Future] = {}
+        self.markets_dir = Path(exchange_config.get('markets_dir', 'data/markets'))
+        self.markets_max_age = exchange_config.get('markets_max_age', 86400)
+        self._markets_refresh: Optional[asyncio.Task] = None
+        self.rate_limiter: Optional[RateLimiter] = None
+        self.max_retries = exchange_config.get('max_retries', 3)
+        
+    async def connect(self, reload_markets: Optional[bool] = None) -> None:
+        """
+        Establish connection to the exchange.
+        
+        Market metadata is read from the local snapshot when there is one,
+        so no download is needed. A snapshot older than config
+        'markets_max_age' seconds is still used and refreshed in the
+        background.
         
-    async def connect(self) -> None:
-        """Establish connection to the exchange."""
+        Args:
+            reload_markets: Download markets even when a snapshot exists
+                (defaults to config 'reload_markets')
+        """
+        if reload_markets is None:
+            reload_markets = self.config.get('reload_markets', False)
         try:
-            exchange_class = getattr(ccxt, self.exchange_name)
+            exchange_class = load_exchange_class(self.exchange_name)
             self.exchange = exchange_class({
                 'apiKey': self.config.get('api_key', ''),
                 'secret': self.config.get('secret', ''),
-                'enableRateLimit': self.config.get('enableRateLimit', True),
+                # Requests are throttled by the shared RateLimiter instead
+                'enableRateLimit': False,
                 'options': self.config.get('options', {})
             })
-            await self.exchange.load_markets()
+            age = None if reload_markets else self._load_markets_snapshot()
+            if age is None:
+                await self.exchange.load_markets(reload=True)
+                self._save_markets_snapshot()
+            elif age > self.markets_max_age:
+                logger.info(f"Markets snapshot is {age:.0f}s old, refreshing in the background")
+                self._markets_refresh = asyncio.ensure_future(self._refresh_markets())
             logger.info(f"Connected to {self.exchange_name}")
         except Exception as e:
             logger.error(f"Failed to connect to exchange: {e}")
@@ -47,10 +144,207 @@ class ExchangeConnector:
     
     async def disconnect(self) -> None:
         """Close exchange connection."""
+        self.invalidate()
+        if self._markets_refresh is not None:
+            self._markets_refresh.cancel()
+            self._markets_refresh = None
         if self.exchange:
             await self.exchange.close()
             logger.info("Exchange connection closed")
     
+    @property
+    def markets_snapshot_path(self) -> Path:
+        """
+        Path of the local market metadata snapshot.
+        
+        The name carries a digest of the ccxt options, since they change
+        the markets an exchange lists (e.g. spot or futures).
+        """
+        encoded = json.dumps(self.config.get('options', {}), sort_keys=True, default=repr).encode()
+        digest = hashlib.blake2b(encoded, digest_size=6).hexdigest()
+        return self.markets_dir / f'{self.exchange_name}-{digest}.json'
+    
+    def _load_markets_snapshot(self) -> Optional[float]:
+        """
+        Load market metadata from the local snapshot into the exchange.
+        
+        Returns:
+            Age of the snapshot in seconds, or None when there is no usable snapshot
+        """
+        path = self.markets_snapshot_path
+        try:
+            age = time.time() - path.stat().st_mtime
+            with open(path, 'r') as f:
+                snapshot = json.load(f)
+            self.exchange.set_markets(snapshot['markets'], snapshot.get('currencies'))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Ignoring unreadable markets snapshot {path}: {e}")
+            return None
+        logger.info(f"Loaded {len(self.exchange.markets)} markets from {path}")
+        return age
+    
+    def _save_markets_snapshot(self) -> None:
+        """Write the exchange's market metadata to the local snapshot."""
+        path = self.markets_snapshot_path
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # Write then rename so readers never see a partial snapshot
+            temporary = path.with_suffix(f'.{os.getpid()}.tmp')
+            with open(temporary, 'w') as f:
+                json.dump({'markets': self.exchange.markets, 'currencies': self.exchange.currencies}, f)
+            os.replace(temporary, path)
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning(f"Could not save markets snapshot {path}: {e}")
+    
+    async def _refresh_markets(self) -> None:
+        """Download fresh market metadata and update the snapshot."""
+        try:
+            await self._request('load_markets', 'market_data',
+                                lambda: self.exchange.load_markets(reload=True))
+            self._save_markets_snapshot()
+            logger.info(f"Refreshed {len(self.exchange.markets)} {self.exchange_name} markets")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Background markets refresh failed, keeping the snapshot: {e}")
+    
+    def _get_rate_limiter(self) -> Optional[RateLimiter]:
+        """Get the account's shared rate limiter, or None when calls are not throttled."""
+        if self.rate_limiter is None and self.config.get('enableRateLimit', True):
+            # Config 'rate_limit' in requests per second, else ccxt's rateLimit (ms per request)
+            rate = self.config.get('rate_limit')
+            if rate is None and getattr(self.exchange, 'rateLimit', 0):
+                rate = 1000 / self.exchange.rateLimit
+            if rate:
+                self.rate_limiter = RateLimiter.shared(
+                    (self.exchange_name, self.config.get('api_key', '')),
+                    rate, self.config.get('rate_limit_burst', 1)
+                )
+        return self.rate_limiter
+    
+    async def _request(self, endpoint: str, priority: str, call: Callable[[], Awaitable[Any]],
+                       idempotent: bool = True) -> Any:
+        """
+        Make one exchange request through the rate limiter, retrying failures.
+        
+        Rate-limit rejections are always retried since the exchange did not
+        act on them; other network errors only for idempotent requests.
+        
+        Round trip times, rate limiter waits and errors are recorded in the
+        metrics registry.
+        
+        Args:
+            endpoint: Endpoint name used in metrics (e.g., 'fetch_ticker')
+            priority: Priority class ('order', 'cancel', 'account' or 'market_data')
+            call: Makes the request
+            idempotent: Whether the request is safe to repeat after a network error
+            
+        Returns:
+            Response of the request
+        """
+        limiter = self._get_rate_limiter()
+        attempt = 0
+        while True:
+            if limiter is not None:
+                wait = await limiter.acquire(priority)
+                QUEUE_WAIT.observe(wait, priority=priority)
+                if wait >= 0.1:
+                    logger.debug(f"{priority} request waited {wait:.3f}s for the rate limiter")
+            started = time.perf_counter()
+            try:
+                result = await call()
+            except Exception as e:
+                REQUEST_ERRORS.inc(endpoint=endpoint, error=type(e).__name__)
+                errors = _ccxt()
+                if isinstance(e, (errors.RateLimitExceeded, errors.DDoSProtection)):
+                    if limiter is not None:
+                        limiter.record_rejection()
+                        limiter.update_from_headers(getattr(self.exchange, 'last_response_headers', None))
+                elif not isinstance(e, errors.NetworkError) or not idempotent:
+                    raise
+                error = e
+            else:
+                REQUEST_LATENCY.observe(time.perf_counter() - started, endpoint=endpoint)
+                if limiter is not None:
+                    limiter.record_success()
+                    limiter.update_from_headers(getattr(self.exchange, 'last_response_headers', None))
+                return result
+            
+            if attempt >= self.max_retries:
+                raise error
+            delay = backoff_delay(attempt)
+            logger.warning(f"{priority} request failed ({error}), retry {attempt + 1}/{self.max_retries} in {delay:.2f}s")
+            await asyncio.sleep(delay)
+            attempt += 1
+    
+    async def _cached(self, endpoint: str, key: Tuple,
+                      fetch: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Get a response from the cache, a matching in-flight request or a new request.
+        
+        Args:
+            endpoint: Endpoint name used to look up the TTL
+            key: Arguments identifying the call
+            fetch: Makes the request when neither cache nor in-flight call can be used
+            
+        Returns:
+            Response of the call
+        """
+        cache_key = (endpoint,) + key
+        entry = self._cache.get(cache_key)
+        if entry is not None:
+            if entry[0] > time.monotonic():
+                self.cache_stats['hits'] += 1
+                return entry[1]
+            del self._cache[cache_key]
+        
+        future = self._in_flight.get(cache_key)
+        if future is None:
+            self.cache_stats['misses'] += 1
+            future = asyncio.ensure_future(fetch())
+            self._in_flight[cache_key] = future
+            future.add_done_callback(lambda f: self._store(cache_key, f))
+        else:
+            self.cache_stats['coalesced'] += 1
+        # A caller timing out must not cancel the request shared with others
+        return await asyncio.shield(future)
+    
+    def _store(self, cache_key: Tuple, future: asyncio.Future) -> None:
+        """Cache a finished request unless it was invalidated while in flight."""
+        if self._in_flight.get(cache_key) is not future:
+            return
+        del self._in_flight[cache_key]
+        ttl = self.cache_ttl.get(cache_key[0], 0)
+        if ttl > 0 and not future.cancelled() and future.exception() is None:
+            self._cache[cache_key] = (time.monotonic() + ttl, future.result())
+    
+    def invalidate(self, endpoint: Optional[str] = None, symbol: Optional[str] = None) -> None:
+        """
+        Drop cached responses so the next call goes to the exchange.
+        
+        Requests already in flight still answer their callers but are not cached.
+        
+        Args:
+            endpoint: Only drop this endpoint (defaults to all)
+            symbol: Only drop calls for this symbol (calls without a symbol are kept)
+        """
+        for entries in (self._cache, self._in_flight):
+            for cache_key in list(entries):
+                if endpoint is not None and cache_key[0] != endpoint:
+                    continue
+                if symbol is not None and (len(cache_key) < 2 or cache_key[1] != symbol):
+                    continue
+                del entries[cache_key]
+    
+    def _order_updated(self, order: Dict[str, Any], symbol: str) -> None:
+        """Invalidate data that our own order changed."""
+        self.invalidate('open_orders')
+        if order.get('filled') or order.get('status') in ('closed', 'canceled'):
+            self.invalidate('balance')
+            self.invalidate('ticker', symbol)
+    
     async def fetch_ticker(self, symbol: str) -> Dict[str, Any]:
         """
         Fetch current ticker for a symbol.
@@ -63,10 +357,13 @@ class ExchangeConnector:
         """
         if not self.exchange:
             raise RuntimeError("Exchange not connected")
-        return await self.exchange.fetch_ticker(symbol)
+        return await self._cached(
+            'ticker', (symbol,),
+            lambda: self._request('fetch_ticker', 'market_data', lambda: self.exchange.fetch_ticker(symbol))
+        )
     
     async def fetch_ohlcv(self, symbol: str, timeframe: str = '1m', 
-                          limit: int = 100) -> List[List]:
+                          limit: int = 100, since: Optional[int] = None) -> List[List]:
         """
         Fetch OHLCV (candlestick) data.
         
@@ -74,13 +371,143 @@ class ExchangeConnector:
             symbol: Trading pair symbol
             timeframe: Candlestick timeframe (e.g., '1m', '5m', '1h')
             limit: Number of candles to fetch
+            since: Optional timestamp in milliseconds of the first candle
             
         Returns:
             List of OHLCV data [[timestamp, open, high, low, close, volume], ...]
         """
         if not self.exchange:
             raise RuntimeError("Exchange not connected")
-        return await self.exchange.fetch_ohlcv(symbol, timeframe, limit=limit)
+        return await self._cached(
+            'ohlcv', (symbol, timeframe, since, limit),
+            lambda: self._request('fetch_ohlcv', 'market_data',
+                                  lambda: self.exchange.fetch_ohlcv(symbol, timeframe, since=since, limit=limit))
+        )
+    
+    async def fetch_ohlcv_range(self, symbol: str, timeframe: str, start: int,
+                                end: Optional[int] = None, limit: int = 1000,
+                                max_concurrency: Optional[int] = None) -> AsyncIterator[List[List]]:
+        """
+        Download a historical range of candles in pages.
+        
+        The range is split into since-based pages that are fetched
+        concurrently. Chunks are yielded in chronological order as soon as
+        every earlier page has arrived, without duplicates. When the exchange
+        returns fewer candles than requested, the rest of the page is
+        fetched from the last candle received so no gaps are left at page
+        edges.
+        
+        Args:
+            symbol: Trading pair symbol
+            timeframe: Candlestick timeframe (e.g., '1m', '5m', '1h')
+            start: Timestamp in milliseconds of the first candle
+            end: Timestamp in milliseconds to stop before (defaults to now)
+            limit: Candles requested per page
+            max_concurrency: Pages in flight at once (config 'max_concurrency', default 4)
+            
+        Yields:
+            Lists of OHLCV data [[timestamp, open, high, low, close, volume], ...]
+        """
+        if not self.exchange:
+            raise RuntimeError("Exchange not connected")
+        
+        timeframe_ms = timeframe_to_ms(timeframe)
+        if end is None:
+            end = int(time.time() * 1000)
+        start = start // timeframe_ms * timeframe_ms
+        page_ms = limit * timeframe_ms
+        
+        concurrency = max_concurrency or self.config.get('max_concurrency', 4)
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        # Requests are paced by the shared rate limiter in fetch_ohlcv
+        async def fetch_page(page_start: int) -> List[List]:
+            page_end = min(page_start + page_ms, end)
+            candles: List[List] = []
+            cursor = page_start
+            async with semaphore:
+                while cursor < page_end:
+                    ohlcv_data = await self.fetch_ohlcv(
+                        symbol, timeframe, limit=(page_end - cursor + timeframe_ms - 1) // timeframe_ms,
+                        since=cursor
+                    )
+                    received = [c for c in ohlcv_data if cursor <= c[0] < page_end]
+                    if not received:
+                        break
+                    candles.extend(received)
+                    cursor = received[-1][0] + timeframe_ms
+            return candles
+        
+        tasks = [asyncio.ensure_future(fetch_page(page_start))
+                 for page_start in range(start, end, page_ms)]
+        logger.info(f"Downloading {symbol} {timeframe} in {len(tasks)} pages ({concurrency} concurrent)")
+        
+        last_timestamp = None
+        try:
+            for task in tasks:
+                chunk = await task
+                if last_timestamp is not None:
+                    chunk = [c for c in chunk if c[0] > last_timestamp]
+                if chunk:
+                    last_timestamp = chunk[-1][0]
+                    yield chunk
+        finally:
+            for task in tasks:
+                task.cancel()
+    
+    async def fetch_ohlcv_buffer(self, symbol: str, timeframe: str = '1m',
+                                 limit: int = 100,
+                                 buffer: Optional[OHLCVBuffer] = None,
+                                 since: Optional[int] = None) -> OHLCVBuffer:
+        """
+        Fetch OHLCV data into a columnar candle buffer.
+        
+        Args:
+            symbol: Trading pair symbol
+            timeframe: Candlestick timeframe (e.g., '1m', '5m', '1h')
+            limit: Number of candles to fetch
+            buffer: Existing buffer to merge the candles into
+            since: Optional timestamp in milliseconds of the first candle
+            
+        Returns:
+            The buffer holding the fetched candles
+        """
+        ohlcv_data = await self.fetch_ohlcv(symbol, timeframe, limit=limit, since=since)
+        if buffer is None:
+            return OHLCVBuffer.from_ohlcv(ohlcv_data, capacity=limit)
+        buffer.extend(ohlcv_data)
+        return buffer
+    
+    def stream_market_data(self, candles: Sequence[Tuple[str, str]],
+                           tickers: Sequence[str] = (),
+                           last_timestamps: Optional[Dict[Tuple[str, str], int]] = None,
+                           clock: Optional[Clock] = None) -> MarketDataStream:
+        """
+        Stream closed candles and ticker updates.
+        
+        Pushes updates from the WebSocket at config 'stream_url' when set,
+        reconnecting automatically, and polls the exchange over REST while
+        the stream is unavailable (or always, without a stream URL).
+        
+        Args:
+            candles: (symbol, timeframe) pairs to receive closed candles for
+            tickers: Symbols to receive ticker updates for
+            last_timestamps: Timestamp of the last candle already seen per
+                (symbol, timeframe), so missed candles are backfilled
+            clock: Optional clock used for sleeps (defaults to the wall clock)
+            
+        Returns:
+            Async iterator of update dictionaries
+        """
+        return MarketDataStream(
+            self, candles, tickers,
+            url=self.config.get('stream_url'),
+            last_timestamps=last_timestamps,
+            reconnect_delay=self.config.get('stream_reconnect_delay', 1.0),
+            max_failures=self.config.get('stream_max_failures', 3),
+            retry_interval=self.config.get('stream_retry_interval', 60.0),
+            clock=clock
+        )
     
     async def fetch_balance(self) -> Dict[str, Any]:
         """
@@ -91,7 +518,10 @@ class ExchangeConnector:
         """
         if not self.exchange:
             raise RuntimeError("Exchange not connected")
-        return await self.exchange.fetch_balance()
+        return await self._cached(
+            'balance', (),
+            lambda: self._request('fetch_balance', 'account', self.exchange.fetch_balance)
+        )
     
     async def create_market_order(self, symbol: str, side: str, 
                                   amount: float) -> Dict[str, Any]:
@@ -110,8 +540,12 @@ class ExchangeConnector:
             raise RuntimeError("Exchange not connected")
         
         logger.info(f"Creating {side} market order for {amount} {symbol}")
-        order = await self.exchange.create_market_order(symbol, side, amount)
+        order = await self._request(
+            'create_market_order', 'order',
+            lambda: self.exchange.create_market_order(symbol, side, amount), idempotent=False
+        )
         logger.info(f"Order created: {order['id']}")
+        self._order_updated(order, symbol)
         return order
     
     async def create_limit_order(self, symbol: str, side: str, 
@@ -132,8 +566,12 @@ class ExchangeConnector:
             raise RuntimeError("Exchange not connected")
         
         logger.info(f"Creating {side} limit order for {amount} {symbol} at {price}")
-        order = await self.exchange.create_limit_order(symbol, side, amount, price)
+        order = await self._request(
+            'create_limit_order', 'order',
+            lambda: self.exchange.create_limit_order(symbol, side, amount, price), idempotent=False
+        )
         logger.info(f"Order created: {order['id']}")
+        self._order_updated(order, symbol)
         return order
     
     async def cancel_order(self, order_id: str, symbol: str) -> Dict[str, Any]:
@@ -151,7 +589,10 @@ class ExchangeConnector:
             raise RuntimeError("Exchange not connected")
         
         logger.info(f"Cancelling order {order_id}")
-        return await self.exchange.cancel_order(order_id, symbol)
+        order = await self._request('cancel_order', 'cancel', lambda: self.exchange.cancel_order(order_id, symbol))
+        # A cancelled order may have been partly filled
+        self._order_updated({**(order or {}), 'status': 'canceled'}, symbol)
+        return order
     
     async def fetch_open_orders(self, symbol: Optional[str] = None) -> List[Dict[str, Any]]:
         """
@@ -165,4 +606,7 @@ class ExchangeConnector:
         """
         if not self.exchange:
             raise RuntimeError("Exchange not connected")
-        return await self.exchange.fetch_open_orders(symbol)
+        return await self._cached(
+            'open_orders', (symbol,),
+            lambda: self._request('fetch_open_orders', 'account', lambda: self.exchange.fetch_open_orders(symbol))
+        )
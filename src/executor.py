@@ -0,0 +1,266 @@
+"""
+Strategy evaluation off the event loop.
+Feeds closed candles to strategies inline, on a thread pool, or on warm
+worker processes that keep every strategy's state between candles.
+"""
+
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import count
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import logging
+import os
+import threading
+import time
+import numpy as np
+from src.data import OHLCVBuffer
+from src.indicators import DEFAULT_CAPACITY, IndicatorRegistry
+from src.strategies import Strategy
+
+logger = logging.getLogger(__name__)
+
+EXECUTION_MODES = ('inline', 'thread', 'process')
+
+# Per-thread event loop running strategy coroutines outside the bot's loop
+_thread_state = threading.local()
+
+# Strategies and shared indicator series living in a worker process
+_worker_strategies: Dict[int, Strategy] = {}
+_worker_registry: Optional[IndicatorRegistry] = None
+
+
+class StrategyError(Exception):
+    """
+    Raised when a strategy fails part way through a batch of candles.
+
+    Attributes:
+        fed: Candles of the batch that reached the strategy, including the failing one
+    """
+
+    def __init__(self, message: str, fed: int):
+        super().__init__(message, fed)
+        self.fed = fed
+
+    def __str__(self) -> str:
+        return self.args[0]
+
+
+async def feed_candles(strategy: Strategy, candles: OHLCVBuffer) -> Tuple[str, List[float]]:
+    """
+    Feed closed candles to a strategy in order.
+
+    Args:
+        strategy: Strategy to feed
+        candles: Candles not fed yet, oldest first
+
+    Returns:
+        Tuple of (signal of the last candle, seconds spent on each candle)
+
+    Raises:
+        StrategyError: The strategy raised on one of the candles
+    """
+    signal = 'hold'
+    durations = []
+    for fed, candle in enumerate(candles, start=1):
+        started = time.perf_counter()
+        try:
+            signal = await strategy.on_candle(candle)
+        except Exception as e:
+            raise StrategyError(f"{type(e).__name__}: {e}", fed) from e
+        durations.append(time.perf_counter() - started)
+    return signal, durations
+
+
+def _feed_blocking(strategy: Strategy, candles: OHLCVBuffer) -> Tuple[str, List[float]]:
+    """Run feed_candles on the calling thread's own event loop."""
+    loop = getattr(_thread_state, 'loop', None)
+    if loop is None:
+        loop = _thread_state.loop = asyncio.new_event_loop()
+    return loop.run_until_complete(feed_candles(strategy, candles))
+
+
+def _init_worker(capacity: int) -> None:
+    """Create the indicator registry shared by the strategies of a worker process."""
+    global _worker_registry
+    _worker_registry = IndicatorRegistry(capacity)
+
+
+def _run_worker_feed(token: int, strategy: Optional[Strategy], position: Optional[str],
+                     entry_price: float, timestamps: np.ndarray,
+                     values: np.ndarray) -> Tuple[str, List[float]]:
+    """
+    Feed candles to a strategy kept in this worker process.
+
+    Args:
+        token: Identifier of the strategy within the worker
+        strategy: Strategy copy on its first call, None afterwards
+        position: Current position of the bot's strategy
+        entry_price: Entry price of that position
+        timestamps: int64 candle timestamps
+        values: (5, n) float64 array of open, high, low, close and volume
+    """
+    if strategy is not None:
+        strategy.bind(strategy.symbol, strategy.timeframe, _worker_registry)
+        _worker_strategies[token] = strategy
+    strategy = _worker_strategies[token]
+    # The bot's copy owns the position; set it without set_position() logging
+    strategy.position, strategy.entry_price = position, entry_price
+    return _feed_blocking(strategy, OHLCVBuffer.wrap(timestamps, *values))
+
+
+class StrategyExecutor:
+    """
+    Runs strategy evaluation for the bot in one of three modes.
+
+    'inline' awaits strategies on the event loop. 'thread' runs them on
+    single-thread pools so timers and network I/O keep running while they
+    compute; every (symbol, timeframe) is pinned to one thread, because the
+    strategies trading the same candles share indicator series that must
+    not be updated from two threads at once. 'process' pins every strategy
+    to one of several single-process pools, again one per (symbol, timeframe):
+    the first call sends a copy of the strategy, which then stays in that
+    worker with its running state, and later calls only ship the new
+    candles as two arrays plus the current position. Strategies trading
+    the same symbol and timeframe share a worker and its indicator series.
+    Attributes other than the position are not copied back from workers.
+    When a worker process dies it is replaced, and its strategies are sent
+    again and rebuilt from the candle history passed to evaluate().
+    """
+
+    def __init__(self, mode: str = 'inline', max_workers: Optional[int] = None,
+                 capacity: int = DEFAULT_CAPACITY):
+        """
+        Initialize executor. Pools are started on first use.
+
+        Args:
+            mode: 'inline', 'thread' or 'process'
+            max_workers: Threads or worker processes (defaults to the CPU count)
+            capacity: Indicator values kept per series in worker processes
+        """
+        if mode not in EXECUTION_MODES:
+            raise ValueError(f"Unsupported strategy execution mode: {mode}")
+        self.mode = mode
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.capacity = capacity
+        self._threads: List[ThreadPoolExecutor] = []
+        self._workers: List[Executor] = []
+        # id(strategy) -> (strategy, worker index, token) of strategies held by a
+        # worker; keeps the id valid
+        self._assigned: Dict[int, Tuple[Strategy, int, int]] = {}
+        # Strategies whose worker died, to be rebuilt from their history
+        self._lost: Dict[int, Strategy] = {}
+        self._market_workers: Dict[Tuple[str, str], int] = {}
+        self._tokens = count()
+
+    async def evaluate(self, strategy: Strategy, candles: OHLCVBuffer,
+                       history: Optional[OHLCVBuffer] = None) -> Tuple[str, List[float]]:
+        """
+        Feed new closed candles to a strategy.
+
+        Args:
+            strategy: Strategy of a market
+            candles: Candles not fed yet, oldest first
+            history: Every closed candle up to and including candles; only
+                used in process mode, to rebuild the strategy after its worker died
+
+        Returns:
+            Tuple of (signal of the last candle, seconds spent on each candle)
+
+        Raises:
+            StrategyError: The strategy raised; its fed attribute counts the
+                candles of this call that reached it
+        """
+        if self.mode == 'inline':
+            return await feed_candles(strategy, candles)
+
+        loop = asyncio.get_running_loop()
+        if self.mode == 'thread':
+            worker = self._market_worker(strategy)
+            while len(self._threads) <= worker:
+                self._threads.append(ThreadPoolExecutor(max_workers=1,
+                                                        thread_name_prefix=f'strategy-{len(self._threads)}'))
+            # Copy the few new candles so later appends cannot overwrite them mid-evaluation
+            return await loop.run_in_executor(self._threads[worker], _feed_blocking, strategy, candles.copy())
+
+        try:
+            return await self._evaluate_in_worker(strategy, candles, history)
+        except BrokenProcessPool:
+            logger.warning("Strategy worker of %s %s died, retrying on a new worker",
+                           strategy.symbol, strategy.timeframe)
+            return await self._evaluate_in_worker(strategy, candles, history)
+
+    async def _evaluate_in_worker(self, strategy: Strategy, candles: OHLCVBuffer,
+                                  history: Optional[OHLCVBuffer]) -> Tuple[str, List[float]]:
+        """Feed candles to the worker copy of a strategy, sending the strategy on its first call."""
+        worker, token, first_call = self._assign(strategy)
+        # A strategy lost with its worker is rebuilt from the whole history
+        fed = history if first_call and id(strategy) in self._lost and history is not None else candles
+        pool = self._workers[worker]
+        values = np.stack([fed.open, fed.high, fed.low, fed.close, fed.volume])
+        try:
+            signal, durations = await asyncio.get_running_loop().run_in_executor(
+                pool, _run_worker_feed, token, strategy if first_call else None,
+                strategy.position, strategy.entry_price, fed.timestamp.copy(), values
+            )
+        except BrokenProcessPool:
+            self._replace_worker(worker, pool)
+            raise
+        except StrategyError as e:
+            # The worker holds the strategy even though it failed; count only new candles as fed
+            if first_call:
+                self._assigned[id(strategy)] = (strategy, worker, token)
+                self._lost.pop(id(strategy), None)
+            raise StrategyError(e.args[0], max(e.fed - (len(fed) - len(candles)), 0)) from e
+        if first_call:
+            # Only now does the worker hold the strategy
+            self._assigned[id(strategy)] = (strategy, worker, token)
+            self._lost.pop(id(strategy), None)
+        return signal, durations[len(durations) - len(candles):]
+
+    def _assign(self, strategy: Strategy) -> Tuple[int, int, bool]:
+        """Worker index and token of a strategy, and whether the worker does not hold it yet."""
+        assigned = self._assigned.get(id(strategy))
+        if assigned is not None:
+            return assigned[1], assigned[2], False
+
+        worker = self._market_worker(strategy)
+        while len(self._workers) <= worker:
+            self._workers.append(self._start_worker())
+        return worker, next(self._tokens), True
+
+    def _market_worker(self, strategy: Strategy) -> int:
+        """Index of the thread or worker process serving a strategy's symbol and timeframe."""
+        market = (strategy.symbol, strategy.timeframe)
+        if market not in self._market_workers:
+            self._market_workers[market] = len(self._market_workers) % self.max_workers
+        return self._market_workers[market]
+
+    def _start_worker(self) -> Executor:
+        """Start a single-process pool with its own indicator registry."""
+        return ProcessPoolExecutor(max_workers=1, initializer=_init_worker, initargs=(self.capacity,))
+
+    def _replace_worker(self, worker: int, pool: Executor) -> None:
+        """Replace a broken worker pool and mark its strategies to be sent again."""
+        if self._workers[worker] is not pool:
+            # Already replaced by a call that failed before this one
+            return
+        pool.shutdown(wait=False, cancel_futures=True)
+        self._workers[worker] = self._start_worker()
+        for key, (strategy, index, _) in list(self._assigned.items()):
+            if index == worker:
+                del self._assigned[key]
+                self._lost[key] = strategy
+        logger.warning("Replaced strategy worker %d, its strategies will be sent again", worker)
+
+    def close(self) -> None:
+        """Shut down threads and worker processes, dropping the state kept in workers."""
+        for thread in self._threads:
+            thread.shutdown(wait=True)
+        self._threads = []
+        for worker in self._workers:
+            worker.shutdown(wait=True, cancel_futures=True)
+        self._workers = []
+        self._assigned.clear()
+        self._lost.clear()
+        self._market_workers.clear()
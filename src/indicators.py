@@ -0,0 +1,306 @@
+"""
+Shared memoized indicator series.
+Strategies subscribe to indicator series keyed by (symbol, timeframe,
+indicator, params); each series is computed once per candle no matter how
+many strategies read it, and is dropped when no strategy uses it anymore.
+"""
+
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Any, Dict, Hashable, Optional, Tuple
+import math
+import weakref
+import numpy as np
+
+# Indicator values kept per series
+DEFAULT_CAPACITY = 1000
+
+
+class Indicator(ABC):
+    """
+    Indicator computed from one input value (the close) per candle.
+
+    Implementations keep whatever running state they need so step() costs
+    constant time per candle, and compute() produces the same values for a
+    whole array at once.
+    """
+
+    name: str = ''
+
+    def __init__(self, **params: Any):
+        """
+        Initialize indicator.
+
+        Args:
+            **params: Indicator parameters, part of the registry key
+        """
+        self.params = params
+
+    @property
+    def key(self) -> Tuple[str, Tuple[Tuple[str, Any], ...]]:
+        """Name and sorted parameters identifying the indicator."""
+        return self.name, tuple(sorted(self.params.items()))
+
+    @abstractmethod
+    def reset(self) -> None:
+        """Forget every input seen so far."""
+
+    @abstractmethod
+    def step(self, value: float) -> float:
+        """
+        Consume one input value.
+
+        Returns:
+            Indicator value for this input, NaN while warming up
+        """
+
+    def compute(self, values: np.ndarray) -> np.ndarray:
+        """
+        Consume many input values at once.
+
+        The default implementation calls step() for each value; subclasses
+        override it with array operations that leave the same running state.
+
+        Returns:
+            Indicator value for every input
+        """
+        return np.array([self.step(float(value)) for value in values], dtype=np.float64)
+
+
+class SMA(Indicator):
+    """Simple moving average over a fixed window of closes."""
+
+    name = 'sma'
+
+    def __init__(self, window: int):
+        """
+        Initialize moving average.
+
+        Args:
+            window: Number of closes averaged
+        """
+        if window <= 0:
+            raise ValueError("window must be positive")
+        super().__init__(window=window)
+        self.window = window
+        self.reset()
+
+    def reset(self) -> None:
+        """Clear the window and running sum."""
+        self._ring: deque = deque(maxlen=self.window)
+        self._sum = 0.0
+        # Rounding error of _sum (Neumaier summation), so it never needs re-summing
+        self._compensation = 0.0
+
+    def _add(self, value: float) -> None:
+        """Add a value to the compensated running sum."""
+        total = self._sum + value
+        if abs(self._sum) >= abs(value):
+            self._compensation += (self._sum - total) + value
+        else:
+            self._compensation += (value - total) + self._sum
+        self._sum = total
+
+    def step(self, value: float) -> float:
+        """Update the running sum with one close in constant time."""
+        ring = self._ring
+        if len(ring) == self.window:
+            self._add(-ring[0])
+        ring.append(value)
+        self._add(value)
+        if len(ring) < self.window:
+            return math.nan
+        return (self._sum + self._compensation) / self.window
+
+    def compute(self, values: np.ndarray) -> np.ndarray:
+        """Moving averages of many closes from one cumulative sum."""
+        values = np.asarray(values, dtype=np.float64)
+        if not len(values):
+            return np.empty(0)
+        # Prepend the closes still inside the window, oldest first
+        held = min(len(self._ring), self.window - 1)
+        previous = list(self._ring)[len(self._ring) - held:]
+        series = np.concatenate((previous, values))
+
+        base = series[0]
+        cumulative = np.concatenate(([0.0], np.cumsum(series - base)))
+        averages = np.full(len(series), np.nan)
+        if len(series) >= self.window:
+            averages[self.window - 1:] = (cumulative[self.window:] - cumulative[:-self.window]) / self.window + base
+
+        # Leave the running state as if every value had been stepped through
+        self._ring.extend(values[-self.window:].tolist())
+        self._sum = math.fsum(self._ring)
+        self._compensation = 0.0
+        return averages[held:]
+
+
+class IndicatorSeries:
+    """
+    Indicator values of one (symbol, timeframe) candle stream.
+
+    The latest values are kept with their candle timestamps in bounded
+    deques, which keeps the per-candle append cheap. Feeding a candle that
+    was already fed returns the memoized value instead of recomputing it.
+    """
+
+    def __init__(self, indicator: Indicator, capacity: int = DEFAULT_CAPACITY):
+        """
+        Initialize an empty series.
+
+        Args:
+            indicator: Indicator instance holding the running state
+            capacity: Number of values kept
+        """
+        self.indicator = indicator
+        self.capacity = capacity
+        self._timestamps: deque = deque(maxlen=capacity)
+        self._values: deque = deque(maxlen=capacity)
+        # Bound once: push() runs for every candle of every series
+        self._step = indicator.step
+        self._append_timestamp = self._timestamps.append
+        self._append_value = self._values.append
+        # Array of the kept timestamps, rebuilt only after new candles
+        self._timestamp_array: Optional[np.ndarray] = None
+        self.last_timestamp: Optional[int] = None
+        self.last_value = math.nan
+        self.updates = 0
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def push(self, timestamp: int, value: float) -> float:
+        """
+        Feed one closed candle's input.
+
+        Args:
+            timestamp: Candle timestamp in milliseconds
+            value: Input value (the close)
+
+        Returns:
+            Indicator value at this candle; memoized when another subscriber
+            already fed it, NaN when it is older than the kept values
+        """
+        last_timestamp = self.last_timestamp
+        if last_timestamp is not None and timestamp <= last_timestamp:
+            if timestamp == last_timestamp:
+                return self.last_value
+            return self.value_at(timestamp)
+        result = self._step(value)
+        self._append_timestamp(timestamp)
+        self._append_value(result)
+        self._timestamp_array = None
+        self.last_timestamp = timestamp
+        self.last_value = result
+        self.updates += 1
+        return result
+
+    def extend(self, timestamps: np.ndarray, values: np.ndarray) -> np.ndarray:
+        """
+        Feed many closed candles, computing only the ones not seen yet.
+
+        Args:
+            timestamps: Candle timestamps in milliseconds, ascending
+            values: Input value of every candle
+
+        Returns:
+            Indicator values for the candles after the last one seen
+        """
+        start = 0
+        if self.last_timestamp is not None:
+            start = int(np.searchsorted(timestamps, self.last_timestamp, side='right'))
+        if start >= len(timestamps):
+            return np.empty(0)
+        results = self.indicator.compute(values[start:])
+        self._timestamps.extend(timestamps[start:][-self.capacity:].tolist())
+        self._values.extend(results[-self.capacity:].tolist())
+        self._timestamp_array = None
+        self.last_timestamp = int(timestamps[-1])
+        self.last_value = float(results[-1])
+        self.updates += len(results)
+        return results
+
+    def value_at(self, timestamp: int) -> float:
+        """Indicator value of a kept candle, NaN when it is not kept."""
+        timestamps = self.timestamps
+        index = int(np.searchsorted(timestamps, timestamp))
+        if index < len(timestamps) and timestamps[index] == timestamp:
+            return self._values[index]
+        return math.nan
+
+    @property
+    def timestamps(self) -> np.ndarray:
+        """Candle timestamps of the kept values (read-only, shared until the next candle)."""
+        if self._timestamp_array is None:
+            self._timestamp_array = np.array(self._timestamps, dtype=np.int64)
+            self._timestamp_array.flags.writeable = False
+        return self._timestamp_array
+
+    @property
+    def values(self) -> np.ndarray:
+        """Kept indicator values, oldest first."""
+        return np.array(self._values, dtype=np.float64)
+
+
+class IndicatorRegistry:
+    """
+    Shared indicator series keyed by (symbol, timeframe, indicator, params).
+
+    Subscribers are tracked weakly: a series is evicted as soon as every
+    strategy using it has released it or been garbage collected.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        """
+        Initialize an empty registry.
+
+        Args:
+            capacity: Number of values kept per series
+        """
+        self.capacity = capacity
+        self._series: Dict[Hashable, IndicatorSeries] = {}
+        self._subscribers: Dict[Hashable, weakref.WeakSet] = {}
+
+    def __len__(self) -> int:
+        return len(self._series)
+
+    def subscribe(self, owner: Any, symbol: Hashable, timeframe: Hashable,
+                  indicator: Indicator) -> IndicatorSeries:
+        """
+        Get the shared series of an indicator, creating it on first use.
+
+        Args:
+            owner: Subscribing object (usually the strategy), referenced weakly
+            symbol: Trading pair symbol
+            timeframe: Candlestick timeframe
+            indicator: Indicator instance; only used when the series is new
+
+        Returns:
+            Series shared with every subscriber using the same key
+        """
+        self.evict_unused()
+        key = (symbol, timeframe) + indicator.key
+        if key not in self._series:
+            self._series[key] = IndicatorSeries(indicator, self.capacity)
+            self._subscribers[key] = weakref.WeakSet()
+        self._subscribers[key].add(owner)
+        return self._series[key]
+
+    def release(self, owner: Any) -> None:
+        """Drop every subscription of owner and evict series nothing uses."""
+        for subscribers in self._subscribers.values():
+            subscribers.discard(owner)
+        self.evict_unused()
+
+    def evict_unused(self) -> int:
+        """
+        Remove series without live subscribers.
+
+        Returns:
+            Number of series evicted
+        """
+        unused = [key for key, subscribers in self._subscribers.items() if not subscribers]
+        for key in unused:
+            del self._series[key]
+            del self._subscribers[key]
+        return len(unused)
@@ -0,0 +1,172 @@
+"""
+Queued logging setup.
+Log records are put on an in-memory queue by the calling thread and
+formatted and written by a background thread, so handlers never block the
+event loop or the backtest loop.
+"""
+
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Mapping, Optional, Union
+import atexit
+import logging
+import queue
+import time
+
+DEFAULT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Logger silenced by quiet mode; the backtester checks it once per run
+QUIET_LOGGER = 'src'
+
+_listener: Optional[QueueListener] = None
+_queue_handler: Optional[QueueHandler] = None
+
+
+class _LazyQueueHandler(QueueHandler):
+    """Queue handler that leaves formatting to the listener thread."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """
+        Enqueue the record as is; the queue never leaves this process.
+
+        Arguments are formatted on the listener thread, so they should not
+        be mutated after the logging call.
+        """
+        return record
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Token-bucket limit on the records of logger hierarchies.
+
+    Each configured logger name (and its children) gets rate records per
+    second with bursts of up to burst records. Records over the limit are
+    dropped before they are queued; the next record let through reports
+    how many were dropped.
+    """
+
+    def __init__(self, limits: Mapping[str, float], burst: int = 10):
+        """
+        Initialize filter.
+
+        Args:
+            limits: Records per second keyed by logger name
+            burst: Records allowed at once before the rate applies
+        """
+        super().__init__()
+        self.limits = dict(limits)
+        self.burst = burst
+        # name -> [tokens, last refill time, dropped records]
+        self._buckets: Dict[str, list] = {}
+        self._prefixes: Dict[str, Optional[str]] = {}
+
+    def _limited_name(self, name: str) -> Optional[str]:
+        """Closest configured ancestor of a logger name, cached per name."""
+        if name not in self._prefixes:
+            candidates = [limit for limit in self.limits if name == limit or name.startswith(limit + '.')]
+            self._prefixes[name] = max(candidates, key=len) if candidates else None
+        return self._prefixes[name]
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        """Let a record through when its logger has a token left."""
+        limited = self._limited_name(record.name)
+        if limited is None:
+            return True
+        now = time.monotonic()
+        bucket = self._buckets.get(limited)
+        if bucket is None:
+            bucket = self._buckets[limited] = [float(self.burst), now, 0]
+        bucket[0] = min(bucket[0] + (now - bucket[1]) * self.limits[limited], self.burst)
+        bucket[1] = now
+        if bucket[0] < 1:
+            bucket[2] += 1
+            return False
+        bucket[0] -= 1
+        if bucket[2]:
+            record.msg = f"{record.getMessage()} ({bucket[2]} earlier messages suppressed)"
+            record.args = None
+            bucket[2] = 0
+        return True
+
+
+def set_quiet(quiet: bool = True) -> None:
+    """
+    Switch quiet mode on or off.
+
+    Quiet mode raises the project's loggers to WARNING, which makes the
+    backtester and strategies skip per-trade logging entirely. Meant for
+    parameter sweeps and other runs of many backtests.
+    """
+    logging.getLogger(QUIET_LOGGER).setLevel(logging.WARNING if quiet else logging.NOTSET)
+
+
+def configure_logging(level: Union[int, str] = logging.INFO, file: Optional[str] = None,
+                      console: bool = True, levels: Optional[Mapping[str, Union[int, str]]] = None,
+                      rate_limits: Optional[Mapping[str, float]] = None, burst: int = 10,
+                      quiet: bool = False, format: str = DEFAULT_FORMAT) -> QueueListener:
+    """
+    Route all logging through a queue drained by a background thread.
+
+    Replaces the root logger's handlers. Calling it again stops the
+    previous listener first; the listener is also stopped, flushing the
+    queue, when the interpreter exits. The keyword arguments match the
+    keys of the 'logging' config section.
+
+    Args:
+        level: Root log level
+        file: Log file path, appended to; no file when None
+        console: Also write to stderr
+        levels: Log level per logger name, e.g. {'src.exchange': 'DEBUG'}
+        rate_limits: Records per second per logger name, e.g. {'src.bot': 5}
+        burst: Records a rate-limited logger may emit at once
+        quiet: Start in quiet mode (see set_quiet)
+        format: Record format
+
+    Returns:
+        The running queue listener
+    """
+    global _listener, _queue_handler
+    stop_logging()
+
+    formatter = logging.Formatter(format)
+    handlers = []
+    if file:
+        handlers.append(logging.FileHandler(file))
+    if console:
+        handlers.append(logging.StreamHandler())
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    _queue_handler = _LazyQueueHandler(log_queue)
+    if rate_limits:
+        _queue_handler.addFilter(RateLimitFilter(rate_limits, burst))
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(_queue_handler)
+    root.setLevel(level)
+    for name, logger_level in (levels or {}).items():
+        logging.getLogger(name).setLevel(logger_level)
+    if quiet:
+        set_quiet()
+
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+def stop_logging() -> None:
+    """Write out queued records, stop the background thread and close its handlers."""
+    global _listener, _queue_handler
+    if _queue_handler is not None:
+        logging.getLogger().removeHandler(_queue_handler)
+        _queue_handler = None
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+atexit.register(stop_logging)
@@ -0,0 +1,342 @@
+"""
+Lightweight metrics for the live bot.
+Counters and latency histograms kept in memory and served over HTTP in
+the Prometheus text exposition format.
+"""
+
+import asyncio
+import bisect
+import logging
+import time
+from collections import deque
+from typing import TYPE_CHECKING, Deque, Dict, List, Optional, Sequence, Tuple
+
+if TYPE_CHECKING:
+    from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+# Latency buckets in seconds, from sub-millisecond strategy steps to slow REST calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value) -> str:
+    """Escape a label value."""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    """Render a Prometheus label set."""
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    """Render a sample value."""
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    """Monotonically increasing count, optionally split by labels."""
+
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        """
+        Initialize counter.
+
+        Args:
+            name: Metric name
+            documentation: Help text
+            labelnames: Names of the labels every sample carries
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        """
+        Increase the count.
+
+        Args:
+            amount: Amount to add
+            **labels: Value of every label
+        """
+        key = tuple(labels[name] for name in self.labelnames)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        """Current count for a label set."""
+        return self._values.get(tuple(labels[name] for name in self.labelnames), 0.0)
+
+    def samples(self) -> List[str]:
+        """Render the samples in Prometheus text format."""
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                for key, value in self._values.items()]
+
+
+class _Timer:
+    """Context manager observing the time spent in its block."""
+
+    __slots__ = ('_histogram', '_labels', '_started')
+
+    def __init__(self, histogram: 'Histogram', labels: Dict[str, str]):
+        self._histogram = histogram
+        self._labels = labels
+
+    def __enter__(self) -> '_Timer':
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._histogram.observe(time.perf_counter() - self._started, **self._labels)
+
+
+class _HistogramSeries:
+    """Bucket counts and recent observations of one label set."""
+
+    __slots__ = ('counts', 'sum', 'count', 'recent')
+
+    def __init__(self, buckets: int, window: int):
+        self.counts = [0] * (buckets + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.recent: Deque[float] = deque(maxlen=window)
+
+
+class Histogram:
+    """
+    Distribution of observed values, optionally split by labels.
+
+    Exported as cumulative Prometheus buckets. The latest window
+    observations are also kept for local percentiles via quantile().
+    """
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS, window: int = 1000):
+        """
+        Initialize histogram.
+
+        Args:
+            name: Metric name
+            documentation: Help text
+            labelnames: Names of the labels every sample carries
+            buckets: Upper bounds of the buckets, ascending
+            window: Recent observations kept per label set for quantile()
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self.window = window
+        self._series: Dict[Tuple[str, ...], _HistogramSeries] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        """
+        Record one observation.
+
+        Args:
+            value: Observed value (seconds for latencies)
+            **labels: Value of every label
+        """
+        key = tuple(labels[name] for name in self.labelnames)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = _HistogramSeries(len(self.buckets), self.window)
+        series.counts[bisect.bisect_left(self.buckets, value)] += 1
+        series.sum += value
+        series.count += 1
+        series.recent.append(value)
+
+    def time(self, **labels: str) -> _Timer:
+        """
+        Time a block of code.
+
+        Example:
+            with histogram.time(stage='fetch'):
+                ...
+
+        Returns:
+            Context manager observing the elapsed seconds
+        """
+        return _Timer(self, labels)
+
+    def count(self, **labels: str) -> int:
+        """Number of observations for a label set."""
+        series = self._series.get(tuple(labels[name] for name in self.labelnames))
+        return series.count if series else 0
+
+    def quantile(self, q: float, **labels: str) -> Optional[float]:
+        """
+        Get a quantile of the recent observations.
+
+        Args:
+            q: Quantile between 0 and 1 (e.g., 0.99)
+            **labels: Value of every label
+
+        Returns:
+            Quantile value, or None without observations
+        """
+        series = self._series.get(tuple(labels[name] for name in self.labelnames))
+        if not series or not series.recent:
+            return None
+        recent = sorted(series.recent)
+        return recent[min(int(q * len(recent)), len(recent) - 1)]
+
+    def samples(self) -> List[str]:
+        """Render the samples in Prometheus text format."""
+        lines = []
+        for key, series in self._series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), series.counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float('inf') else f'le="{bound!r}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(series.sum)}")
+            lines.append(f"{self.name}_count{labels} {series.count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Collection of metrics rendered together."""
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        """Get or create a counter."""
+        if name not in self._metrics:
+            self._metrics[name] = Counter(name, documentation, labelnames)
+        return self._metrics[name]
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        """Get or create a histogram."""
+        if name not in self._metrics:
+            self._metrics[name] = Histogram(name, documentation, labelnames, buckets)
+        return self._metrics[name]
+
+    def render(self) -> str:
+        """
+        Render every metric in the Prometheus text exposition format.
+
+        Returns:
+            Exposition text
+        """
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+# Registry used by the bot and exchange connector
+REGISTRY = MetricsRegistry()
+
+
+class LoopLagMonitor:
+    """
+    Measures how long the event loop is blocked.
+
+    A background task sleeps for interval seconds at a time; any extra
+    delay before it wakes up is time the loop spent running other code
+    without yielding, such as strategies computing inline.
+    """
+
+    def __init__(self, histogram: Histogram, interval: float = 0.5, warning: float = 0.25):
+        """
+        Initialize monitor.
+
+        Args:
+            histogram: Histogram receiving every lag in seconds
+            interval: Seconds between measurements
+            warning: Lag above which a warning is logged
+        """
+        self.histogram = histogram
+        self.interval = interval
+        self.warning = warning
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """Start measuring on the running event loop."""
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self) -> None:
+        """Stop measuring."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        """Sleep repeatedly and record how late each wake-up is."""
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(loop.time() - started - self.interval, 0.0)
+            self.last_lag = lag
+            self.max_lag = max(self.max_lag, lag)
+            self.histogram.observe(lag)
+            if lag > self.warning:
+                logger.warning(f"Event loop was blocked for {lag:.3f}s")
+
+
+class MetricsServer:
+    """
+    Local HTTP endpoint serving a registry at /metrics.
+    """
+
+    def __init__(self, registry: MetricsRegistry = REGISTRY,
+                 host: str = '127.0.0.1', port: int = 9100):
+        """
+        Initialize metrics server.
+
+        Args:
+            registry: Metrics to serve
+            host: Interface to listen on
+            port: Port to listen on (0 picks a free port)
+        """
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self._runner: Optional['web.AppRunner'] = None
+
+    async def start(self) -> None:
+        """Start serving metrics."""
+        from aiohttp import web
+        app = web.Application()
+        app.router.add_get('/metrics', self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        if self.port == 0:
+            self.port = self._runner.addresses[0][1]
+        logger.info(f"Serving metrics on http://{self.host}:{self.port}/metrics")
+
+    async def stop(self) -> None:
+        """Stop serving metrics."""
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _handle(self, request: 'web.Request') -> 'web.Response':
+        """Serve the current metrics."""
+        from aiohttp import web
+        return web.Response(body=self.registry.render().encode(),
+                            headers={'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'})
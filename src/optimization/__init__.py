@@ -0,0 +1,286 @@
+"""
+Parameter optimization for trading strategies.
+Runs backtests for a grid of strategy parameters across worker processes.
+"""
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import product
+from multiprocessing.shared_memory import SharedMemory
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Sequence, Tuple
+import asyncio
+import logging
+import os
+import signal
+import numpy as np
+from src.backtesting import Backtester
+from src.backtesting.fills import FillModel
+from src.backtesting.cache import ResultCache, candles_digest, result_key
+from src.data import OHLCVBuffer, OHLCVData, as_ohlcv_buffer
+from src.log import set_quiet
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Candles attached from shared memory in each worker process
+_worker_candles: Optional[OHLCVBuffer] = None
+_worker_segments: List[SharedMemory] = []
+# Result cache of each worker process, kept across tasks
+_worker_cache: Optional[ResultCache] = None
+
+
+def parameter_grid(param_grid: Dict[str, Sequence[Any]]) -> List[Dict[str, Any]]:
+    """
+    Expand a parameter grid into every combination.
+
+    Args:
+        param_grid: Mapping of parameter name to candidate values
+
+    Returns:
+        List of parameter dictionaries
+    """
+    names = list(param_grid)
+    return [dict(zip(names, values)) for values in product(*(param_grid[name] for name in names))]
+
+
+def _attach_segment(name: str) -> SharedMemory:
+    """Attach to an existing shared memory segment owned by the parent process."""
+    try:
+        return SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13: workers share the parent's resource tracker, so the
+        # duplicate registration is harmless and the parent still unlinks
+        return SharedMemory(name=name)
+
+
+def _init_worker(timestamps_name: str, values_name: str, length: int,
+                 cache: Optional[ResultCache] = None) -> None:
+    """Attach the shared candle history and the result cache in a worker process."""
+    global _worker_candles, _worker_segments, _worker_cache
+
+    # Ctrl-C is handled by the parent, which cancels outstanding work
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    set_quiet()
+
+    timestamps_segment = _attach_segment(timestamps_name)
+    values_segment = _attach_segment(values_name)
+    _worker_segments = [timestamps_segment, values_segment]
+    _worker_cache = cache
+    _worker_candles = OHLCVBuffer.wrap(
+        np.ndarray((length,), dtype=np.int64, buffer=timestamps_segment.buf),
+        *np.ndarray((5, length), dtype=np.float64, buffer=values_segment.buf)
+    )
+
+
+def _share_candles(candles: OHLCVBuffer) -> Tuple[SharedMemory, SharedMemory]:
+    """Copy the candle columns into new shared memory segments for _init_worker."""
+    length = len(candles)
+    timestamps_segment = SharedMemory(create=True, size=length * 8)
+    values_segment = SharedMemory(create=True, size=5 * length * 8)
+    np.ndarray((length,), dtype=np.int64, buffer=timestamps_segment.buf)[:] = candles.timestamp
+    values = np.ndarray((5, length), dtype=np.float64, buffer=values_segment.buf)
+    for row, column in enumerate((candles.open, candles.high, candles.low, candles.close, candles.volume)):
+        values[row] = column
+    return timestamps_segment, values_segment
+
+
+def backtest(strategy_class, params: Dict[str, Any], candles: OHLCVData,
+             initial_balance: float, trade_amount: float,
+             fill_model: Optional[FillModel] = None, start: int = 0) -> Tuple[Backtester, Dict[str, Any]]:
+    """
+    Backtest one parameter combination and keep the backtester.
+
+    Uses Backtester.run_vectorized when the strategy supports batch signals
+    and falls back to the candle-by-candle Backtester.run otherwise. Candles
+    before start only warm up the strategy.
+
+    Returns:
+        The backtester (with its equity curve) and the full results
+    """
+    strategy = strategy_class(**params)
+    backtester = Backtester(initial_balance=initial_balance, fill_model=fill_model)
+    try:
+        results = backtester.run_vectorized(strategy, candles, trade_amount=trade_amount, start=start)
+    except NotImplementedError:
+        results = asyncio.run(backtester.run(strategy, candles, trade_amount=trade_amount, start=start))
+    return backtester, results
+
+
+def run_backtest(strategy_class, params: Dict[str, Any], candles: OHLCVData,
+                 initial_balance: float, trade_amount: float,
+                 cache: Optional[ResultCache] = None, digest: Optional[str] = None,
+                 fill_model: Optional[FillModel] = None) -> Dict[str, Any]:
+    """
+    Backtest one parameter combination.
+
+    Args:
+        strategy_class: Strategy class to instantiate
+        params: Keyword arguments for the strategy
+        candles: Historical OHLCV data
+        initial_balance: Starting capital
+        trade_amount: Percentage of balance to use per trade
+        cache: Optional result cache consulted before and filled after the backtest
+        digest: candles_digest() of candles, computed when omitted
+        fill_model: Fees, slippage and order type of simulated fills (defaults to FillModel())
+
+    Returns:
+        Backtest summary without the trade list
+    """
+    if cache is None:
+        _, results = backtest(strategy_class, params, candles, initial_balance, trade_amount, fill_model)
+    else:
+        key = result_key(digest or candles_digest(candles), strategy_class, params,
+                         initial_balance, trade_amount, fill_model)
+        results = cache.get(key)
+        if results is None:
+            _, results = backtest(strategy_class, params, candles, initial_balance, trade_amount, fill_model)
+            cache.put(key, results)
+    return {k: v for k, v in results.items() if k != 'trades'}
+
+
+def _run_worker_backtest(strategy_class, params: Dict[str, Any], initial_balance: float,
+                         trade_amount: float, digest: Optional[str] = None,
+                         fill_model: Optional[FillModel] = None) -> Dict[str, Any]:
+    """Backtest one parameter combination on the shared candle history."""
+    return run_backtest(strategy_class, params, _worker_candles, initial_balance, trade_amount,
+                        _worker_cache, digest, fill_model)
+
+
+class ParameterSweep:
+    """
+    Grid search over strategy parameters using a process pool.
+
+    The candle history is copied once into shared memory and attached by
+    every worker, so only the parameters travel with each task. With a
+    result cache, combinations already backtested on the same candles are
+    read back in the parent and only the rest are sent to workers.
+    """
+
+    def __init__(self, strategy_class, param_grid: Dict[str, Sequence[Any]],
+                 initial_balance: float = 10000.0, trade_amount: float = 0.1,
+                 max_workers: Optional[int] = None, rank_by: str = 'return_percentage',
+                 constraint: Optional[Callable[[Dict[str, Any]], bool]] = None,
+                 cache: Optional[ResultCache] = None, fill_model: Optional[FillModel] = None):
+        """
+        Initialize parameter sweep.
+
+        Args:
+            strategy_class: Strategy class to instantiate for each combination
+            param_grid: Mapping of parameter name to candidate values
+            initial_balance: Starting capital for each backtest
+            trade_amount: Percentage of balance to use per trade (0.0 to 1.0)
+            max_workers: Number of worker processes (defaults to all cores)
+            rank_by: Result column used to rank combinations (descending)
+            constraint: Optional filter skipping invalid combinations,
+                e.g. lambda p: p['short_window'] < p['long_window']
+            cache: Optional result cache shared by the parent and the workers
+            fill_model: Fees, slippage and order type of every backtest (defaults to FillModel())
+        """
+        self.strategy_class = strategy_class
+        self.combinations = [p for p in parameter_grid(param_grid) if constraint is None or constraint(p)]
+        self.initial_balance = initial_balance
+        self.trade_amount = trade_amount
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.rank_by = rank_by
+        self.cache = cache
+        self.fill_model = fill_model
+
+    def run(self, ohlcv_data: OHLCVData,
+            progress: Optional[Callable[[int, int], None]] = None) -> 'pd.DataFrame':
+        """
+        Backtest every parameter combination.
+
+        On Ctrl-C outstanding tasks are cancelled, workers are shut down and
+        shared memory is released before KeyboardInterrupt is re-raised.
+
+        Args:
+            ohlcv_data: Historical OHLCV data (raw rows or OHLCVBuffer)
+            progress: Optional callback called with (completed, total)
+
+        Returns:
+            DataFrame with one row per combination, best first
+        """
+        candles = as_ohlcv_buffer(ohlcv_data)
+        if not len(candles):
+            raise ValueError("Cannot run a parameter sweep without candles")
+
+        total = len(self.combinations)
+        rows, pending, digest = self._cached_rows(candles)
+        if progress is not None and rows:
+            progress(len(rows), total)
+        if pending:
+            self._dispatch(candles, pending, digest, rows, progress)
+        return self._rank(rows)
+
+    def _cached_rows(self, candles: OHLCVBuffer
+                     ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], Optional[str]]:
+        """
+        Look up every combination in the result cache.
+
+        Returns:
+            Result rows found in the cache, the combinations still to
+            backtest and the candle digest (None without a cache)
+        """
+        if self.cache is None:
+            return [], self.combinations, None
+
+        digest = candles_digest(candles)
+        rows: List[Dict[str, Any]] = []
+        pending = []
+        for params in self.combinations:
+            results = self.cache.get(result_key(digest, self.strategy_class, params,
+                                                self.initial_balance, self.trade_amount, self.fill_model))
+            if results is None:
+                pending.append(params)
+            else:
+                rows.append({**params, **{k: v for k, v in results.items() if k != 'trades'}})
+        logger.info(f"{len(rows)}/{len(self.combinations)} backtests found in the result cache")
+        return rows, pending, digest
+
+    def _dispatch(self, candles: OHLCVBuffer, pending: List[Dict[str, Any]], digest: Optional[str],
+                  rows: List[Dict[str, Any]], progress: Optional[Callable[[int, int], None]]) -> None:
+        """Backtest the pending combinations on the process pool, appending to rows."""
+        total = len(self.combinations)
+        logger.info(f"Running {len(pending)} backtests on {self.max_workers} workers")
+
+        timestamps_segment, values_segment = _share_candles(candles)
+        executor = ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            initializer=_init_worker,
+            initargs=(timestamps_segment.name, values_segment.name, len(candles), self.cache)
+        )
+        try:
+            futures = {
+                executor.submit(_run_worker_backtest, self.strategy_class, params,
+                                self.initial_balance, self.trade_amount, digest, self.fill_model): params
+                for params in pending
+            }
+            report_every = max(total // 20, 1)
+            for completed, future in enumerate(as_completed(futures), start=len(rows) + 1):
+                rows.append({**futures[future], **future.result()})
+                if progress is not None:
+                    progress(completed, total)
+                if completed % report_every == 0 or completed == total:
+                    logger.info(f"Sweep progress: {completed}/{total}")
+        except KeyboardInterrupt:
+            logger.warning(f"Sweep interrupted after {len(rows)}/{total} backtests, cancelling")
+            executor.shutdown(wait=True, cancel_futures=True)
+            raise
+        except Exception:
+            # A failed backtest ends the sweep without running the queued ones
+            executor.shutdown(wait=True, cancel_futures=True)
+            raise
+        finally:
+            executor.shutdown(wait=True)
+            for segment in (timestamps_segment, values_segment):
+                segment.close()
+                segment.unlink()
+
+    def _rank(self, rows: List[Dict[str, Any]]) -> 'pd.DataFrame':
+        """Sort result rows by the ranking metric, best first."""
+        import pandas as pd
+        table = pd.DataFrame(rows)
+        if table.empty:
+            return table
+        return table.sort_values(self.rank_by, ascending=False, kind='stable').reset_index(drop=True)
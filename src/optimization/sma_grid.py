@@ -0,0 +1,172 @@
+"""
+Batched evaluation of SimpleMovingAverage window pairs.
+Every moving average is derived from one cumulative-sum array and all
+window pairs are simulated together with 2-D array operations.
+"""
+
+from typing import TYPE_CHECKING, Dict, Optional, Sequence
+import logging
+import numpy as np
+from src.backtesting import WARMUP_BARS
+from src.data import OHLCVData, as_ohlcv_buffer
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Approximate working memory allowed per chunk of window pairs
+CHUNK_MEMORY_BYTES = 256 * 1024 * 1024
+
+
+def moving_averages(closes: np.ndarray, windows: Sequence[int]) -> np.ndarray:
+    """
+    Compute simple moving averages for several windows from one cumulative sum.
+
+    Prices are shifted by the first close before summing to keep the
+    cumulative sum small and the differences accurate on long histories.
+
+    Args:
+        closes: Close prices
+        windows: Moving average periods
+
+    Returns:
+        Array of shape (len(windows), len(closes)), NaN until each window is full
+
+    Raises:
+        ValueError: If a window is not positive
+    """
+    if any(window <= 0 for window in windows):
+        raise ValueError("window must be positive")
+    base = closes[0] if len(closes) else 0.0
+    cumulative = np.concatenate(([0.0], np.cumsum(closes - base)))
+    averages = np.full((len(windows), len(closes)), np.nan)
+    for row, window in enumerate(windows):
+        if window <= len(closes):
+            averages[row, window - 1:] = (cumulative[window:] - cumulative[:-window]) / window + base
+    return averages
+
+
+def evaluate_sma_grid(ohlcv_data: OHLCVData, short_windows: Sequence[int],
+                      long_windows: Sequence[int], initial_balance: float = 10000.0,
+                      trade_amount: float = 0.1,
+                      chunk_size: Optional[int] = None) -> Dict[str, 'pd.DataFrame']:
+    """
+    Backtest every (short, long) SimpleMovingAverage window pair at once.
+
+    Uses the same trading rules as Backtester.run_vectorized: long-only,
+    trade_amount of the balance per entry, fills at the close, no trading
+    during the first WARMUP_BARS candles and an open position closed on
+    the last candle.
+
+    Args:
+        ohlcv_data: Historical OHLCV data (raw rows or OHLCVBuffer)
+        short_windows: Candidate short-term periods
+        long_windows: Candidate long-term periods
+        initial_balance: Starting capital for each backtest
+        trade_amount: Percentage of balance to use per trade (0.0 to 1.0)
+        chunk_size: Window pairs simulated per 2-D block, sized from
+            CHUNK_MEMORY_BYTES by default
+
+    Returns:
+        Dictionary of DataFrames indexed by short window with long windows as
+        columns (heatmap-ready): 'final_balance', 'return_percentage',
+        'total_trades' and 'win_rate'. Pairs with short >= long are NaN.
+    """
+    closes = as_ohlcv_buffer(ohlcv_data).close
+    n = len(closes)
+    short_windows = list(short_windows)
+    long_windows = list(long_windows)
+
+    grids = {
+        name: np.full((len(short_windows), len(long_windows)), np.nan)
+        for name in ('final_balance', 'return_percentage', 'total_trades', 'win_rate')
+    }
+    pairs = [(i, j) for i, short in enumerate(short_windows)
+             for j, long in enumerate(long_windows) if short < long]
+
+    if n and pairs:
+        windows = sorted(set(short_windows) | set(long_windows))
+        row_of = {window: row for row, window in enumerate(windows)}
+        averages = moving_averages(closes, windows)
+        short_rows = np.array([row_of[short_windows[i]] for i, _ in pairs])
+        long_rows = np.array([row_of[long_windows[j]] for _, j in pairs])
+
+        if chunk_size is None:
+            chunk_size = max(1, CHUNK_MEMORY_BYTES // (n * 8 * 8))
+        logger.info(f"Evaluating {len(pairs)} SMA window pairs on {n} candles")
+
+        final_balance = np.empty(len(pairs))
+        total_trades = np.empty(len(pairs))
+        winning_trades = np.empty(len(pairs))
+        for start in range(0, len(pairs), chunk_size):
+            stop = min(start + chunk_size, len(pairs))
+            final_balance[start:stop], total_trades[start:stop], winning_trades[start:stop] = _simulate(
+                closes, averages[short_rows[start:stop]] - averages[long_rows[start:stop]],
+                initial_balance, trade_amount
+            )
+
+        rows = np.array([i for i, _ in pairs])
+        columns = np.array([j for _, j in pairs])
+        grids['final_balance'][rows, columns] = final_balance
+        grids['return_percentage'][rows, columns] = (final_balance - initial_balance) / initial_balance * 100
+        grids['total_trades'][rows, columns] = total_trades
+        with np.errstate(invalid='ignore', divide='ignore'):
+            grids['win_rate'][rows, columns] = np.where(
+                total_trades > 0, winning_trades / total_trades * 100, 0.0
+            )
+
+    import pandas as pd
+    index = pd.Index(short_windows, name='short_window')
+    columns = pd.Index(long_windows, name='long_window')
+    return {name: pd.DataFrame(grid, index=index, columns=columns) for name, grid in grids.items()}
+
+
+def _simulate(closes: np.ndarray, spread: np.ndarray, initial_balance: float,
+              trade_amount: float):
+    """
+    Simulate one block of window pairs.
+
+    Args:
+        closes: Close prices, shape (n,)
+        spread: Short minus long moving average, shape (pairs, n)
+        initial_balance: Starting capital
+        trade_amount: Percentage of balance to use per trade
+
+    Returns:
+        Tuple of final balance, trade count and winning trade count per pair
+    """
+    pairs, n = spread.shape
+    bars = np.arange(n, dtype=np.int32)
+
+    # Crossovers; comparisons against NaN are False during the warm-up
+    signals = np.zeros((pairs, n), dtype=np.int8)
+    previous, current = spread[:, :-1], spread[:, 1:]
+    signals[:, 1:][(previous <= 0) & (current > 0)] = 1
+    signals[:, 1:][(previous >= 0) & (current < 0)] = -1
+    signals[:, :WARMUP_BARS - 1] = 0
+
+    # Long while the most recent non-zero signal is a buy: encode the bar
+    # index and the signal direction in one integer and carry the maximum
+    latest = np.where(signals != 0, bars * 2 + (signals > 0), -1)
+    np.maximum.accumulate(latest, axis=1, out=latest)
+    in_position = (latest >= 0) & (latest % 2 == 1)
+    was_in_position = np.zeros_like(in_position)
+    was_in_position[:, 1:] = in_position[:, :-1]
+
+    # Bar of the latest entry, carried forward to each exit
+    last_entry = np.where(in_position & ~was_in_position, bars, -1)
+    np.maximum.accumulate(last_entry, axis=1, out=last_entry)
+
+    exits = ~in_position & was_in_position
+    exits[:, -1] |= in_position[:, -1]
+    rows, exit_bars = np.nonzero(exits)
+    entry_prices = closes[last_entry[rows, exit_bars]]
+    exit_prices = closes[exit_bars]
+
+    # Each round trip scales the balance by (1 - f) + f * exit / entry
+    growth = (1.0 - trade_amount) + trade_amount * exit_prices / entry_prices
+    final_balance = initial_balance * np.exp(np.bincount(rows, weights=np.log(growth), minlength=pairs))
+    total_trades = np.bincount(rows, minlength=pairs)
+    winning_trades = np.bincount(rows, weights=exit_prices > entry_prices, minlength=pairs)
+    return final_balance, total_trades, winning_trades
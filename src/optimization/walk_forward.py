@@ -0,0 +1,398 @@
+"""
+Walk-forward optimization.
+Strategy parameters are optimized on each training window and evaluated on
+the test window that follows it, with folds running in worker processes.
+"""
+
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Sequence, Tuple
+import logging
+import math
+import numpy as np
+from src import optimization
+from src.backtesting.analytics import (bar_returns, exposure, max_drawdown, periods_per_year,
+                                       sharpe_ratio, sortino_ratio)
+from src.backtesting.cache import ResultCache, candles_digest
+from src.backtesting.fills import FillModel
+from src.data import OHLCVBuffer, OHLCVData, as_ohlcv_buffer
+from . import ParameterSweep, backtest, run_backtest
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# (train_start, train_stop, test_start, test_stop) candle indices
+Fold = Tuple[int, int, int, int]
+
+
+def walk_forward_folds(length: int, train_size: int, test_size: int,
+                       step: Optional[int] = None, anchored: bool = False) -> List[Fold]:
+    """
+    Split a history into consecutive training and test windows.
+
+    Rolling folds keep a training window of train_size candles just before
+    each test window; anchored folds grow the training window from the
+    first candle. Only complete test windows are used.
+
+    Args:
+        length: Number of candles
+        train_size: Candles in the (first) training window
+        test_size: Candles in each test window
+        step: Candles between test window starts (defaults to test_size)
+        anchored: Expand the training window instead of rolling it
+
+    Returns:
+        List of (train_start, train_stop, test_start, test_stop) indices
+    """
+    if train_size <= 0 or test_size <= 0:
+        raise ValueError("Training and test windows must hold at least one candle")
+    step = step or test_size
+    folds = []
+    test_start = train_size
+    while test_start + test_size <= length:
+        train_start = 0 if anchored else test_start - train_size
+        folds.append((train_start, test_start, test_start, test_start + test_size))
+        test_start += step
+    return folds
+
+
+def best_combination(combinations: Sequence[Dict[str, Any]], results: Sequence[Dict[str, Any]],
+                     rank_by: str) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Pick the combination with the highest score on a training window.
+
+    Ties keep the earlier combination. Combinations scoring NaN or infinity
+    are skipped; when none has a finite score the first one is kept.
+
+    Args:
+        combinations: Candidate parameter dictionaries
+        results: Training window results, one per combination
+        rank_by: Result column to maximize
+
+    Returns:
+        The chosen parameters and their results
+    """
+    if not combinations:
+        raise ValueError("Walk-forward optimization needs at least one parameter combination")
+    best = None
+    for index, candidate in enumerate(results):
+        score = candidate[rank_by]
+        if not math.isfinite(score):
+            continue
+        if best is None or score > results[best][rank_by]:
+            best = index
+    if best is None:
+        logger.warning(f"No combination has a finite {rank_by} on the training window, keeping the first")
+        best = 0
+    return combinations[best], results[best]
+
+
+def run_test_window(strategy_class, params: Dict[str, Any], candles: OHLCVBuffer, fold: Fold,
+                    initial_balance: float, trade_amount: float,
+                    fill_model: Optional[FillModel] = None) -> Dict[str, Any]:
+    """
+    Backtest chosen parameters on a fold's test window.
+
+    The training window is fed first so indicators are warmed up when the
+    test window starts; trades, the equity curve and the statistics only
+    cover the test window.
+
+    Args:
+        strategy_class: Strategy class to instantiate
+        params: Keyword arguments for the strategy
+        candles: Full candle history
+        fold: Training and test window indices
+        initial_balance: Starting capital of the test window
+        trade_amount: Percentage of balance to use per trade
+        fill_model: Fees, slippage and order type of simulated fills (defaults to FillModel())
+
+    Returns:
+        Dictionary with the 'out_of_sample' results and the test window's
+        'equity_curve' and 'position_curve'
+    """
+    train_start, _, test_start, test_stop = fold
+    backtester, results = backtest(strategy_class, params, candles[train_start:test_stop], initial_balance,
+                                   trade_amount, fill_model, start=test_start - train_start)
+    return {
+        'out_of_sample': {k: v for k, v in results.items() if k != 'trades'},
+        'equity_curve': backtester.equity_curve,
+        'position_curve': backtester.position_curve,
+    }
+
+
+def evaluate_fold(strategy_class, combinations: Sequence[Dict[str, Any]], candles: OHLCVBuffer,
+                  fold: Fold, initial_balance: float, trade_amount: float,
+                  rank_by: str, cache: Optional[ResultCache] = None,
+                  fill_model: Optional[FillModel] = None) -> Dict[str, Any]:
+    """
+    Optimize parameters on a fold's training window and test them on its test window.
+
+    Runs in the calling process; WalkForward spreads the same work over a
+    process pool.
+
+    Args:
+        strategy_class: Strategy class to instantiate
+        combinations: Candidate parameter dictionaries
+        candles: Full candle history
+        fold: Training and test window indices
+        initial_balance: Starting capital of every backtest
+        trade_amount: Percentage of balance to use per trade
+        rank_by: Result column maximized on the training window
+        cache: Optional result cache of the training window backtests
+        fill_model: Fees, slippage and order type of every backtest (defaults to FillModel())
+
+    Returns:
+        Dictionary with the chosen 'params', their 'in_sample' and
+        'out_of_sample' results and the test window's 'equity_curve' and
+        'position_curve'
+    """
+    train_start, train_stop, _, _ = fold
+    train = candles[train_start:train_stop]
+    digest = candles_digest(train) if cache is not None else None
+    results = [run_backtest(strategy_class, params, train, initial_balance, trade_amount, cache, digest, fill_model)
+               for params in combinations]
+    params, in_sample = best_combination(combinations, results, rank_by)
+    return {
+        'params': params,
+        'in_sample': in_sample,
+        **run_test_window(strategy_class, params, candles, fold, initial_balance, trade_amount, fill_model),
+    }
+
+
+def _run_worker_training(strategy_class, params: Dict[str, Any], fold: Fold, initial_balance: float,
+                         trade_amount: float, digest: Optional[str] = None,
+                         fill_model: Optional[FillModel] = None) -> Dict[str, Any]:
+    """Backtest one combination on a fold's training window of the shared candle history."""
+    train_start, train_stop, _, _ = fold
+    return run_backtest(strategy_class, params, optimization._worker_candles[train_start:train_stop],
+                        initial_balance, trade_amount, optimization._worker_cache, digest, fill_model)
+
+
+def _run_worker_test(strategy_class, params: Dict[str, Any], fold: Fold, initial_balance: float,
+                     trade_amount: float, fill_model: Optional[FillModel] = None) -> Dict[str, Any]:
+    """Backtest the chosen combination on a fold's test window of the shared candle history."""
+    return run_test_window(strategy_class, params, optimization._worker_candles, fold,
+                           initial_balance, trade_amount, fill_model)
+
+
+class WalkForward:
+    """
+    Walk-forward optimization using a process pool.
+
+    Every fold optimizes the parameter grid on its training window and
+    backtests the winner on the following test window. The training
+    backtests of all folds are spread over the pool one combination at a
+    time on the shared-memory candle history, and the test windows are
+    chained into one out-of-sample equity curve.
+    """
+
+    def __init__(self, strategy_class, param_grid: Dict[str, Sequence[Any]],
+                 train_size: int, test_size: int, step: Optional[int] = None,
+                 anchored: bool = False, **kwargs):
+        """
+        Initialize walk-forward optimization.
+
+        Args:
+            strategy_class: Strategy class to instantiate for each combination
+            param_grid: Mapping of parameter name to candidate values
+            train_size: Candles in the (first) training window
+            test_size: Candles in each test window
+            step: Candles between test window starts (defaults to test_size)
+            anchored: Expand the training window from the first candle instead of rolling it
+            **kwargs: initial_balance, trade_amount, max_workers, rank_by,
+                constraint, cache and fill_model, as for ParameterSweep; the cache
+                holds the training window backtests
+        """
+        # The sweep holds the grid and backtest settings shared by every fold
+        self.sweep = ParameterSweep(strategy_class, param_grid, **kwargs)
+        self.train_size = train_size
+        self.test_size = test_size
+        self.step = step
+        self.anchored = anchored
+        self.equity_curve = np.empty(0)
+
+    def run(self, ohlcv_data: OHLCVData,
+            progress: Optional[Callable[[int, int], None]] = None) -> Dict[str, Any]:
+        """
+        Run every fold and combine the out-of-sample results.
+
+        On Ctrl-C outstanding backtests are cancelled, workers are shut down
+        and shared memory is released before KeyboardInterrupt is re-raised.
+
+        Args:
+            ohlcv_data: Historical OHLCV data (raw rows or OHLCVBuffer)
+            progress: Optional callback called with (completed folds, total folds)
+
+        Returns:
+            Combined out-of-sample statistics (see combine_folds) plus
+            'folds', a DataFrame with one row per fold
+        """
+        candles = as_ohlcv_buffer(ohlcv_data)
+        folds = walk_forward_folds(len(candles), self.train_size, self.test_size, self.step, self.anchored)
+        if not folds:
+            raise ValueError(f"{len(candles)} candles are too few for a {self.train_size} candle "
+                             f"training window and a {self.test_size} candle test window")
+        sweep = self.sweep
+        if not sweep.combinations:
+            raise ValueError("Walk-forward optimization needs at least one parameter combination")
+
+        total = len(folds)
+        logger.info(f"Running {total} walk-forward folds of {len(sweep.combinations)} "
+                    f"combinations on {sweep.max_workers} workers")
+
+        timestamps_segment, values_segment = optimization._share_candles(candles)
+        executor = ProcessPoolExecutor(
+            max_workers=min(sweep.max_workers, total * len(sweep.combinations)),
+            initializer=optimization._init_worker,
+            initargs=(timestamps_segment.name, values_segment.name, len(candles), sweep.cache)
+        )
+        outcomes: List[Optional[Dict[str, Any]]] = [None] * total
+        try:
+            self._run_folds(executor, candles, folds, outcomes, progress)
+        except KeyboardInterrupt:
+            logger.warning(f"Walk-forward interrupted after {sum(o is not None for o in outcomes)}/{total} "
+                           f"folds, cancelling")
+            executor.shutdown(wait=True, cancel_futures=True)
+            raise
+        except Exception:
+            # A failed backtest ends the run without finishing the other folds
+            executor.shutdown(wait=True, cancel_futures=True)
+            raise
+        finally:
+            executor.shutdown(wait=True)
+            for segment in (timestamps_segment, values_segment):
+                segment.close()
+                segment.unlink()
+
+        summary = combine_folds(outcomes, sweep.initial_balance, _bars_per_year(candles))
+        self.equity_curve = summary.pop('equity_curve')
+        summary['folds'] = self._fold_table(candles, folds, outcomes)
+        return summary
+
+    def _run_folds(self, executor: ProcessPoolExecutor, candles: OHLCVBuffer, folds: List[Fold],
+                   outcomes: List[Optional[Dict[str, Any]]],
+                   progress: Optional[Callable[[int, int], None]]) -> None:
+        """
+        Run the training backtests of every fold, then each fold's test window as soon as its grid is done.
+
+        Fills outcomes in fold order.
+        """
+        sweep = self.sweep
+        combinations = sweep.combinations
+        settings = (sweep.initial_balance, sweep.trade_amount)
+        training: List[List[Optional[Dict[str, Any]]]] = [[None] * len(combinations) for _ in folds]
+        remaining = [len(combinations)] * len(folds)
+        pending = {}
+        for index, fold in enumerate(folds):
+            digest = candles_digest(candles[fold[0]:fold[1]]) if sweep.cache is not None else None
+            for position, params in enumerate(combinations):
+                future = executor.submit(_run_worker_training, sweep.strategy_class, params, fold, *settings,
+                                         digest, sweep.fill_model)
+                pending[future] = (index, position)
+
+        completed = 0
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                index, position = pending.pop(future)
+                if position is None:
+                    outcomes[index].update(future.result())
+                    completed += 1
+                    if progress is not None:
+                        progress(completed, len(folds))
+                    logger.info(f"Walk-forward progress: {completed}/{len(folds)}")
+                    continue
+
+                training[index][position] = future.result()
+                remaining[index] -= 1
+                if not remaining[index]:
+                    params, in_sample = best_combination(combinations, training[index], sweep.rank_by)
+                    outcomes[index] = {'params': params, 'in_sample': in_sample}
+                    future = executor.submit(_run_worker_test, sweep.strategy_class, params, folds[index],
+                                             *settings, sweep.fill_model)
+                    pending[future] = (index, None)
+
+    def _fold_table(self, candles: OHLCVBuffer, folds: List[Fold],
+                    outcomes: List[Dict[str, Any]]) -> 'pd.DataFrame':
+        """One row per fold with its windows, chosen parameters and results."""
+        import pandas as pd
+        timestamps = pd.to_datetime(candles.timestamp, unit='ms')
+        rows = []
+        for index, ((train_start, train_stop, test_start, test_stop), outcome) in enumerate(zip(folds, outcomes)):
+            out_of_sample = outcome['out_of_sample']
+            rows.append({
+                'fold': index,
+                'train_start': timestamps[train_start],
+                'train_end': timestamps[train_stop - 1],
+                'test_start': timestamps[test_start],
+                'test_end': timestamps[test_stop - 1],
+                **outcome['params'],
+                f"in_sample_{self.sweep.rank_by}": outcome['in_sample'][self.sweep.rank_by],
+                'return_percentage': out_of_sample['return_percentage'],
+                'total_trades': out_of_sample['total_trades'],
+                'win_rate': out_of_sample['win_rate'],
+                'sharpe_ratio': out_of_sample['sharpe_ratio'],
+                'max_drawdown': out_of_sample['max_drawdown'],
+            })
+        return pd.DataFrame(rows)
+
+
+def _bars_per_year(candles: OHLCVBuffer) -> float:
+    """Bars per year implied by the average candle spacing."""
+    if len(candles) < 2:
+        return 0.0
+    return periods_per_year((candles.timestamp[-1] - candles.timestamp[0]) / (len(candles) - 1))
+
+
+def combine_folds(outcomes: Sequence[Dict[str, Any]], initial_balance: float,
+                  periods: float) -> Dict[str, Any]:
+    """
+    Chain the test windows of several folds into one out-of-sample result.
+
+    Each test window starts with the capital the previous one ended with,
+    so returns compound and the equity curves join into one curve.
+
+    Args:
+        outcomes: evaluate_fold results in chronological order
+        initial_balance: Starting capital of the first test window
+        periods: Bars per year, used to annualize the ratios
+
+    Returns:
+        Dictionary with 'initial_balance', 'final_balance',
+        'return_percentage', trade counts, 'win_rate', 'sharpe_ratio',
+        'sortino_ratio', 'max_drawdown', 'exposure', 'turnover' and the
+        combined 'equity_curve'
+    """
+    curves, positions = [], []
+    capital = initial_balance
+    notional = 0.0
+    for outcome in outcomes:
+        equity = outcome['equity_curve']
+        scale = capital / outcome['out_of_sample']['initial_balance']
+        curves.append(equity * scale)
+        positions.append(outcome['position_curve'])
+        if len(equity):
+            notional += outcome['out_of_sample']['turnover'] * equity.mean() * scale
+        capital *= outcome['out_of_sample']['final_balance'] / outcome['out_of_sample']['initial_balance']
+
+    equity = np.concatenate(curves) if curves else np.empty(0)
+    position = np.concatenate(positions) if positions else np.empty(0)
+    returns = bar_returns(equity)
+    total_trades = sum(outcome['out_of_sample']['total_trades'] for outcome in outcomes)
+    winning_trades = sum(outcome['out_of_sample']['winning_trades'] for outcome in outcomes)
+    return {
+        'initial_balance': initial_balance,
+        'final_balance': capital,
+        'return_percentage': (capital / initial_balance - 1) * 100,
+        'total_trades': total_trades,
+        'winning_trades': winning_trades,
+        'losing_trades': sum(outcome['out_of_sample']['losing_trades'] for outcome in outcomes),
+        'win_rate': winning_trades / total_trades * 100 if total_trades else 0,
+        'sharpe_ratio': sharpe_ratio(returns, periods),
+        'sortino_ratio': sortino_ratio(returns, periods),
+        'max_drawdown': max_drawdown(equity) * 100,
+        'exposure': exposure(position) * 100,
+        'turnover': float(notional / equity.mean()) if len(equity) else 0.0,
+        'equity_curve': equity,
+    }
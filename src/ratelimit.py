@@ -0,0 +1,197 @@
+"""
+Priority-aware token-bucket rate limiting for exchange calls.
+One limiter is shared by every coroutine and connector using the same
+exchange account, so orders are never stuck behind a flood of market
+data requests.
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import random
+import time
+from typing import Any, Dict, Hashable, List, Mapping, Optional
+
+logger = logging.getLogger(__name__)
+
+# Lower values are served first
+PRIORITIES = {
+    'order': 0,
+    'cancel': 1,
+    'account': 2,
+    'market_data': 3,
+}
+
+
+class RateLimiter:
+    """
+    Token bucket serving queued calls in priority order.
+
+    Tokens refill at the current rate up to burst. The rate halves after
+    every rate-limit rejection (down to min_rate) and recovers gradually
+    with successful calls; Retry-After and X-RateLimit-* headers pause
+    the bucket until the exchange's window resets.
+
+    A limiter serves one event loop at a time. When it is used from a new
+    loop (e.g. a later asyncio.run()), the queue of the old loop is dropped
+    and a dispatcher is started on the new one, keeping the bucket state.
+    """
+
+    _shared: Dict[Hashable, 'RateLimiter'] = {}
+
+    def __init__(self, rate: float, burst: float = 1.0, min_rate: Optional[float] = None):
+        """
+        Initialize rate limiter.
+
+        Args:
+            rate: Requests per second allowed by the exchange
+            burst: Requests that may be made at once after an idle period
+            min_rate: Lowest rate to back off to (defaults to a tenth of rate)
+        """
+        self.base_rate = rate
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        self.min_rate = min_rate if min_rate is not None else rate / 10
+        self.stats = {name: {'calls': 0, 'wait_total': 0.0, 'wait_max': 0.0} for name in PRIORITIES}
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._waiters: List[List[Any]] = []
+        self._sequence = itertools.count()
+        self._dispatcher: Optional[asyncio.Task] = None
+
+    @classmethod
+    def shared(cls, key: Hashable, rate: float, burst: float = 1.0) -> 'RateLimiter':
+        """
+        Get the limiter shared by every caller using the same key.
+
+        Args:
+            key: Identifies the rate-limited account, e.g. (exchange name, API key)
+            rate: Requests per second used when the limiter is created
+            burst: Burst size used when the limiter is created
+
+        Returns:
+            The shared limiter
+        """
+        if key not in cls._shared:
+            cls._shared[key] = cls(rate, burst)
+        return cls._shared[key]
+
+    async def acquire(self, priority: str = 'market_data', cost: float = 1.0) -> float:
+        """
+        Wait for permission to make a call.
+
+        Args:
+            priority: Priority class from PRIORITIES
+            cost: Tokens the call consumes
+
+        Returns:
+            Seconds spent waiting in the queue
+        """
+        started = time.monotonic()
+        loop = asyncio.get_running_loop()
+        if self._dispatcher is not None and self._dispatcher.get_loop() is not loop:
+            # Calls queued on another loop can never be served from this one
+            self._waiters = [waiter for waiter in self._waiters if waiter[3].get_loop() is loop]
+            heapq.heapify(self._waiters)
+            self._dispatcher = None
+        future = loop.create_future()
+        heapq.heappush(self._waiters, [PRIORITIES[priority], next(self._sequence), cost, future])
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = loop.create_task(self._dispatch())
+        await future
+
+        wait = time.monotonic() - started
+        stats = self.stats[priority]
+        stats['calls'] += 1
+        stats['wait_total'] += wait
+        stats['wait_max'] = max(stats['wait_max'], wait)
+        return wait
+
+    async def _dispatch(self) -> None:
+        """Hand out tokens to queued calls, highest priority first."""
+        while self._waiters:
+            now = time.monotonic()
+            if self._paused_until > now:
+                await asyncio.sleep(self._paused_until - now)
+                continue
+            self._refill(now)
+
+            _, _, cost, future = self._waiters[0]
+            if future.done():
+                heapq.heappop(self._waiters)
+            elif self._tokens >= min(cost, self.burst):
+                heapq.heappop(self._waiters)
+                self._tokens -= cost
+                future.set_result(None)
+            else:
+                await asyncio.sleep((min(cost, self.burst) - self._tokens) / self.rate)
+
+    def _refill(self, now: float) -> None:
+        """Add the tokens earned since the last refill."""
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def record_success(self) -> None:
+        """Recover the rate gradually after a successful call."""
+        if self.rate < self.base_rate:
+            self.rate = min(self.base_rate, self.rate + self.base_rate / 20)
+
+    def record_rejection(self, retry_after: Optional[float] = None) -> None:
+        """
+        Back off after the exchange rejected a call for exceeding its limit.
+
+        Args:
+            retry_after: Seconds the exchange asked us to wait, if known
+        """
+        self.rate = max(self.min_rate, self.rate / 2)
+        self._tokens = 0.0
+        if retry_after:
+            self.pause(retry_after)
+        logger.warning(f"Rate limited by the exchange, slowing down to {self.rate:.2f} requests/s")
+
+    def pause(self, seconds: float) -> None:
+        """Stop handing out tokens for the given number of seconds."""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def update_from_headers(self, headers: Optional[Mapping[str, Any]]) -> None:
+        """
+        Apply rate-limit response headers.
+
+        Understands Retry-After and X-RateLimit-Remaining together with
+        X-RateLimit-Reset (seconds, or an epoch timestamp).
+
+        Args:
+            headers: Response headers of the last call
+        """
+        if not headers:
+            return
+        headers = {str(name).lower(): value for name, value in headers.items()}
+        try:
+            if 'retry-after' in headers:
+                self.pause(float(headers['retry-after']))
+            elif float(headers.get('x-ratelimit-remaining', 1)) <= 0 and 'x-ratelimit-reset' in headers:
+                reset = float(headers['x-ratelimit-reset'])
+                if reset > 1e12:
+                    reset = reset / 1000 - time.time()
+                elif reset > 1e9:
+                    reset -= time.time()
+                self.pause(max(reset, 0.0))
+        except (TypeError, ValueError):
+            logger.debug(f"Ignoring unparsable rate-limit headers: {headers}")
+
+
+def backoff_delay(attempt: int, base: float = 0.5, maximum: float = 30.0) -> float:
+    """
+    Exponential backoff with full jitter.
+
+    Args:
+        attempt: Retry number, starting at 0
+        base: Delay of the first retry in seconds
+        maximum: Upper bound of the delay
+
+    Returns:
+        Seconds to wait before the retry
+    """
+    return random.uniform(0, min(maximum, base * 2 ** attempt))
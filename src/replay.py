@@ -0,0 +1,518 @@
+"""
+Replay and paper-trading exchange.
+Serves recorded candles as if they were live, paced by a virtual clock
+that can run thousands of times faster than real time, and fills orders
+against them, so the live bot can be soak-tested end to end offline.
+"""
+
+from typing import TYPE_CHECKING, Any, Dict, List, Mapping, Optional, Tuple
+import asyncio
+import itertools
+import logging
+import time
+import numpy as np
+from src.backtesting.fills import FillModel
+from src.backtesting.ledger import BUY, SELL, TradeLedger
+from src.data import OHLCVBuffer, OHLCVData, as_ohlcv_buffer, timeframe_to_ms
+from src.exchange import ExchangeConnector, _ccxt
+from src.scheduler import Clock, VirtualClock
+
+if TYPE_CHECKING:
+    from src.bot import TradingBot
+
+logger = logging.getLogger(__name__)
+
+# Candles before the replay start, matching the bot's first fetch
+DEFAULT_WARMUP = 100
+
+DEFAULT_BALANCE = {'USDT': 10000.0}
+
+# Rounding slack when checking funds
+_EPSILON = 1e-9
+
+
+def _currencies(symbol: str) -> Tuple[str, str]:
+    """Base and quote currency of a symbol such as 'BTC/USDT' or 'BTC/USDT:USDT'."""
+    base, quote = symbol.split('/', 1)
+    return base, quote.split(':', 1)[0]
+
+
+class PaperExchange:
+    """
+    Stand-in for a ccxt async exchange replaying recorded candles.
+
+    Only candles that opened before the clock's current time are served.
+    The candle still forming is reported at its open price, so nothing
+    after the clock is revealed, and the ticker price is that open (or
+    the last close in a gap). Market orders fill immediately at the ticker
+    price moved by the fill model's slippage and pay its taker fee. Limit
+    orders reserve their funds and fill, at the limit or a better open and
+    paying the maker fee, once a closed candle of the symbol's shortest
+    timeframe reaches them. Orders, balances and fills live in memory.
+    """
+
+    # No client-side throttling, as for ccxt with enableRateLimit off
+    rateLimit = 0
+
+    def __init__(self, candles: Mapping[Tuple[str, str], OHLCVData], clock: Clock,
+                 balance: Optional[Mapping[str, float]] = None,
+                 fill_model: Optional[FillModel] = None, latency: float = 0.0):
+        """
+        Initialize paper exchange.
+
+        Args:
+            candles: Recorded candles keyed by (symbol, timeframe)
+            clock: Clock deciding which candles have happened
+            balance: Starting balance per currency (defaults to 10000 USDT)
+            fill_model: Fees and slippage of fills (defaults to FillModel())
+            latency: Clock seconds every request takes
+        """
+        self.candles = {key: as_ohlcv_buffer(data) for key, data in candles.items()}
+        self.clock = clock
+        self.fill_model = fill_model or FillModel()
+        self.latency = latency
+        self.total: Dict[str, float] = dict(DEFAULT_BALANCE if balance is None else balance)
+        self.used: Dict[str, float] = {}
+        self.orders: Dict[str, Dict[str, Any]] = {}
+        self.trades = TradeLedger()
+        self.last_response_headers = None
+        # Open limit orders: id -> (reserved currency, reserved amount, last bar checked)
+        self._resting: Dict[str, List] = {}
+        self._order_ids = itertools.count(1)
+
+        # Tickers and limit fills use the shortest timeframe of each symbol
+        self._price_series: Dict[str, Tuple[OHLCVBuffer, int]] = {}
+        for (symbol, timeframe), series in self.candles.items():
+            timeframe_ms = timeframe_to_ms(timeframe)
+            if symbol not in self._price_series or timeframe_ms < self._price_series[symbol][1]:
+                self._price_series[symbol] = (series, timeframe_ms)
+        self.markets = {}
+        for symbol in self._price_series:
+            base, quote = _currencies(symbol)
+            self.markets[symbol] = {'id': symbol.replace('/', ''), 'symbol': symbol,
+                                    'base': base, 'quote': quote, 'active': True}
+
+    def now_ms(self) -> int:
+        """Current clock time in milliseconds."""
+        return int(self.clock.time() * 1000)
+
+    async def _respond(self) -> int:
+        """Wait out the request latency and settle limit orders; returns the current time."""
+        if self.latency:
+            await self.clock.sleep(self.latency)
+        now = self.now_ms()
+        if self._resting:
+            self._match_limit_orders(now)
+        return now
+
+    def _series(self, symbol: str) -> Tuple[OHLCVBuffer, int]:
+        """Price series of a symbol and its timeframe in milliseconds."""
+        if symbol not in self._price_series:
+            raise _ccxt().BadSymbol(f"No recorded candles for {symbol}")
+        return self._price_series[symbol]
+
+    def price(self, symbol: str, now: Optional[int] = None) -> float:
+        """
+        Get the price of a symbol at the clock's current time.
+
+        Args:
+            symbol: Trading pair symbol
+            now: Time in milliseconds (defaults to the clock)
+
+        Returns:
+            Open of the forming candle, or the last close between candles
+        """
+        series, timeframe_ms = self._series(symbol)
+        if now is None:
+            now = self.now_ms()
+        index = int(np.searchsorted(series.timestamp, now, side='right')) - 1
+        if index < 0:
+            raise _ccxt().ExchangeError(f"Replay of {symbol} has not started yet")
+        if series.timestamp[index] + timeframe_ms > now:
+            return float(series.open[index])
+        return float(series.close[index])
+
+    async def load_markets(self, reload: bool = False) -> Dict[str, Dict[str, Any]]:
+        """Markets of the replayed symbols."""
+        return self.markets
+
+    async def close(self) -> None:
+        """Nothing to release."""
+
+    async def fetch_ohlcv(self, symbol: str, timeframe: str = '1m', since: Optional[int] = None,
+                          limit: Optional[int] = None) -> List[List]:
+        """
+        Fetch candles that opened up to the current time.
+
+        Args:
+            symbol: Trading pair symbol
+            timeframe: Candlestick timeframe
+            since: Timestamp in milliseconds of the first candle
+            limit: Number of candles (defaults to 500)
+
+        Returns:
+            List of OHLCV data; the last one may be the forming candle
+        """
+        now = await self._respond()
+        series = self.candles.get((symbol, timeframe))
+        if series is None:
+            raise _ccxt().BadSymbol(f"No recorded {timeframe} candles for {symbol}")
+        limit = limit or 500
+        timestamps = series.timestamp
+        stop = int(np.searchsorted(timestamps, now, side='right'))
+        if since is None:
+            start = max(stop - limit, 0)
+        else:
+            start = int(np.searchsorted(timestamps, since))
+            stop = min(stop, start + limit)
+        ohlcv_data = series[start:stop].to_list() if start < stop else []
+
+        if ohlcv_data and ohlcv_data[-1][0] + timeframe_to_ms(timeframe) > now:
+            timestamp, open_price = ohlcv_data[-1][:2]
+            ohlcv_data[-1] = [timestamp, open_price, open_price, open_price, open_price, 0.0]
+        return ohlcv_data
+
+    async def fetch_ticker(self, symbol: str) -> Dict[str, Any]:
+        """
+        Fetch the ticker of a symbol.
+
+        Returns:
+            Ticker with 'last', and 'bid' and 'ask' moved by the slippage
+        """
+        now = await self._respond()
+        price = self.price(symbol, now)
+        return {
+            'symbol': symbol, 'timestamp': now, 'last': price, 'close': price,
+            'bid': float(self.fill_model.market_price(price, SELL)),
+            'ask': float(self.fill_model.market_price(price, BUY)),
+        }
+
+    async def fetch_balance(self) -> Dict[str, Any]:
+        """
+        Fetch balances in ccxt's layout.
+
+        Returns:
+            'free', 'used' and 'total' per currency, also keyed by currency
+        """
+        await self._respond()
+        balance: Dict[str, Any] = {'free': {}, 'used': {}, 'total': {}}
+        for currency, total in self.total.items():
+            used = self.used.get(currency, 0.0)
+            entry = {'free': total - used, 'used': used, 'total': total}
+            balance[currency] = entry
+            for field, value in entry.items():
+                balance[field][currency] = value
+        return balance
+
+    async def create_market_order(self, symbol: str, side: str, amount: float,
+                                  price: Optional[float] = None,
+                                  params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Fill a market order at the current price.
+
+        Args:
+            symbol: Trading pair symbol
+            side: 'buy' or 'sell'
+            amount: Amount in base currency
+            price: Ignored, as by ccxt for market orders
+            params: Ignored
+
+        Returns:
+            The closed order
+        """
+        now = await self._respond()
+        fill_side = self._side(side)
+        fill_price = float(self.fill_model.market_price(self.price(symbol, now), fill_side))
+        self._check_funds(symbol, fill_side, amount, fill_price, self.fill_model.taker_fee)
+        order = self._new_order(symbol, 'market', side, amount, None, now)
+        self._fill(order, fill_price, self.fill_model.taker_fee, now)
+        return dict(order)
+
+    async def create_limit_order(self, symbol: str, side: str, amount: float, price: float,
+                                 params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Place a limit order, reserving its funds.
+
+        Args:
+            symbol: Trading pair symbol
+            side: 'buy' or 'sell'
+            amount: Amount in base currency
+            price: Limit price
+            params: Ignored
+
+        Returns:
+            The open order
+        """
+        now = await self._respond()
+        fill_side = self._side(side)
+        self._check_funds(symbol, fill_side, amount, price, self.fill_model.maker_fee)
+        order = self._new_order(symbol, 'limit', side, amount, price, now)
+
+        base, quote = _currencies(symbol)
+        if fill_side == BUY:
+            currency, reserved = quote, amount * price * (1 + self.fill_model.maker_fee)
+        else:
+            currency, reserved = base, amount
+        self.used[currency] = self.used.get(currency, 0.0) + reserved
+        series, _ = self._series(symbol)
+        placed = int(np.searchsorted(series.timestamp, now, side='right')) - 1
+        self._resting[order['id']] = [currency, reserved, placed]
+        return dict(order)
+
+    async def cancel_order(self, order_id: str, symbol: Optional[str] = None,
+                           params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Cancel an open order, releasing its reserved funds.
+
+        Returns:
+            The cancelled order
+        """
+        await self._respond()
+        if order_id not in self._resting:
+            raise _ccxt().OrderNotFound(f"Order {order_id} is not open")
+        currency, reserved, _ = self._resting.pop(order_id)
+        self.used[currency] -= reserved
+        order = self.orders[order_id]
+        order['status'] = 'canceled'
+        return dict(order)
+
+    async def fetch_open_orders(self, symbol: Optional[str] = None, since: Optional[int] = None,
+                                limit: Optional[int] = None,
+                                params: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Open limit orders, optionally of one symbol."""
+        await self._respond()
+        return [dict(self.orders[order_id]) for order_id in self._resting
+                if symbol is None or self.orders[order_id]['symbol'] == symbol]
+
+    def equity(self, currency: str = 'USDT') -> float:
+        """
+        Value every balance in one currency at current prices.
+
+        Args:
+            currency: Quote currency to value in
+
+        Returns:
+            Total balance value; currencies without a replayed symbol are skipped
+        """
+        now = self.now_ms()
+        value = 0.0
+        for held, total in self.total.items():
+            if held == currency:
+                value += total
+            elif total and f"{held}/{currency}" in self._price_series:
+                value += total * self.price(f"{held}/{currency}", now)
+        return value
+
+    @staticmethod
+    def _side(side: str) -> int:
+        """BUY or SELL of an order side."""
+        if side not in ('buy', 'sell'):
+            raise _ccxt().InvalidOrder(f"Unsupported order side: {side}")
+        return BUY if side == 'buy' else SELL
+
+    def _check_funds(self, symbol: str, side: int, amount: float, price: float, fee: float) -> None:
+        """Raise InsufficientFunds when the free balance cannot pay for an order."""
+        base, quote = _currencies(symbol)
+        if side == BUY:
+            currency, needed = quote, amount * price * (1 + fee)
+        else:
+            currency, needed = base, amount
+        free = self.total.get(currency, 0.0) - self.used.get(currency, 0.0)
+        if needed > free + _EPSILON:
+            raise _ccxt().InsufficientFunds(f"Order needs {needed} {currency}, {free} free")
+
+    def _new_order(self, symbol: str, order_type: str, side: str, amount: float,
+                   price: Optional[float], now: int) -> Dict[str, Any]:
+        """Record a new open order."""
+        order = {
+            'id': str(next(self._order_ids)), 'timestamp': now, 'lastTradeTimestamp': None,
+            'symbol': symbol, 'type': order_type, 'side': side, 'price': price, 'average': None,
+            'amount': amount, 'filled': 0.0, 'remaining': amount, 'cost': 0.0, 'status': 'open',
+            'fee': None,
+        }
+        self.orders[order['id']] = order
+        return order
+
+    def _fill(self, order: Dict[str, Any], price: float, fee_rate: float, timestamp: int) -> None:
+        """Fill a whole order at one price and settle the balances."""
+        base, quote = _currencies(order['symbol'])
+        amount = order['amount']
+        cost = amount * price
+        fee = cost * fee_rate
+        if order['side'] == 'buy':
+            self.total[quote] = self.total.get(quote, 0.0) - cost - fee
+            self.total[base] = self.total.get(base, 0.0) + amount
+        else:
+            self.total[base] = self.total.get(base, 0.0) - amount
+            self.total[quote] = self.total.get(quote, 0.0) + cost - fee
+        order.update({'status': 'closed', 'filled': amount, 'remaining': 0.0, 'average': price,
+                      'cost': cost, 'lastTradeTimestamp': timestamp,
+                      'fee': {'cost': fee, 'currency': quote}})
+        if order['price'] is None:
+            order['price'] = price
+        self.trades.record(timestamp, self._side(order['side']), price, amount,
+                           self.total[quote], fee=fee)
+
+    def _match_limit_orders(self, now: int) -> None:
+        """Fill open limit orders reached by candles that closed since they were last checked."""
+        for order_id, resting in list(self._resting.items()):
+            currency, reserved, checked = resting
+            order = self.orders[order_id]
+            series, timeframe_ms = self._price_series[order['symbol']]
+            # Last candle that closed by now
+            deadline = int(np.searchsorted(series.timestamp, now - timeframe_ms, side='right')) - 1
+            if deadline <= checked:
+                continue
+            bars, prices = self.fill_model.match_limit_orders(
+                series, np.array([checked]), self._side(order['side']),
+                np.array([order['price']]), np.array([deadline])
+            )
+            if bars[0] < 0:
+                resting[2] = deadline
+                continue
+            del self._resting[order_id]
+            self.used[currency] -= reserved
+            self._fill(order, float(prices[0]), self.fill_model.maker_fee, int(series.timestamp[bars[0]]))
+
+
+class ReplayConnector(ExchangeConnector):
+    """
+    ExchangeConnector trading on a PaperExchange.
+
+    Everything above the ccxt client runs unchanged: request caching,
+    order invalidation, retries and, when enabled, rate limiting. The
+    connector's clock (a VirtualClock by default) must also be given to
+    the bot. Cache TTLs are configured in clock seconds like every other
+    duration of a replay and are scaled by the clock speed.
+
+    Example:
+        connector = ReplayConnector({('BTC/USDT', '1m'): candles}, speed=2000)
+        bot = TradingBot({}, {'symbol': 'BTC/USDT', 'timeframe': '1m'}, strategy,
+                         exchange=connector, clock=connector.clock)
+        report = await run_replay(bot)
+    """
+
+    def __init__(self, candles: Mapping[Tuple[str, str], OHLCVData], clock: Optional[Clock] = None,
+                 speed: float = 1000.0, start: Optional[int] = None,
+                 balance: Optional[Mapping[str, float]] = None, fill_model: Optional[FillModel] = None,
+                 latency: float = 0.0, exchange_config: Optional[Dict[str, Any]] = None):
+        """
+        Initialize replay connector.
+
+        Args:
+            candles: Recorded candles keyed by (symbol, timeframe)
+            clock: Clock of the replay (defaults to a VirtualClock at start)
+            speed: Speed of the default VirtualClock
+            start: Timestamp in milliseconds the default clock starts at
+                (defaults to DEFAULT_WARMUP candles into the recording)
+            balance: Starting balance per currency (defaults to 10000 USDT)
+            fill_model: Fees and slippage of fills
+            latency: Clock seconds every request takes
+            exchange_config: ExchangeConnector options such as 'cache_ttl'
+        """
+        super().__init__({'name': 'replay', 'enableRateLimit': False, **(exchange_config or {})})
+        self.candles = {key: as_ohlcv_buffer(data) for key, data in candles.items()}
+        if not any(len(series) for series in self.candles.values()):
+            raise ValueError("Cannot replay without candles")
+        if start is None:
+            start = max(int(series.timestamp[min(DEFAULT_WARMUP, len(series) - 1)])
+                        for series in self.candles.values() if len(series))
+        self.clock = clock or VirtualClock(start / 1000, speed)
+        self.cache_ttl = {endpoint: ttl / getattr(self.clock, 'speed', 1.0)
+                          for endpoint, ttl in self.cache_ttl.items()}
+        self.balance = balance
+        self.fill_model = fill_model
+        self.latency = latency
+
+    @property
+    def end_ms(self) -> int:
+        """Close time in milliseconds of the last recorded candle."""
+        return max(int(series.timestamp[-1]) + timeframe_to_ms(timeframe)
+                   for (_, timeframe), series in self.candles.items() if len(series))
+
+    async def connect(self, reload_markets: Optional[bool] = None) -> None:
+        """
+        Open the paper exchange; the account is kept across reconnects.
+
+        Args:
+            reload_markets: Ignored, markets come from the recording
+        """
+        if self.exchange is None:
+            self.exchange = PaperExchange(self.candles, self.clock, self.balance,
+                                          self.fill_model, self.latency)
+        logger.info("Connected to replay exchange with %d series", len(self.candles))
+
+
+async def run_replay(bot: 'TradingBot', until: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Run a bot on a ReplayConnector until the recording is used up.
+
+    The bot is stopped once every market has been fed its last recorded
+    candle, or one timeframe after the last close (or at until) at the
+    latest. Errors raised by the bot are re-raised.
+
+    Args:
+        bot: Bot whose exchange is a ReplayConnector, running on its clock
+        until: Timestamp in milliseconds to stop at instead
+
+    Returns:
+        Dictionary with the virtual and real 'seconds' elapsed, the
+        'speedup', scheduling stats ('cycles', 'missed_cycles',
+        'max_drift'), 'orders' placed, the fills as 'trades' (TradeLedger),
+        'balance' per currency and 'equity' in the quote currency
+    """
+    connector = bot.exchange
+    if not isinstance(connector, ReplayConnector):
+        raise TypeError("run_replay needs a bot trading on a ReplayConnector")
+    if bot.clock is not connector.clock:
+        raise ValueError("The bot must run on the replay connector's clock")
+    clock = connector.clock
+    if connector.exchange is None:
+        await connector.connect()
+
+    longest = max(timeframe_to_ms(market.timeframe) for market in bot.markets)
+    shortest = min(timeframe_to_ms(market.timeframe) for market in bot.markets)
+    deadline = until if until is not None else connector.end_ms + longest
+    last_timestamps = {key: int(series.timestamp[-1]) for key, series in connector.candles.items() if len(series)}
+    # Check for the end a few times per candle of the shortest timeframe
+    poll = shortest / 1000 / getattr(clock, 'speed', 1.0) / 4
+
+    started, virtual_start = time.perf_counter(), clock.time()
+    task = asyncio.ensure_future(bot.start())
+    try:
+        while not task.done():
+            if clock.time() * 1000 >= deadline:
+                break
+            if until is None and all(
+                market.last_candle_timestamp is not None
+                and market.last_candle_timestamp >= last_timestamps.get((market.symbol, market.timeframe), 0)
+                for market in bot.markets
+            ):
+                break
+            await asyncio.wait({task}, timeout=poll)
+    finally:
+        if not task.done():
+            await bot.stop()
+        await task
+    real_seconds = time.perf_counter() - started
+    virtual_seconds = clock.time() - virtual_start
+
+    paper = connector.exchange
+    quote = _currencies(bot.markets[0].symbol)[1]
+    schedulers = bot.schedulers.values()
+    report = {
+        'seconds': virtual_seconds,
+        'real_seconds': real_seconds,
+        'speedup': virtual_seconds / real_seconds if real_seconds else float('inf'),
+        'cycles': sum(scheduler.cycles for scheduler in schedulers),
+        'missed_cycles': sum(scheduler.missed_cycles for scheduler in schedulers),
+        'max_drift': max((scheduler.max_drift for scheduler in schedulers), default=0.0),
+        'orders': len(paper.orders),
+        'trades': paper.trades,
+        'balance': dict(paper.total),
+        'equity': paper.equity(quote),
+    }
+    logger.info("Replayed %.0fs in %.1fs (%.0fx): %d cycles, %d missed, %d orders, equity %.2f %s",
+                virtual_seconds, real_seconds, report['speedup'], report['cycles'],
+                report['missed_cycles'], report['orders'], report['equity'], quote)
+    return report
@@ -0,0 +1,139 @@
+"""
+Scheduling helpers for the live trading loop.
+Wakes the bot just after each candle of a timeframe closes and tracks
+scheduling drift and missed cycles.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Optional
+from src.data import timeframe_to_ms
+
+logger = logging.getLogger(__name__)
+
+
+class Clock:
+    """
+    Wall clock used for scheduling. Simulations can substitute their own.
+    """
+
+    def time(self) -> float:
+        """Current time in seconds since the epoch."""
+        return time.time()
+
+    async def sleep(self, seconds: float) -> None:
+        """Sleep for the given number of seconds."""
+        await asyncio.sleep(seconds)
+
+
+class VirtualClock(Clock):
+    """
+    Clock running speed times faster than the wall clock.
+
+    Starts at a chosen time and advances with real time scaled by speed,
+    so sleeps are shortened by the same factor and time spent computing
+    also counts, scaled, against the schedule.
+    """
+
+    def __init__(self, start: float, speed: float = 1000.0):
+        """
+        Initialize virtual clock.
+
+        Args:
+            start: Virtual time in seconds since the epoch at creation
+            speed: Virtual seconds per real second
+        """
+        if speed <= 0:
+            raise ValueError("speed must be positive")
+        self.start = start
+        self.speed = speed
+        self._origin = time.monotonic()
+
+    def time(self) -> float:
+        """Current virtual time in seconds since the epoch."""
+        return self.start + (time.monotonic() - self._origin) * self.speed
+
+    async def sleep(self, seconds: float) -> None:
+        """Sleep for the given number of virtual seconds."""
+        await asyncio.sleep(max(seconds, 0) / self.speed)
+
+
+class CandleScheduler:
+    """
+    Waits for candle closes of one timeframe.
+
+    Each wait() sleeps until grace seconds after the next close, reports
+    how late the wake-up was (drift) and counts closes that passed without
+    a cycle (missed cycles, e.g. when processing took longer than a candle).
+    """
+
+    def __init__(self, timeframe: str, grace: float = 1.0,
+                 drift_warning: float = 2.0, clock: Optional[Clock] = None):
+        """
+        Initialize scheduler.
+
+        Args:
+            timeframe: Candlestick timeframe (e.g., '1m', '1h')
+            grace: Seconds to wait after a close so the exchange has the final candle
+            drift_warning: Log a warning when a wake-up is this many seconds late
+            clock: Clock to use (defaults to the wall clock)
+        """
+        self.timeframe = timeframe
+        self.timeframe_ms = timeframe_to_ms(timeframe)
+        self.grace = grace
+        self.drift_warning = drift_warning
+        self.clock = clock or Clock()
+        self.cycles = 0
+        self.missed_cycles = 0
+        self.last_drift = 0.0
+        self.max_drift = 0.0
+        self._next_close: Optional[int] = None
+
+    def now_ms(self) -> int:
+        """Current clock time in milliseconds."""
+        return int(self.clock.time() * 1000)
+
+    def next_close(self, now_ms: Optional[int] = None) -> int:
+        """
+        Get the close time of the candle that is currently forming.
+
+        Args:
+            now_ms: Time in milliseconds (defaults to the clock)
+
+        Returns:
+            Close timestamp in milliseconds
+        """
+        if now_ms is None:
+            now_ms = self.now_ms()
+        return (now_ms // self.timeframe_ms + 1) * self.timeframe_ms
+
+    async def wait(self) -> int:
+        """
+        Sleep until just after the next candle close.
+
+        Returns:
+            Timestamp in milliseconds of the close that was waited for
+        """
+        now = self.now_ms()
+        target = self._next_close if self._next_close is not None else self.next_close(now)
+
+        # Closes that already passed while the previous cycle was running
+        if now >= target + self.timeframe_ms:
+            missed = (now - target) // self.timeframe_ms
+            self.missed_cycles += missed
+            logger.warning(f"Missed {missed} {self.timeframe} cycle(s), total missed: {self.missed_cycles}")
+            target += missed * self.timeframe_ms
+
+        wake_at = target + self.grace * 1000
+        if wake_at > now:
+            await self.clock.sleep((wake_at - now) / 1000)
+
+        self.last_drift = max(self.now_ms() - wake_at, 0) / 1000
+        self.max_drift = max(self.max_drift, self.last_drift)
+        if self.last_drift >= self.drift_warning:
+            logger.warning(f"{self.timeframe} cycle woke {self.last_drift:.3f}s late")
+
+        self.cycles += 1
+        self._next_close = target + self.timeframe_ms
+        return target
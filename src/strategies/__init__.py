@@ -4,9 +4,15 @@ All custom strategies should inherit from this class.
 """
 
 from abc import ABC, abstractmethod
-from typing import Dict, Any, List, Optional
-import pandas as pd
+from collections import deque
+from typing import TYPE_CHECKING, Dict, Any, List, Optional
+import numpy as np
 import logging
+from src.data import OHLCVBuffer, OHLCVData
+from src.indicators import Indicator, IndicatorRegistry, IndicatorSeries
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 logger = logging.getLogger(__name__)
 
@@ -16,6 +22,12 @@ class Strategy(ABC):
     Abstract base class for trading strategies.
     """
     
+    # Number of candles kept by the default on_candle implementation
+    history_size: int = 500
+    
+    # Part of backtest cache keys; bump when a change alters the signals
+    version: int = 1
+    
     def __init__(self, name: str):
         """
         Initialize strategy.
@@ -26,30 +38,114 @@ class Strategy(ABC):
         self.name = name
         self.position: Optional[str] = None  # None, 'long', or 'short'
         self.entry_price: float = 0.0
+        self._history: deque = deque(maxlen=self.history_size)
+        # Indicator series are private until bind() joins a shared registry
+        self.symbol: Optional[str] = None
+        self.timeframe: Optional[str] = None
+        self.indicators = IndicatorRegistry()
         
     @abstractmethod
-    async def analyze(self, ohlcv_data: List[List]) -> str:
+    async def analyze(self, ohlcv_data: OHLCVData) -> str:
         """
         Analyze market data and generate trading signal.
         
         Args:
-            ohlcv_data: OHLCV candlestick data
+            ohlcv_data: OHLCV candlestick data (raw rows or OHLCVBuffer)
             
         Returns:
             Trading signal: 'buy', 'sell', or 'hold'
         """
         pass
     
-    def convert_to_dataframe(self, ohlcv_data: List[List]) -> pd.DataFrame:
+    async def on_candle(self, candle: List) -> str:
+        """
+        Feed one closed candle and generate a trading signal.
+        
+        Strategies that keep running indicator state should override this so
+        each candle costs constant time. The default implementation keeps the
+        last history_size candles and delegates to analyze().
+        
+        Args:
+            candle: Closed OHLCV candle [timestamp, open, high, low, close, volume]
+            
+        Returns:
+            Trading signal: 'buy', 'sell', or 'hold'
+        """
+        self._history.append(candle)
+        return await self.analyze(list(self._history))
+    
+    def reset(self) -> None:
+        """Clear any state accumulated through on_candle."""
+        self._history.clear()
+    
+    def bind(self, symbol: str, timeframe: str, registry: IndicatorRegistry) -> None:
+        """
+        Share indicator series with other strategies fed the same candles.
+        
+        Strategies bound to the same registry, symbol and timeframe compute
+        each indicator once per candle. Also resets the strategy.
+        
+        Args:
+            symbol: Trading pair symbol of the candles fed to on_candle
+            timeframe: Candlestick timeframe of those candles
+            registry: Registry shared by the strategies
+        """
+        self.indicators.release(self)
+        self.symbol = symbol
+        self.timeframe = timeframe
+        self.indicators = registry
+        self.reset()
+    
+    def __getstate__(self) -> Dict[str, Any]:
+        """Pickle without the shared registry; bind() joins another one on the receiving side."""
+        state = self.__dict__.copy()
+        state['indicators'] = IndicatorRegistry(self.indicators.capacity)
+        return state
+    
+    def indicator(self, indicator: Indicator) -> IndicatorSeries:
+        """
+        Subscribe to an indicator series of this strategy's candles.
+        
+        Args:
+            indicator: Indicator with its parameters
+            
+        Returns:
+            Series to feed with push() and read from; shared when bound
+        """
+        return self.indicators.subscribe(self, self.symbol, self.timeframe, indicator)
+    
+    def generate_signals(self, ohlcv_data: OHLCVData) -> np.ndarray:
+        """
+        Generate trading signals for the whole history in one pass.
+        
+        Signals are raw strategy signals and do not depend on the current
+        position; position filtering is left to the caller (e.g. the
+        backtester).
+        
+        Args:
+            ohlcv_data: OHLCV candlestick data
+            
+        Returns:
+            int8 array with one entry per candle: 1 = buy, -1 = sell, 0 = hold
+        """
+        raise NotImplementedError(
+            f"{self.__class__.__name__} does not support batch signal generation"
+        )
+    
+    def convert_to_dataframe(self, ohlcv_data: OHLCVData) -> 'pd.DataFrame':
         """
         Convert OHLCV data to pandas DataFrame.
         
         Args:
-            ohlcv_data: Raw OHLCV data from exchange
+            ohlcv_data: Raw OHLCV data from exchange or an OHLCVBuffer
             
         Returns:
             DataFrame with columns: timestamp, open, high, low, close, volume
         """
+        if isinstance(ohlcv_data, OHLCVBuffer):
+            return ohlcv_data.to_dataframe()
+        
+        import pandas as pd
         df = pd.DataFrame(
             ohlcv_data,
             columns=['timestamp', 'open', 'high', 'low', 'close', 'volume']
@@ -67,7 +163,7 @@ class Strategy(ABC):
         """
         self.position = position
         self.entry_price = entry_price
-        logger.info(f"Position set to {position} at {entry_price}")
+        logger.info("Position set to %s at %s", position, entry_price)
     
     def get_position(self) -> Dict[str, Any]:
         """
@@ -6,7 +6,10 @@ and sell signals when short-term MA crosses below long-term MA.
 
 from typing import List
 from . import Strategy
-import pandas as pd
+from src.data import OHLCVBuffer, OHLCVData, as_ohlcv_buffer
+from src.indicators import SMA
+import math
+import numpy as np
 import logging
 
 logger = logging.getLogger(__name__)
@@ -29,55 +32,130 @@ class SimpleMovingAverage(Strategy):
         self.short_window = short_window
         self.long_window = long_window
         self.last_signal = 'hold'
+        self.reset()
         
-    async def analyze(self, ohlcv_data: List[List]) -> str:
+    async def analyze(self, ohlcv_data: OHLCVData) -> str:
         """
         Analyze price data using SMA crossover strategy.
         
         Args:
-            ohlcv_data: OHLCV candlestick data
+            ohlcv_data: OHLCV candlestick data (raw rows or OHLCVBuffer)
             
         Returns:
             Trading signal: 'buy', 'sell', or 'hold'
         """
         if len(ohlcv_data) < self.long_window:
-            logger.warning(f"Not enough data for analysis. Need {self.long_window}, got {len(ohlcv_data)}")
+            logger.warning("Not enough data for analysis. Need %d, got %d", self.long_window, len(ohlcv_data))
             return 'hold'
         
-        # Convert to DataFrame
-        df = self.convert_to_dataframe(ohlcv_data)
+        # Only the closes needed for the last two readings of each average
+        tail = max(self.short_window, self.long_window) + 1
+        if isinstance(ohlcv_data, OHLCVBuffer):
+            closes = ohlcv_data.close[-tail:]
+        else:
+            closes = np.array([candle[4] for candle in ohlcv_data[-tail:]], dtype=np.float64)
         
-        # Calculate moving averages
-        df['sma_short'] = df['close'].rolling(window=self.short_window).mean()
-        df['sma_long'] = df['close'].rolling(window=self.long_window).mean()
+        # The previous reading needs one candle more than the window
+        if len(closes) < tail:
+            self.last_signal = 'hold'
+            return 'hold'
+        
+        # Calculate the current and previous moving averages
+        sma_short = closes[-self.short_window:].mean()
+        sma_long = closes[-self.long_window:].mean()
+        previous_short = closes[-self.short_window - 1:-1].mean()
+        previous_long = closes[-self.long_window - 1:-1].mean()
         
-        # Get the last two rows to detect crossover
-        if len(df) < 2:
+        signal = self._crossover_signal(previous_short, previous_long, sma_short, sma_long)
+        self.last_signal = signal
+        return signal
+    
+    async def on_candle(self, candle: List) -> str:
+        """
+        Update the moving averages with one closed candle in constant time.
+        
+        Both averages are indicator series, so strategies bound to the same
+        symbol and timeframe share them and compute each only once.
+        
+        Args:
+            candle: Closed OHLCV candle [timestamp, open, high, low, close, volume]
+            
+        Returns:
+            Trading signal: 'buy', 'sell', or 'hold'
+        """
+        timestamp, close = candle[0], float(candle[4])
+        sma_short = self._short_sma.push(timestamp, close)
+        sma_long = self._long_sma.push(timestamp, close)
+        if math.isnan(sma_short) or math.isnan(sma_long):
             return 'hold'
         
-        current = df.iloc[-1]
-        previous = df.iloc[-2]
+        previous_short, previous_long = self._previous_sma
+        self._previous_sma = (sma_short, sma_long)
         
-        # Check for valid MA values
-        if pd.isna(current['sma_short']) or pd.isna(current['sma_long']):
+        if previous_short is None:
             return 'hold'
         
-        # Detect crossover
+        signal = self._crossover_signal(previous_short, previous_long, sma_short, sma_long)
+        self.last_signal = signal
+        return signal
+    
+    def reset(self) -> None:
+        """Clear the state used by on_candle and subscribe to fresh moving averages."""
+        super().reset()
+        # Private series are evicted on release; shared ones keep their state
+        self.indicators.release(self)
+        self._short_sma = self.indicator(SMA(self.short_window))
+        self._long_sma = self.indicator(SMA(self.long_window))
+        self._previous_sma = (None, None)
+    
+    def _crossover_signal(self, previous_short: float, previous_long: float,
+                          current_short: float, current_long: float) -> str:
+        """
+        Turn two consecutive moving average readings into a trading signal.
+        
+        Returns:
+            Trading signal: 'buy', 'sell', or 'hold'
+        """
         signal = 'hold'
         
         # Bullish crossover: short MA crosses above long MA
-        if (previous['sma_short'] <= previous['sma_long'] and 
-            current['sma_short'] > current['sma_long']):
+        if previous_short <= previous_long and current_short > current_long:
             if self.position != 'long':
                 signal = 'buy'
-                logger.info(f"Bullish crossover detected: SMA_short={current['sma_short']:.2f}, SMA_long={current['sma_long']:.2f}")
+                logger.info("Bullish crossover detected: SMA_short=%.2f, SMA_long=%.2f", current_short, current_long)
         
         # Bearish crossover: short MA crosses below long MA
-        elif (previous['sma_short'] >= previous['sma_long'] and 
-              current['sma_short'] < current['sma_long']):
+        elif previous_short >= previous_long and current_short < current_long:
             if self.position == 'long':
                 signal = 'sell'
-                logger.info(f"Bearish crossover detected: SMA_short={current['sma_short']:.2f}, SMA_long={current['sma_long']:.2f}")
+                logger.info("Bearish crossover detected: SMA_short=%.2f, SMA_long=%.2f", current_short, current_long)
         
-        self.last_signal = signal
         return signal
+    
+    def generate_signals(self, ohlcv_data: OHLCVData) -> np.ndarray:
+        """
+        Generate crossover signals for the whole history in one pass.
+        
+        Args:
+            ohlcv_data: OHLCV candlestick data (raw rows or OHLCVBuffer)
+            
+        Returns:
+            int8 array: 1 on bullish crossover, -1 on bearish crossover, 0 otherwise
+        """
+        signals = np.zeros(len(ohlcv_data), dtype=np.int8)
+        if len(ohlcv_data) < 2:
+            return signals
+        
+        closes = as_ohlcv_buffer(ohlcv_data).close
+        sma_short = SMA(self.short_window).compute(closes)
+        sma_long = SMA(self.long_window).compute(closes)
+        
+        # Comparisons against NaN are False, so the warm-up period stays 'hold'
+        current_short, current_long = sma_short[1:], sma_long[1:]
+        previous_short, previous_long = sma_short[:-1], sma_long[:-1]
+        bullish = (previous_short <= previous_long) & (current_short > current_long)
+        bearish = (previous_short >= previous_long) & (current_short < current_long)
+        
+        signals[1:][bullish] = 1
+        signals[1:][bearish] = -1
+        return signals
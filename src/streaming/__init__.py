@@ -0,0 +1,237 @@
+"""
+Push-based market data streaming.
+Delivers closed candles and ticker updates over a WebSocket as an async
+iterator, reconnecting automatically and falling back to REST polling
+while the stream is unavailable.
+"""
+
+import asyncio
+import json
+import logging
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple
+from src.data import timeframe_to_ms
+from src.scheduler import Clock
+
+logger = logging.getLogger(__name__)
+
+
+class StreamUnavailable(Exception):
+    """Raised when the WebSocket stream cannot be reached."""
+
+
+class MarketDataStream:
+    """
+    Async iterator of market data updates for a set of subscriptions.
+
+    Updates are dictionaries, either
+    {'type': 'candle', 'symbol', 'timeframe', 'candle': [timestamp, open, high, low, close, volume]}
+    for a closed candle or {'type': 'ticker', 'symbol', 'ticker': {...}}.
+
+    Candles of each (symbol, timeframe) are delivered once, in order. When
+    a candle arrives after a gap (e.g. after a reconnect), the missing
+    candles are downloaded over REST and delivered first. After
+    max_failures failed connection attempts in a row the stream polls the
+    exchange after every candle close instead, and tries the WebSocket
+    again every retry_interval seconds.
+
+    WebSocket protocol (JSON text messages): the client sends
+    {"op": "subscribe", "candles": [[symbol, timeframe], ...], "tickers": [symbol, ...]}
+    and receives {"type": "candle", "symbol", "timeframe", "candle", "closed"} and
+    {"type": "ticker", "symbol", "ticker"} messages. Messages that are not
+    valid JSON or lack these fields are logged and skipped.
+    """
+
+    def __init__(self, connector, candles: Sequence[Tuple[str, str]],
+                 tickers: Sequence[str] = (), url: Optional[str] = None,
+                 last_timestamps: Optional[Dict[Tuple[str, str], int]] = None,
+                 reconnect_delay: float = 1.0, max_reconnect_delay: float = 30.0,
+                 max_failures: int = 3, retry_interval: float = 60.0,
+                 poll_grace: float = 1.0, clock: Optional[Clock] = None):
+        """
+        Initialize market data stream.
+
+        Args:
+            connector: Connected ExchangeConnector used for polling and gap backfills
+            candles: (symbol, timeframe) pairs to receive closed candles for
+            tickers: Symbols to receive ticker updates for
+            url: WebSocket URL; without it the stream only polls
+            last_timestamps: Timestamp of the last candle already seen per
+                (symbol, timeframe); newer candles are backfilled on the first update
+            reconnect_delay: Initial delay in seconds between connection attempts
+            max_reconnect_delay: Upper bound of the exponential reconnect delay
+            max_failures: Failed connection attempts in a row before falling back to polling
+            retry_interval: Seconds between WebSocket retries while polling
+            poll_grace: Seconds after a candle close before polling for it
+            clock: Clock used for sleeps and candle close times (defaults to the wall clock)
+        """
+        self.connector = connector
+        self.candles = list(candles)
+        self.tickers = list(tickers)
+        self.url = url
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.max_failures = max_failures
+        self.retry_interval = retry_interval
+        self.poll_grace = poll_grace
+        self.clock = clock or Clock()
+        self.mode = 'stream' if url else 'poll'
+        self.reconnects = 0
+        self._last: Dict[Tuple[str, str], Optional[int]] = {
+            key: (last_timestamps or {}).get(key) for key in self.candles
+        }
+
+    def __aiter__(self) -> AsyncIterator[Dict[str, Any]]:
+        return self.updates()
+
+    async def updates(self) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Yield market data updates until the consumer stops iterating.
+
+        Yields:
+            Candle and ticker update dictionaries
+        """
+        retry_at = 0.0
+        while True:
+            if self.url and self.clock.time() >= retry_at:
+                try:
+                    async for update in self._stream_updates():
+                        yield update
+                except StreamUnavailable as e:
+                    retry_at = self.clock.time() + self.retry_interval
+                    if self.mode != 'poll':
+                        logger.warning(f"{e}, falling back to polling")
+                    self.mode = 'poll'
+                continue
+
+            async for update in self._poll_updates():
+                yield update
+            wake_at = self._next_poll_time()
+            if self.url:
+                wake_at = min(wake_at, retry_at)
+            await self.clock.sleep(max(wake_at - self.clock.time(), 0))
+
+    def _next_poll_time(self) -> float:
+        """Time in seconds of the next poll, just after the next candle close."""
+        now = self.clock.time()
+        if not self.candles:
+            return now + self.retry_interval
+        next_close = min(
+            (int(now * 1000) // timeframe_to_ms(tf) + 1) * timeframe_to_ms(tf)
+            for _, tf in self.candles
+        )
+        return next_close / 1000 + self.poll_grace
+
+    async def _stream_updates(self) -> AsyncIterator[Dict[str, Any]]:
+        """Yield updates from the WebSocket, reconnecting after disconnects."""
+        import aiohttp
+        failures = 0
+        async with aiohttp.ClientSession() as session:
+            while True:
+                try:
+                    async with session.ws_connect(self.url, heartbeat=30) as ws:
+                        await ws.send_json({'op': 'subscribe', 'candles': self.candles, 'tickers': self.tickers})
+                        if self.mode != 'stream':
+                            logger.info(f"Streaming market data from {self.url}")
+                        self.mode = 'stream'
+                        failures = 0
+                        async for message in ws:
+                            if message.type != aiohttp.WSMsgType.TEXT:
+                                break
+                            parsed = self._parse_message(message.data)
+                            if parsed is None:
+                                continue
+                            async for update in self._handle_message(parsed):
+                                yield update
+                except (aiohttp.ClientError, OSError, asyncio.TimeoutError) as e:
+                    failures += 1
+                    if failures >= self.max_failures:
+                        raise StreamUnavailable(f"Market data stream unavailable after {failures} attempts: {e}")
+                    logger.warning(f"Market data stream connection failed ({failures}/{self.max_failures}): {e}")
+
+                # Exponential backoff between attempts, a short pause after a disconnect
+                self.reconnects += 1
+                delay = min(self.reconnect_delay * 2 ** max(failures - 1, 0), self.max_reconnect_delay)
+                logger.info(f"Reconnecting to market data stream in {delay:.1f}s")
+                await self.clock.sleep(delay)
+
+    def _parse_message(self, data: str) -> Optional[Dict[str, Any]]:
+        """
+        Decode and check one WebSocket message.
+
+        Args:
+            data: Text of the message
+
+        Returns:
+            The message with a [timestamp, open, high, low, close, volume]
+            candle or a ticker dictionary, or None when it is malformed
+        """
+        try:
+            message = json.loads(data)
+            if not isinstance(message, dict):
+                raise TypeError(f"expected an object, got {type(message).__name__}")
+            if message.get('type') == 'ticker':
+                if not isinstance(message['symbol'], str) or not isinstance(message['ticker'], dict):
+                    raise TypeError("ticker messages need a symbol string and a ticker object")
+            elif message.get('type') == 'candle':
+                if not isinstance(message['symbol'], str) or not isinstance(message['timeframe'], str):
+                    raise TypeError("candle messages need symbol and timeframe strings")
+                candle = message['candle']
+                if not isinstance(candle, list) or len(candle) != 6:
+                    raise ValueError("candles need 6 fields")
+                message['candle'] = [int(candle[0])] + [float(value) for value in candle[1:]]
+            return message
+        except (ValueError, TypeError, KeyError) as e:
+            logger.warning("Skipping malformed market data message %.200r: %s", data, e)
+            return None
+
+    async def _handle_message(self, message: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+        """Turn one parsed WebSocket message into updates."""
+        if message.get('type') == 'ticker':
+            yield {'type': 'ticker', 'symbol': message['symbol'], 'ticker': message['ticker']}
+        elif message.get('type') == 'candle' and message.get('closed', True):
+            async for update in self._closed_candles(message['symbol'], message['timeframe'], [message['candle']]):
+                yield update
+
+    async def _closed_candles(self, symbol: str, timeframe: str,
+                              candles: List[List]) -> AsyncIterator[Dict[str, Any]]:
+        """Yield new closed candles of one subscription, backfilling gaps over REST."""
+        key = (symbol, timeframe)
+        if key not in self._last:
+            return
+        timeframe_ms = timeframe_to_ms(timeframe)
+        for candle in candles:
+            last = self._last[key]
+            if last is not None and candle[0] <= last:
+                continue
+            if last is not None and candle[0] > last + timeframe_ms:
+                logger.info(f"Backfilling {symbol} {timeframe} candles missed since {last}")
+                async for chunk in self.connector.fetch_ohlcv_range(symbol, timeframe, last + timeframe_ms, candle[0]):
+                    for missed in chunk:
+                        self._last[key] = missed[0]
+                        yield {'type': 'candle', 'symbol': symbol, 'timeframe': timeframe, 'candle': missed}
+            self._last[key] = candle[0]
+            yield {'type': 'candle', 'symbol': symbol, 'timeframe': timeframe, 'candle': list(candle)}
+
+    async def _poll_updates(self) -> AsyncIterator[Dict[str, Any]]:
+        """Poll every subscription once over REST."""
+        now = int(self.clock.time() * 1000)
+        requests = [
+            self.connector.fetch_ohlcv(symbol, timeframe, limit=100, since=self._last[(symbol, timeframe)])
+            for symbol, timeframe in self.candles
+        ] + [self.connector.fetch_ticker(symbol) for symbol in self.tickers]
+        results = await asyncio.gather(*requests, return_exceptions=True)
+
+        for (symbol, timeframe), ohlcv_data in zip(self.candles, results):
+            if isinstance(ohlcv_data, Exception):
+                logger.error(f"Error polling {symbol} {timeframe}: {ohlcv_data}")
+                continue
+            # Candles that are still forming are delivered once they close
+            closed = [c for c in ohlcv_data if c[0] + timeframe_to_ms(timeframe) <= now]
+            async for update in self._closed_candles(symbol, timeframe, closed):
+                yield update
+
+        for symbol, ticker in zip(self.tickers, results[len(self.candles):]):
+            if isinstance(ticker, Exception):
+                logger.error(f"Error polling {symbol} ticker: {ticker}")
+                continue
+            yield {'type': 'ticker', 'symbol': symbol, 'ticker': ticker}
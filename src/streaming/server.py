@@ -0,0 +1,162 @@
+"""
+Local WebSocket stand-in for an exchange market data stream.
+Speaks the MarketDataStream protocol so streaming mode can be run and
+tested offline.
+"""
+
+import asyncio
+import logging
+import socket
+from typing import Any, Dict, List, Optional, Set, Tuple
+from aiohttp import WSMsgType, web
+
+logger = logging.getLogger(__name__)
+
+
+class _Client:
+    """One connected WebSocket client and its subscriptions."""
+
+    def __init__(self, ws: web.WebSocketResponse):
+        self.ws = ws
+        self.candles: Set[Tuple[str, str]] = set()
+        self.tickers: Set[str] = set()
+
+
+class StreamServer:
+    """
+    WebSocket server publishing candles and tickers to subscribed clients.
+
+    Example:
+        server = StreamServer()
+        await server.start()
+        # connect a MarketDataStream to server.url, then
+        await server.publish_candle('BTC/USDT', '1m', candle)
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0):
+        """
+        Initialize stream server.
+
+        Args:
+            host: Interface to listen on
+            port: Port to listen on (0 picks a free port)
+        """
+        self.host = host
+        self.port = port
+        self._clients: List[_Client] = []
+        self._runner: Optional[web.AppRunner] = None
+        self._subscribed = asyncio.Condition()
+
+    @property
+    def url(self) -> str:
+        """WebSocket URL of the server."""
+        return f"ws://{self.host}:{self.port}/ws"
+
+    @property
+    def client_count(self) -> int:
+        """Number of subscribed clients."""
+        return len(self._clients)
+
+    async def start(self) -> None:
+        """Start listening for connections."""
+        app = web.Application()
+        app.router.add_get('/ws', self._handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.bind((self.host, self.port))
+        self.port = sock.getsockname()[1]
+        await web.SockSite(self._runner, sock).start()
+        logger.info(f"Stream server listening on {self.url}")
+
+    async def stop(self) -> None:
+        """Disconnect all clients and stop the server."""
+        await self.disconnect_all()
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def wait_for_clients(self, count: int = 1, timeout: float = 5.0) -> None:
+        """
+        Wait until at least count clients have subscribed.
+
+        Args:
+            count: Number of subscribed clients to wait for
+            timeout: Seconds to wait before raising asyncio.TimeoutError
+        """
+        async with self._subscribed:
+            await asyncio.wait_for(
+                self._subscribed.wait_for(lambda: len(self._clients) >= count), timeout
+            )
+
+    async def disconnect_all(self) -> None:
+        """Close every client connection, e.g. to exercise reconnects."""
+        clients, self._clients = self._clients, []
+        for client in clients:
+            await client.ws.close()
+
+    async def publish_candle(self, symbol: str, timeframe: str, candle: List,
+                             closed: bool = True) -> None:
+        """
+        Send a candle to clients subscribed to its symbol and timeframe.
+
+        Args:
+            symbol: Trading pair symbol
+            timeframe: Candlestick timeframe
+            candle: [timestamp, open, high, low, close, volume]
+            closed: Whether the candle has closed or is still forming
+        """
+        message = {'type': 'candle', 'symbol': symbol, 'timeframe': timeframe,
+                   'candle': list(candle), 'closed': closed}
+        await self._publish(message, lambda client: (symbol, timeframe) in client.candles)
+
+    async def publish_ticker(self, symbol: str, ticker: Dict[str, Any]) -> None:
+        """
+        Send a ticker to clients subscribed to its symbol.
+
+        Args:
+            symbol: Trading pair symbol
+            ticker: Ticker data dictionary
+        """
+        message = {'type': 'ticker', 'symbol': symbol, 'ticker': ticker}
+        await self._publish(message, lambda client: symbol in client.tickers)
+
+    async def publish_raw(self, data: str) -> None:
+        """
+        Send a text frame as is to every client, e.g. to exercise malformed messages.
+
+        Args:
+            data: Frame text
+        """
+        for client in list(self._clients):
+            if not client.ws.closed:
+                await client.ws.send_str(data)
+
+    async def _publish(self, message: Dict[str, Any], wants) -> None:
+        """Send a message to every matching client."""
+        for client in list(self._clients):
+            if wants(client) and not client.ws.closed:
+                await client.ws.send_json(message)
+
+    async def _handle(self, request: web.Request) -> web.WebSocketResponse:
+        """Serve one client connection."""
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        client = _Client(ws)
+        try:
+            async for message in ws:
+                if message.type != WSMsgType.TEXT:
+                    break
+                data = message.json()
+                if data.get('op') == 'subscribe':
+                    client.candles.update((symbol, timeframe) for symbol, timeframe in data.get('candles', []))
+                    client.tickers.update(data.get('tickers', []))
+                    if client not in self._clients:
+                        async with self._subscribed:
+                            self._clients.append(client)
+                            self._subscribed.notify_all()
+        finally:
+            if client in self._clients:
+                self._clients.remove(client)
+        return ws
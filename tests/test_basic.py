@@ -3,7 +3,19 @@ Basic tests for MESA trading bot components.
 """
 
 import asyncio
+import gc
+import logging
+import os
+import random
+import signal as signal_module
+import socket
+import tempfile
+import threading
+import time
 import unittest
+import aiohttp
+import ccxt.async_support as ccxt
+import numpy as np
 from unittest.mock import MagicMock, AsyncMock, patch
 import sys
 from pathlib import Path
@@ -13,6 +25,112 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from src.strategies.sma_strategy import SimpleMovingAverage
 from src.backtesting import Backtester
+from src.backtesting.fills import FillModel
+from src.backtesting.analytics import max_drawdown, performance_metrics, sharpe_ratio, sortino_ratio
+from src.backtesting.cache import ResultCache, candles_digest, result_key
+from src.backtesting.ledger import BUY, SELL, TradeLedger
+from src.backtesting.portfolio import PortfolioBacktester, align_closes
+from src import backtesting as backtesting_module
+from src import bot as bot_module
+from src.bot import TradingBot
+from src.exchange import ExchangeConnector
+from src.executor import StrategyExecutor
+from src.metrics import LoopLagMonitor, MetricsRegistry, MetricsServer
+from src.ratelimit import RateLimiter
+from src.replay import PaperExchange, ReplayConnector, run_replay
+from src.scheduler import CandleScheduler, VirtualClock
+from src.streaming.server import StreamServer
+from src.data import OHLCVBuffer
+from src.data.store import CandleStore
+from src.data.synthetic import synthetic_ohlcv
+from src.indicators import SMA, IndicatorRegistry, IndicatorSeries
+from src.log import RateLimitFilter, configure_logging, set_quiet, stop_logging
+from src.optimization import ParameterSweep, parameter_grid, run_backtest
+from src.optimization.sma_grid import evaluate_sma_grid, moving_averages
+from src.optimization.walk_forward import WalkForward, best_combination, evaluate_fold, walk_forward_folds
+from benchmarks.run import BENCHMARKS, IMPORT_BUDGETS, check_imports, compare, measure, measure_import
+
+
+def make_ohlcv(n, seed=42, start=1640000000000, step=60000):
+    """Build a deterministic random-walk OHLCV series."""
+    rng = random.Random(seed)
+    price = 100.0
+    candles = []
+    for i in range(n):
+        open_price = price
+        price = max(1.0, price + rng.gauss(0, 1))
+        high = max(open_price, price) + rng.random()
+        low = min(open_price, price) - rng.random()
+        candles.append([start + i * step, open_price, high, low, price, rng.uniform(1, 10)])
+    return candles
+
+
+class FakeExchange:
+    """Minimal stand-in for a ccxt async exchange serving fixed candles."""
+    
+    def __init__(self, candles, max_limit=None, rate_limit=0, delays=None):
+        self.candles = candles
+        self.max_limit = max_limit
+        self.delays = delays or {}
+        self.rateLimit = rate_limit
+        self.enableRateLimit = False
+        self.calls = []
+        self.ticker_calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        
+    async def fetch_ohlcv(self, symbol, timeframe='1m', since=None, limit=None):
+        self.calls.append({'symbol': symbol, 'since': since, 'limit': limit})
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        # Later pages answer first to exercise in-order streaming
+        await asyncio.sleep(self.delays.get(symbol, 0.001 * (len(self.calls) % 3)))
+        self.in_flight -= 1
+        limit = min(limit or 500, self.max_limit or 500)
+        if since is None:
+            return [list(c) for c in self.candles[-limit:]]
+        return [list(c) for c in self.candles if c[0] >= since][:limit]
+    
+    async def fetch_ticker(self, symbol):
+        self.ticker_calls += 1
+        await asyncio.sleep(0.01)
+        return {'symbol': symbol, 'last': self.candles[-1][4]}
+    
+    async def create_market_order(self, symbol, side, amount):
+        return {'id': str(len(self.calls)), 'symbol': symbol, 'side': side,
+                'filled': amount, 'status': 'closed'}
+    
+    async def close(self):
+        pass
+
+
+class FakeClock:
+    """Clock whose sleeps advance time instantly."""
+    
+    def __init__(self, now):
+        self.now = now
+        
+    def time(self):
+        return self.now
+    
+    async def sleep(self, seconds):
+        self.now += seconds
+
+
+async def wait_until(condition, timeout=5.0):
+    """Wait until a condition holds, failing the test after a timeout."""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("Timed out waiting for condition")
+        await asyncio.sleep(0.01)
+
+
+def make_connector(exchange, config=None):
+    """Build an ExchangeConnector wired to a fake exchange."""
+    connector = ExchangeConnector(config or {'name': 'binance'})
+    connector.exchange = exchange
+    return connector
 
 
 class TestSMAStrategy(unittest.TestCase):
@@ -46,6 +164,602 @@ class TestSMAStrategy(unittest.TestCase):
         self.assertEqual(len(df), 2)
         self.assertIn('close', df.columns)
         self.assertEqual(df.iloc[0]['close'], 105)
+        
+    def test_on_candle_matches_analyze(self):
+        """Test incremental signals match full-history analysis."""
+        ohlcv_data = make_ohlcv(300)
+        incremental = SimpleMovingAverage(short_window=5, long_window=10)
+        for i, candle in enumerate(ohlcv_data):
+            expected = run_async_test(self.strategy.analyze(ohlcv_data[:i + 1]))
+            signal = run_async_test(incremental.on_candle(candle))
+            self.assertEqual(signal, expected)
+            if signal == 'buy':
+                self.strategy.set_position('long', candle[4])
+                incremental.set_position('long', candle[4])
+            elif signal == 'sell':
+                self.strategy.set_position(None)
+                incremental.set_position(None)
+
+    def test_analyze_accepts_buffer(self):
+        """Test analysis gives the same signal for raw rows and a buffer."""
+        ohlcv_data = make_ohlcv(200)
+        buffer = OHLCVBuffer.from_ohlcv(ohlcv_data)
+        for end in range(10, 200, 7):
+            expected = run_async_test(self.strategy.analyze(ohlcv_data[:end]))
+            self.assertEqual(run_async_test(self.strategy.analyze(buffer[:end])), expected)
+
+
+class TestOHLCVBuffer(unittest.TestCase):
+    """Test columnar candle buffer."""
+    
+    def test_ring_keeps_latest_candles(self):
+        """Test appends past capacity drop the oldest candles."""
+        ohlcv_data = make_ohlcv(25)
+        buffer = OHLCVBuffer(capacity=10)
+        buffer.extend(ohlcv_data)
+        self.assertEqual(len(buffer), 10)
+        self.assertEqual(buffer.to_list(), ohlcv_data[-10:])
+        self.assertEqual(buffer.last_timestamp, ohlcv_data[-1][0])
+        self.assertEqual(buffer.close.tolist(), [c[4] for c in ohlcv_data[-10:]])
+        
+    def test_same_timestamp_replaces_last_candle(self):
+        """Test a re-fetched forming candle replaces the stored one."""
+        buffer = OHLCVBuffer.from_ohlcv([[1000, 1, 2, 0.5, 1.5, 10]], capacity=5)
+        buffer.append([1000, 1, 3, 0.5, 2.5, 20])
+        buffer.append([500, 9, 9, 9, 9, 9])
+        self.assertEqual(buffer.to_list(), [[1000, 1.0, 3.0, 0.5, 2.5, 20.0]])
+        
+    def test_window_is_zero_copy_view(self):
+        """Test windows share memory with the buffer."""
+        buffer = OHLCVBuffer.from_ohlcv(make_ohlcv(30), capacity=20)
+        window = buffer.window(5)
+        self.assertEqual(len(window), 5)
+        self.assertTrue(np.shares_memory(window.close, buffer.close))
+        self.assertEqual(window[-1], buffer[-1])
+        with self.assertRaises(ValueError):
+            window.append(make_ohlcv(1)[0])
+        
+    def test_iteration_crosses_chunks(self):
+        """Test rows are yielded in order across conversion chunks."""
+        ohlcv_data = make_ohlcv(25)
+        buffer = OHLCVBuffer.from_ohlcv(ohlcv_data)
+        with patch('src.data._ITER_CHUNK', 4):
+            self.assertEqual(list(buffer), ohlcv_data)
+            self.assertEqual(list(buffer[3:14]), ohlcv_data[3:14])
+        
+    def test_to_dataframe(self):
+        """Test conversion to DataFrame."""
+        df = OHLCVBuffer.from_ohlcv(make_ohlcv(3)).to_dataframe()
+        self.assertEqual(list(df.columns), ['timestamp', 'open', 'high', 'low', 'close', 'volume'])
+        self.assertEqual(len(df), 3)
+
+
+class TestIndicators(unittest.TestCase):
+    """Test the shared indicator registry."""
+
+    def test_sma_compute_matches_step(self):
+        """Test batch moving averages match stepping through the closes."""
+        closes = np.array([candle[4] for candle in make_ohlcv(200)], dtype=np.float64)
+        stepped = SMA(7)
+        expected = np.array([stepped.step(value) for value in closes])
+        batch = SMA(7)
+        # Split the batch so compute() also resumes from its running state
+        result = np.concatenate((batch.compute(closes[:3]), batch.compute(closes[3:120]), batch.compute(closes[120:])))
+        np.testing.assert_allclose(result, expected, equal_nan=True)
+        self.assertAlmostEqual(batch.step(101.0), stepped.step(101.0))
+
+    def test_series_memoizes_candles(self):
+        """Test a candle fed twice is computed once and extend only computes new candles."""
+        series = IndicatorSeries(SMA(2), capacity=3)
+        self.assertTrue(np.isnan(series.push(1, 10.0)))
+        self.assertEqual(series.push(2, 20.0), 15.0)
+        self.assertEqual(series.push(2, 20.0), 15.0)
+        self.assertEqual(series.updates, 2)
+
+        results = series.extend(np.array([1, 2, 3, 4]), np.array([10.0, 20.0, 30.0, 40.0]))
+        np.testing.assert_allclose(results, [25.0, 35.0])
+        self.assertEqual(series.updates, 4)
+        np.testing.assert_array_equal(series.timestamps, [2, 3, 4])
+        self.assertEqual(series.value_at(3), 25.0)
+        self.assertTrue(np.isnan(series.value_at(1)))
+
+    def test_strategies_share_series(self):
+        """Test strategies on one market share equal indicators and release them when gone."""
+        registry = IndicatorRegistry()
+        first = SimpleMovingAverage(short_window=5, long_window=10)
+        second = SimpleMovingAverage(short_window=5, long_window=20)
+        first.bind('BTC/USDT', '1h', registry)
+        second.bind('BTC/USDT', '1h', registry)
+        self.assertEqual(len(registry), 3)
+        self.assertIs(first._short_sma, second._short_sma)
+
+        ohlcv_data = make_ohlcv(50)
+        for candle in ohlcv_data:
+            run_async_test(first.on_candle(candle))
+            run_async_test(second.on_candle(candle))
+        self.assertEqual(first._short_sma.updates, len(ohlcv_data))
+
+        del second
+        gc.collect()
+        registry.evict_unused()
+        self.assertEqual(len(registry), 2)
+        registry.release(first)
+        self.assertEqual(len(registry), 0)
+
+
+class TestLogging(unittest.TestCase):
+    """Test queued logging, rate limits and quiet mode."""
+    
+    def setUp(self):
+        root = logging.getLogger()
+        self.saved = root.handlers[:], root.level
+        
+    def tearDown(self):
+        stop_logging()
+        set_quiet(False)
+        root = logging.getLogger()
+        root.handlers[:], level = self.saved
+        root.setLevel(level)
+        logging.getLogger('tests.noisy').setLevel(logging.NOTSET)
+        
+    def test_records_are_written_by_background_thread(self):
+        """Test records reach the file with per-module levels and rate limits applied."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'bot.log')
+            configure_logging(file=path, console=False, levels={'tests.noisy': 'WARNING'},
+                              rate_limits={'tests.limited': 0.001}, burst=2, format='%(name)s %(message)s')
+            logging.getLogger('tests.app').info("price %.2f", 1.5)
+            logging.getLogger('tests.noisy').info("hidden")
+            for i in range(5):
+                logging.getLogger('tests.limited.child').warning("burst %d", i)
+            stop_logging()
+            with open(path) as f:
+                lines = f.read().splitlines()
+        self.assertEqual(lines, ['tests.app price 1.50', 'tests.limited.child burst 0', 'tests.limited.child burst 1'])
+        
+    def test_rate_limit_reports_suppressed_records(self):
+        """Test the first record after a suppressed burst mentions the dropped ones."""
+        limiter = RateLimitFilter({'tests': 1000.0}, burst=1)
+        
+        def record(message):
+            return logging.LogRecord('tests.a', logging.INFO, __file__, 0, message, None, None)
+        
+        self.assertTrue(limiter.filter(record("first")))
+        self.assertFalse(limiter.filter(record("second")))
+        self.assertTrue(limiter.filter(logging.LogRecord('other', logging.INFO, __file__, 0, "free", None, None)))
+        time.sleep(0.01)
+        passed = record("third")
+        self.assertTrue(limiter.filter(passed))
+        self.assertIn("1 earlier messages suppressed", passed.getMessage())
+        
+    def test_quiet_mode_skips_trade_logging(self):
+        """Test quiet backtests log no trades."""
+        def trade_messages():
+            with patch.object(backtesting_module.logger, 'info') as info:
+                run_async_test(Backtester().run(SimpleMovingAverage(short_window=5, long_window=10), make_ohlcv(500)))
+            return [call.args[0] for call in info.call_args_list if call.args[0].startswith(('BUY', 'SELL'))]
+        
+        logging.getLogger('src').setLevel(logging.INFO)
+        self.assertTrue(trade_messages())
+        set_quiet()
+        self.assertEqual(trade_messages(), [])
+
+
+class TestCandleStore(unittest.TestCase):
+    """Test persistent candle store."""
+    
+    def setUp(self):
+        """Set up test fixtures."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.store = CandleStore(self.tmpdir.name)
+        
+    def tearDown(self):
+        """Remove stored files."""
+        self.tmpdir.cleanup()
+        
+    def test_append_and_load(self):
+        """Test only new candles are appended and loads are memory-mapped."""
+        ohlcv_data = make_ohlcv(100)
+        self.assertEqual(self.store.append('binance', 'BTC/USDT', '1m', ohlcv_data[:60]), 60)
+        self.assertEqual(self.store.append('binance', 'BTC/USDT', '1m', ohlcv_data[50:]), 40)
+        
+        candles = self.store.load('binance', 'BTC/USDT', '1m')
+        self.assertIsInstance(candles.close.base, np.memmap)
+        self.assertEqual(candles.to_list(), ohlcv_data)
+        self.assertEqual(self.store.last_timestamp('binance', 'BTC/USDT', '1m'), ohlcv_data[-1][0])
+        
+        window = self.store.load('binance', 'BTC/USDT', '1m', start=ohlcv_data[10][0], end=ohlcv_data[20][0])
+        self.assertEqual(window.to_list(), ohlcv_data[10:20])
+        
+    def test_sync_fetches_since_last_candle(self):
+        """Test sync requests only candles after the stored history."""
+        current_open = int(time.time() * 1000) // 60000 * 60000
+        ohlcv_data = make_ohlcv(31, start=current_open - 30 * 60000)
+        self.store.append('binance', 'BTC/USDT', '1m', ohlcv_data[:20])
+        exchange = FakeExchange(ohlcv_data)
+        
+        written = run_async_test(self.store.sync(make_connector(exchange), 'BTC/USDT', '1m', limit=100))
+        
+        self.assertEqual(written, 10)
+        self.assertEqual(exchange.calls[0]['since'], ohlcv_data[20][0])
+        # The last candle is still forming and is not stored
+        self.assertEqual(self.store.load('binance', 'BTC/USDT', '1m').to_list(), ohlcv_data[:-1])
+        
+    def test_sync_backfills_before_stored_history(self):
+        """Test a since older than the stored history downloads the missing older candles."""
+        current_open = int(time.time() * 1000) // 60000 * 60000
+        ohlcv_data = make_ohlcv(41, start=current_open - 40 * 60000)
+        self.store.append('binance', 'BTC/USDT', '1m', ohlcv_data[20:30])
+        exchange = FakeExchange(ohlcv_data)
+        
+        written = run_async_test(self.store.sync(make_connector(exchange), 'BTC/USDT', '1m',
+                                                 since=ohlcv_data[5][0], limit=100))
+        
+        self.assertEqual(written, 15 + 10)
+        self.assertEqual(self.store.load('binance', 'BTC/USDT', '1m').to_list(), ohlcv_data[5:-1])
+        self.assertEqual(self.store.first_timestamp('binance', 'BTC/USDT', '1m'), ohlcv_data[5][0])
+        self.assertEqual(sorted(p.name for p in self.store.path('binance', 'BTC/USDT', '1m').parent.iterdir()), ['1m'])
+
+    def test_failed_backfill_keeps_stored_history(self):
+        """Test a backfill interrupted by a download error leaves the series and no temporary files."""
+        ohlcv_data = make_ohlcv(40)
+        self.store.append('binance', 'BTC/USDT', '1m', ohlcv_data[20:30])
+        connector = make_connector(FakeExchange(ohlcv_data))
+        
+        directory = self.store.path('binance', 'BTC/USDT', '1m')
+        
+        async def failing_range(symbol, timeframe, since, end, limit=1000):
+            yield ohlcv_data[5:10]
+            # The first page is on disk before the next one is downloaded
+            rewritten = directory.with_name(f'1m.{os.getpid()}.tmp')
+            self.assertEqual(len(np.fromfile(rewritten / 'timestamp.bin', dtype=np.int64)), 5)
+            raise ccxt.NetworkError("connection reset")
+        
+        connector.fetch_ohlcv_range = failing_range
+        with self.assertRaises(ccxt.NetworkError):
+            run_async_test(self.store.sync(connector, 'BTC/USDT', '1m', since=ohlcv_data[5][0]))
+        
+        self.assertEqual(self.store.load('binance', 'BTC/USDT', '1m').to_list(), ohlcv_data[20:30])
+        self.assertEqual(sorted(p.name for p in directory.parent.iterdir()), ['1m'])
+
+
+class TestExchangeConnector(unittest.TestCase):
+    """Test exchange connector helpers against a fake exchange."""
+    
+    def test_fetch_ohlcv_range_pages_concurrently(self):
+        """Test range download covers every candle once, in order."""
+        ohlcv_data = make_ohlcv(250)
+        del ohlcv_data[95:105]  # exchange outage in the middle of a page
+        exchange = FakeExchange(ohlcv_data, max_limit=7)
+        connector = make_connector(exchange)
+        
+        async def download():
+            return [chunk async for chunk in connector.fetch_ohlcv_range(
+                'BTC/USDT', '1m', ohlcv_data[0][0], ohlcv_data[-1][0] + 60000,
+                limit=20, max_concurrency=3
+            )]
+        
+        chunks = run_async_test(download())
+        received = [candle for chunk in chunks for candle in chunk]
+        self.assertEqual(received, ohlcv_data)
+        self.assertGreater(len(chunks), 1)
+        self.assertLessEqual(exchange.max_in_flight, 3)
+        self.assertGreater(exchange.max_in_flight, 1)
+        
+    def test_identical_calls_share_one_request(self):
+        """Test concurrent identical calls are merged into one request."""
+        exchange = FakeExchange(make_ohlcv(50))
+        connector = make_connector(exchange, {'name': 'binance', 'cache_ttl': {'ticker': 0}})
+        
+        async def fetch_concurrently():
+            return await asyncio.gather(*(connector.fetch_ticker('BTC/USDT') for _ in range(5)),
+                                        *(connector.fetch_ohlcv('BTC/USDT', '1m', limit=10) for _ in range(3)))
+        
+        results = run_async_test(fetch_concurrently())
+        self.assertEqual(exchange.ticker_calls, 1)
+        self.assertEqual(len(exchange.calls), 1)
+        self.assertEqual(results[0], results[4])
+        self.assertEqual(connector.cache_stats['coalesced'], 6)
+        
+        # With a TTL of 0 nothing is kept once the request has finished
+        run_async_test(connector.fetch_ticker('BTC/USDT'))
+        self.assertEqual(exchange.ticker_calls, 2)
+        
+    def test_cache_is_invalidated_by_own_fills(self):
+        """Test cached tickers are reused until one of our orders fills."""
+        exchange = FakeExchange(make_ohlcv(50))
+        connector = make_connector(exchange, {'name': 'binance', 'cache_ttl': {'ticker': 60}})
+        
+        async def trade():
+            await connector.fetch_ticker('BTC/USDT')
+            await connector.fetch_ticker('BTC/USDT')
+            await connector.fetch_ticker('ETH/USDT')
+            await connector.create_market_order('BTC/USDT', 'buy', 0.1)
+            await connector.fetch_ticker('BTC/USDT')
+            await connector.fetch_ticker('ETH/USDT')
+        
+        run_async_test(trade())
+        self.assertEqual(exchange.ticker_calls, 3)
+        self.assertEqual(connector.cache_stats['hits'], 2)
+
+
+class FlakyExchange(FakeExchange):
+    """Fake exchange rejecting the first calls with rate-limit errors."""
+    
+    def __init__(self, candles, rejections=2, headers=None):
+        super().__init__(candles)
+        self.rejections = rejections
+        self.last_response_headers = headers or {}
+        self.ticker_calls = 0
+        
+    async def fetch_ticker(self, symbol):
+        self.ticker_calls += 1
+        if self.ticker_calls <= self.rejections:
+            raise ccxt.RateLimitExceeded('429 Too Many Requests')
+        return {'symbol': symbol, 'last': self.candles[-1][4]}
+    
+    async def create_market_order(self, symbol, side, amount):
+        self.calls.append({'symbol': symbol, 'side': side})
+        raise ccxt.NetworkError('connection reset')
+
+
+class TestRateLimiter(unittest.TestCase):
+    """Test the shared priority rate limiter."""
+    
+    def test_orders_jump_the_queue(self):
+        """Test queued calls are served by priority, not arrival."""
+        limiter = RateLimiter(rate=50)
+        served = []
+        
+        async def call(priority):
+            await limiter.acquire(priority)
+            served.append(priority)
+        
+        async def flood():
+            await limiter.acquire('market_data')
+            await asyncio.gather(*(call('market_data') for _ in range(4)), call('account'), call('order'))
+        
+        run_async_test(flood())
+        self.assertEqual(served, ['order', 'account'] + ['market_data'] * 4)
+        self.assertEqual(limiter.stats['market_data']['calls'], 5)
+        self.assertGreater(limiter.stats['market_data']['wait_max'], limiter.stats['order']['wait_max'])
+        
+    def test_retry_after_header_pauses(self):
+        """Test Retry-After pauses every queued call."""
+        limiter = RateLimiter(rate=1000, burst=10)
+        limiter.update_from_headers({'Retry-After': '0.2'})
+        self.assertGreaterEqual(run_async_test(limiter.acquire('order')), 0.15)
+        
+    def test_follows_a_new_event_loop(self):
+        """Test a limiter left busy on one event loop still serves the next loop."""
+        limiter = RateLimiter(rate=2)
+        old_loop = asyncio.new_event_loop()
+        try:
+            async def queue_call():
+                await limiter.acquire('market_data')
+                asyncio.ensure_future(limiter.acquire('market_data'))
+                await asyncio.sleep(0)
+            
+            # Leaves a call queued and the dispatcher sleeping on the old loop
+            old_loop.run_until_complete(queue_call())
+            
+            async def acquire():
+                return await asyncio.wait_for(limiter.acquire('order'), 2.0)
+            
+            self.assertLess(run_async_test(acquire()), 1.0)
+            self.assertEqual(len(limiter._waiters), 0)
+        finally:
+            for task in asyncio.all_tasks(old_loop):
+                task.cancel()
+            old_loop.run_until_complete(asyncio.sleep(0))
+            old_loop.close()
+        
+    def test_connector_backs_off_and_retries_rejections(self):
+        """Test 429s slow the shared rate down and are retried."""
+        exchange = FlakyExchange(make_ohlcv(5))
+        config = {'name': 'binance', 'api_key': 'retry-test', 'rate_limit': 100}
+        connector = make_connector(exchange, config)
+        
+        with patch('src.exchange.backoff_delay', return_value=0):
+            ticker = run_async_test(connector.fetch_ticker('BTC/USDT'))
+            self.assertEqual(ticker['last'], exchange.candles[-1][4])
+            self.assertEqual(exchange.ticker_calls, 3)
+            self.assertAlmostEqual(connector.rate_limiter.rate, 100 / 4 + 100 / 20)
+            
+            # Orders are not repeated after errors that may have reached the exchange
+            with self.assertRaises(ccxt.NetworkError):
+                run_async_test(connector.create_market_order('BTC/USDT', 'buy', 0.1))
+            self.assertEqual(len(exchange.calls), 1)
+        
+        other = make_connector(FakeExchange(make_ohlcv(5)), config)
+        run_async_test(other.fetch_ticker('BTC/USDT'))
+        self.assertIs(other.rate_limiter, connector.rate_limiter)
+
+
+class FakeMarketsExchange:
+    """Stand-in ccxt exchange class recording market downloads."""
+    
+    downloads = 0
+    
+    def __init__(self, config):
+        self.markets = None
+        self.currencies = None
+        
+    def set_markets(self, markets, currencies=None):
+        self.markets = markets
+        self.currencies = currencies
+        return markets
+        
+    async def load_markets(self, reload=False):
+        FakeMarketsExchange.downloads += 1
+        return self.set_markets({'BTC/USDT': {'id': 'BTCUSDT', 'symbol': 'BTC/USDT'}}, {'BTC': {'id': 'BTC'}})
+    
+    async def close(self):
+        pass
+
+
+class TestMarketsSnapshot(unittest.TestCase):
+    """Test the local market metadata snapshot used on connect."""
+    
+    def setUp(self):
+        """Set up test fixtures."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.config = {'name': 'binance', 'markets_dir': self.tmpdir.name, 'markets_max_age': 3600}
+        FakeMarketsExchange.downloads = 0
+        patcher = patch('ccxt.async_support.binance', FakeMarketsExchange)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        
+    def tearDown(self):
+        """Remove stored files."""
+        self.tmpdir.cleanup()
+        
+    def connect(self, **kwargs):
+        connector = ExchangeConnector(self.config)
+        
+        async def connect():
+            await connector.connect(**kwargs)
+            if connector._markets_refresh is not None:
+                await connector._markets_refresh
+        
+        run_async_test(connect())
+        return connector
+        
+    def test_snapshot_skips_download(self):
+        """Test markets are downloaded once and then read from the snapshot."""
+        first = self.connect()
+        second = self.connect()
+        self.assertEqual(FakeMarketsExchange.downloads, 1)
+        self.assertEqual(second.exchange.markets, first.exchange.markets)
+        self.assertEqual(second.exchange.currencies, {'BTC': {'id': 'BTC'}})
+        
+        self.connect(reload_markets=True)
+        self.assertEqual(FakeMarketsExchange.downloads, 2)
+        
+    def test_stale_snapshot_refreshes_in_background(self):
+        """Test a stale snapshot is used at once and replaced in the background."""
+        connector = self.connect()
+        path = connector.markets_snapshot_path
+        old = time.time() - 7200
+        os.utime(path, (old, old))
+        
+        connector = ExchangeConnector(self.config)
+        
+        async def connect():
+            await connector.connect()
+            # Markets are usable before the refresh has run
+            self.assertIn('BTC/USDT', connector.exchange.markets)
+            self.assertEqual(FakeMarketsExchange.downloads, 1)
+            await connector._markets_refresh
+        
+        run_async_test(connect())
+        self.assertEqual(FakeMarketsExchange.downloads, 2)
+        self.assertGreater(path.stat().st_mtime, old)
+
+    def test_options_get_their_own_snapshot(self):
+        """Test a snapshot is only reused with the same ccxt options."""
+        paths = {self.connect().markets_snapshot_path}
+        self.config['options'] = {'defaultType': 'future'}
+        paths.add(self.connect().markets_snapshot_path)
+
+        self.assertEqual(len(paths), 2)
+        self.assertEqual(FakeMarketsExchange.downloads, 2)
+        self.connect()
+        self.assertEqual(FakeMarketsExchange.downloads, 2)
+
+
+class TestMetrics(unittest.TestCase):
+    """Test latency metrics and the Prometheus exporter."""
+    
+    def test_render_prometheus_text(self):
+        """Test counters and cumulative histogram buckets are rendered."""
+        registry = MetricsRegistry()
+        orders = registry.counter('orders_total', 'Orders placed', ['side'])
+        latency = registry.histogram('latency_seconds', 'Latency', ['stage'], buckets=(0.1, 1.0))
+        orders.inc(side='buy')
+        orders.inc(2, side='buy')
+        for value in (0.05, 0.5, 0.7, 3.0):
+            latency.observe(value, stage='fetch')
+        
+        text = registry.render()
+        self.assertIn('# TYPE orders_total counter\norders_total{side="buy"} 3\n', text)
+        self.assertIn('latency_seconds_bucket{stage="fetch",le="0.1"} 1\n', text)
+        self.assertIn('latency_seconds_bucket{stage="fetch",le="1.0"} 3\n', text)
+        self.assertIn('latency_seconds_bucket{stage="fetch",le="+Inf"} 4\n', text)
+        self.assertIn('latency_seconds_count{stage="fetch"} 4\n', text)
+        self.assertEqual(latency.quantile(0.5, stage='fetch'), 0.7)
+        
+    def test_bot_records_stage_latencies(self):
+        """Test a trading cycle records strategy, order and exchange metrics served over HTTP."""
+        ohlcv_data = make_ohlcv(40, start=0)
+        strategy = SimpleMovingAverage(short_window=5, long_window=10)
+        strategy.on_candle = AsyncMock(return_value='buy')
+        bot = TradingBot({}, {'symbol': 'BTC/USDT'}, strategy,
+                         exchange=make_connector(FakeExchange(ohlcv_data)), clock=FakeClock(40 * 60))
+        market = repr(bot.markets[0])
+        orders_before = bot_module.ORDERS.value(market=market, side='buy')
+        
+        async def scenario():
+            bot.metrics_server = MetricsServer(port=0)
+            await bot.metrics_server.start()
+            try:
+                await bot._trading_loop()
+                async with aiohttp.ClientSession() as session:
+                    url = f"http://127.0.0.1:{bot.metrics_server.port}/metrics"
+                    async with session.get(url) as response:
+                        return await response.text()
+            finally:
+                await bot.metrics_server.stop()
+        
+        text = run_async_test(scenario())
+        self.assertEqual(bot_module.ORDERS.value(market=market, side='buy'), orders_before + 1)
+        self.assertGreaterEqual(bot_module.SIGNAL_TO_ORDER.count(market=market, side='buy'), 1)
+        self.assertGreaterEqual(bot_module.STRATEGY_LATENCY.count(market=market), 40)
+        self.assertIn('mesa_exchange_request_seconds_count{endpoint="fetch_ohlcv"}', text)
+        self.assertIn(f'mesa_orders_total{{market="{market}",side="buy"}}', text)
+
+
+class TestBenchmarks(unittest.TestCase):
+    """Test the synthetic data generator and benchmark regression gates."""
+    
+    def test_synthetic_ohlcv_is_deterministic_and_valid(self):
+        """Test the same seed gives the same consistent candles."""
+        candles = synthetic_ohlcv(1000, seed=7)
+        self.assertEqual(candles.to_list(), synthetic_ohlcv(1000, seed=7).to_list())
+        self.assertNotEqual(candles.close.tolist(), synthetic_ohlcv(1000, seed=8).close.tolist())
+        self.assertTrue(np.all(np.diff(candles.timestamp) == 60000))
+        self.assertTrue(np.all(candles.high >= np.maximum(candles.open, candles.close)))
+        self.assertTrue(np.all(candles.low <= np.minimum(candles.open, candles.close)))
+        
+    def test_compare_flags_regressions(self):
+        """Test slowdowns and memory growth beyond the thresholds are reported."""
+        baseline = {'a@1k': {'seconds': 1.0, 'peak_mb': 10.0}, 'b@1k': {'seconds': 1.0, 'peak_mb': 10.0}}
+        results = {
+            'a@1k': {'seconds': 1.2, 'peak_mb': 12.0},
+            'b@1k': {'seconds': 1.5, 'peak_mb': 20.0},
+            'c@1k': {'seconds': 9.0, 'peak_mb': 90.0},
+        }
+        regressions = compare(results, baseline, time_threshold=0.25, memory_threshold=0.25)
+        self.assertEqual(len(regressions), 2)
+        self.assertTrue(all(message.startswith('b@1k') for message in regressions))
+        
+    def test_imports_stay_lazy(self):
+        """Test entry points import without ccxt, pandas or aiohttp and budgets are enforced."""
+        for module in IMPORT_BUDGETS:
+            self.assertEqual(measure_import(module, repeat=1)['loaded'], [], module)
+        results = {'src.bot': {'seconds': 0.9, 'loaded': []}, 'src.backtesting': {'seconds': 0.1, 'loaded': ['pandas']}}
+        violations = check_imports(results, {'src.bot': 0.5, 'src.backtesting': 0.3})
+        self.assertEqual(len(violations), 2)
+        self.assertIn('budget', violations[0])
+        self.assertIn('pandas', violations[1])
+        
+    def test_benchmarks_run(self):
+        """Test every benchmark runs on a small series."""
+        candles = synthetic_ohlcv(300)
+        with patch('benchmarks.run.ANALYZE_CALLS', 10):
+            for name, bench in BENCHMARKS.items():
+                result = measure(bench, candles, repeat=1)
+                self.assertGreater(result['throughput'], 0, name)
 
 
 class TestBacktester(unittest.TestCase):
@@ -61,6 +775,891 @@ class TestBacktester(unittest.TestCase):
         self.assertEqual(self.backtester.balance, 10000.0)
         self.assertIsNone(self.backtester.position)
         self.assertEqual(len(self.backtester.trades), 0)
+        
+    def test_run_vectorized_matches_run(self):
+        """Test vectorized backtest produces the same results as run."""
+        ohlcv_data = make_ohlcv(600)
+        expected = run_async_test(self.backtester.run(
+            SimpleMovingAverage(short_window=5, long_window=20), ohlcv_data, trade_amount=0.5
+        ))
+        vectorized = Backtester(initial_balance=10000.0)
+        results = vectorized.run_vectorized(
+            SimpleMovingAverage(short_window=5, long_window=20), ohlcv_data, trade_amount=0.5
+        )
+        self.assertGreater(expected['total_trades'], 0)
+        self.assertEqual(results['total_trades'], expected['total_trades'])
+        self.assertEqual(results['winning_trades'], expected['winning_trades'])
+        self.assertAlmostEqual(results['final_balance'], expected['final_balance'], places=6)
+        self.assertEqual(len(results['trades']), len(expected['trades']))
+        for actual, trade in zip(results['trades'], expected['trades']):
+            self.assertEqual(actual['action'], trade['action'])
+            self.assertEqual(actual['timestamp'], trade['timestamp'])
+            self.assertAlmostEqual(actual['price'], trade['price'])
+        np.testing.assert_allclose(vectorized.equity_curve, self.backtester.equity_curve)
+        np.testing.assert_allclose(vectorized.position_curve, self.backtester.position_curve)
+        for key in ('sharpe_ratio', 'sortino_ratio', 'max_drawdown', 'exposure', 'turnover'):
+            self.assertAlmostEqual(results[key], expected[key], places=6)
+
+
+class TestAnalytics(unittest.TestCase):
+    """Test the trade ledger and performance analytics."""
+    
+    def test_ledger_grows_and_returns_trade_dicts(self):
+        """Test appends past the capacity keep every trade."""
+        ledger = TradeLedger(capacity=2)
+        for i in range(5):
+            ledger.record(i * 60000, BUY, 100.0 + i, 1.0, 900.0)
+            ledger.record(i * 60000 + 30000, SELL, 101.0 + i, 1.0, 1001.0, 1.0)
+        self.assertEqual(len(ledger), 10)
+        self.assertEqual(ledger[0]['action'], 'buy')
+        self.assertNotIn('profit', ledger[0])
+        self.assertEqual(ledger[-1]['profit'], 1.0)
+        self.assertEqual(str(ledger[-1]['timestamp']), '1970-01-01 00:04:30')
+        np.testing.assert_array_equal(ledger.realized_profits, np.ones(5))
+        self.assertEqual(list(ledger.to_dataframe()['action'][:2]), ['buy', 'sell'])
+        with self.assertRaises(ValueError):
+            ledger.price[0] = 0.0
+        
+    def test_metrics_on_known_curve(self):
+        """Test drawdown and ratios on a hand-checked equity curve."""
+        equity = np.array([100.0, 110.0, 99.0, 121.0, 110.0])
+        self.assertAlmostEqual(max_drawdown(equity), 0.1)
+        returns = np.diff(equity) / equity[:-1]
+        self.assertAlmostEqual(sharpe_ratio(returns, 4), returns.mean() / returns.std(ddof=1) * 2)
+        downside = np.sqrt(np.mean(np.minimum(returns, 0) ** 2))
+        self.assertAlmostEqual(sortino_ratio(returns, 4), returns.mean() / downside * 2)
+        self.assertEqual(sharpe_ratio(np.zeros(10), 365), 0.0)
+        
+    def test_million_trade_metrics_are_fast(self):
+        """Test metrics over a million trades stay in milliseconds."""
+        n = 1_000_000
+        rng = np.random.default_rng(0)
+        ledger = TradeLedger()
+        ledger.extend(np.arange(n, dtype=np.int64), np.tile(np.array([BUY, SELL], dtype=np.int8), n // 2),
+                      rng.uniform(90, 110, n), np.ones(n), np.full(n, 1000.0),
+                      np.where(np.arange(n) % 2, rng.normal(0, 1, n), np.nan))
+        equity = 1000.0 + np.cumsum(rng.normal(0, 1, n))
+        started = time.perf_counter()
+        metrics = performance_metrics(equity, np.arange(n) % 2, ledger, 525600)
+        self.assertEqual(len(ledger.realized_profits), n // 2)
+        self.assertLess(time.perf_counter() - started, 0.5)
+        self.assertAlmostEqual(metrics['exposure'], 50.0)
+
+
+class TestFillModel(unittest.TestCase):
+    """Test fees, slippage and limit order fills."""
+    
+    def test_fees_and_slippage_match_between_run_modes(self):
+        """Test run and run_vectorized agree on market fills with costs."""
+        candles = synthetic_ohlcv(3000, volatility=0.01)
+        model = FillModel(taker_fee=0.001, slippage=0.0005)
+        backtester = Backtester(fill_model=model)
+        expected = run_async_test(backtester.run(SimpleMovingAverage(), candles))
+        vectorized = Backtester(fill_model=model)
+        results = vectorized.run_vectorized(SimpleMovingAverage(), candles)
+        free = Backtester().run_vectorized(SimpleMovingAverage(), candles)
+        
+        self.assertAlmostEqual(results['final_balance'], expected['final_balance'], places=6)
+        self.assertAlmostEqual(results['fees_paid'], expected['fees_paid'], places=6)
+        self.assertGreater(results['fees_paid'], 0)
+        self.assertLess(results['final_balance'], free['final_balance'])
+        self.assertEqual(free['fees_paid'], 0)
+        np.testing.assert_allclose(vectorized.equity_curve, backtester.equity_curve)
+        first_buy = np.searchsorted(candles.timestamp, vectorized.trades.timestamp[0])
+        self.assertAlmostEqual(vectorized.trades.price[0], candles.close[first_buy] * 1.0005)
+        
+    def test_limit_orders_fill_when_price_crosses(self):
+        """Test bulk matching finds the first bar reaching each limit price."""
+        candles = synthetic_ohlcv(5000, volatility=0.005)
+        model = FillModel(order_type='limit')
+        rng = np.random.default_rng(1)
+        placed = np.sort(rng.choice(4900, 300, replace=False))
+        deadline = placed + rng.integers(0, 200, 300)
+        for side, reach in ((BUY, candles.low), (SELL, candles.high)):
+            limit = candles.close[placed] * (1 - 0.004 * side)
+            bars, prices = model.match_limit_orders(candles, placed, side, limit, deadline)
+            for order in range(len(placed)):
+                window = np.arange(placed[order] + 1, min(deadline[order], len(candles) - 1) + 1)
+                crossed = window[side * (limit[order] - reach[window]) >= 0]
+                self.assertEqual(bars[order], crossed[0] if len(crossed) else -1)
+            filled = bars >= 0
+            self.assertTrue(filled.any() and not filled.all())
+            self.assertTrue(np.all(side * (limit[filled] - prices[filled]) >= 0))
+        
+    def test_limit_backtest_charges_maker_fees(self):
+        """Test limit entries fill after the signal and pay the maker fee."""
+        candles = synthetic_ohlcv(5000, volatility=0.005)
+        model = FillModel(maker_fee=0.0002, taker_fee=0.001, order_type='limit',
+                          limit_offset=0.002, limit_timeout=10)
+        backtester = Backtester(fill_model=model)
+        results = backtester.run_vectorized(SimpleMovingAverage(), candles)
+        market = Backtester().run_vectorized(SimpleMovingAverage(), candles)
+        self.assertGreater(results['total_trades'], 0)
+        self.assertLessEqual(results['total_trades'], market['total_trades'])
+        buys = backtester.trades.side == BUY
+        np.testing.assert_allclose(
+            backtester.trades.fee[buys],
+            backtester.trades.price[buys] * backtester.trades.size[buys] * 0.0002)
+        with self.assertRaises(ValueError):
+            run_async_test(backtester.run(SimpleMovingAverage(), candles))
+
+
+class TestPortfolioBacktester(unittest.TestCase):
+    """Test multi-asset portfolio backtesting."""
+    
+    def test_single_symbol_matches_backtester(self):
+        """Test one symbol with a fixed weight reproduces Backtester.run_vectorized."""
+        candles = synthetic_ohlcv(3000, volatility=0.01)
+        backtester = Backtester()
+        expected = backtester.run_vectorized(SimpleMovingAverage(), candles, trade_amount=0.3)
+        portfolio = PortfolioBacktester()
+        results = portfolio.run(SimpleMovingAverage(), {'BTC/USDT': candles}, weights={'BTC/USDT': 0.3})
+        self.assertGreater(expected['total_trades'], 0)
+        self.assertEqual(results['total_trades'], expected['total_trades'])
+        self.assertAlmostEqual(results['final_balance'], expected['final_balance'], places=6)
+        np.testing.assert_allclose(portfolio.equity_curve, backtester.equity_curve)
+        for actual, trade in zip(portfolio.trades['BTC/USDT'], backtester.trades):
+            self.assertEqual(actual['timestamp'], trade['timestamp'])
+            self.assertAlmostEqual(actual['size'], trade['size'])
+        
+    def test_aligned_symbols_share_capital(self):
+        """Test symbols with gaps trade on their own candles from one cash balance."""
+        full = synthetic_ohlcv(2000, seed=1, volatility=0.01)
+        sparse = synthetic_ohlcv(2000, seed=2, volatility=0.01)
+        keep = np.ones(2000, dtype=bool)
+        keep[500:700] = False
+        keep[:100] = False
+        sparse = OHLCVBuffer.from_arrays(*(column[keep] for column in (
+            sparse.timestamp, sparse.open, sparse.high, sparse.low, sparse.close, sparse.volume)))
+        
+        timestamps, closes, available = align_closes({'A': full, 'B': sparse})
+        np.testing.assert_array_equal(timestamps, full.timestamp)
+        np.testing.assert_array_equal(available[:, 1], keep)
+        
+        portfolio = PortfolioBacktester()
+        results = portfolio.run(SimpleMovingAverage(short_window=5, long_window=20), {'A': full, 'B': sparse},
+                                weights={'A': 0.7, 'B': 0.7})
+        self.assertEqual(len(portfolio.equity_curve), 2000)
+        self.assertAlmostEqual(portfolio.equity_curve[-1], results['final_balance'])
+        self.assertLessEqual(portfolio.invested_curve.max(), 1.0 + 1e-9)
+        self.assertEqual(results['total_trades'], results['assets']['total_trades'].sum())
+        for symbol in ('A', 'B'):
+            ledger = portfolio.trades[symbol]
+            self.assertGreater(len(ledger), 0)
+            self.assertGreaterEqual(ledger.balance.min(), -1e-9)
+        # No fills while B has no candles
+        gap = (ledger.timestamp >= full.timestamp[500]) & (ledger.timestamp < full.timestamp[700])
+        self.assertFalse(gap.any())
+
+
+class TestParameterSweep(unittest.TestCase):
+    """Test process-pool parameter sweep."""
+    
+    def test_parameter_grid(self):
+        """Test grid expansion covers every combination."""
+        grid = parameter_grid({'short_window': [5, 10], 'long_window': [20, 30, 40]})
+        self.assertEqual(len(grid), 6)
+        self.assertIn({'short_window': 10, 'long_window': 40}, grid)
+        
+    def test_sweep_matches_single_backtests(self):
+        """Test ranked sweep results match individual backtests."""
+        ohlcv_data = make_ohlcv(400)
+        sweep = ParameterSweep(
+            SimpleMovingAverage,
+            {'short_window': [3, 5, 8], 'long_window': [15, 25]},
+            trade_amount=0.5,
+            max_workers=2
+        )
+        progress = []
+        table = sweep.run(ohlcv_data, progress=lambda done, total: progress.append((done, total)))
+        
+        self.assertEqual(len(table), 6)
+        self.assertEqual(progress[-1], (6, 6))
+        self.assertTrue(table['return_percentage'].is_monotonic_decreasing)
+        best = table.iloc[0]
+        expected = Backtester(initial_balance=10000.0).run_vectorized(
+            SimpleMovingAverage(int(best['short_window']), int(best['long_window'])),
+            ohlcv_data, trade_amount=0.5
+        )
+        self.assertAlmostEqual(best['final_balance'], expected['final_balance'])
+
+    def test_failing_combination_cancels_the_rest(self):
+        """Test an error in one backtest is raised without running the queued combinations."""
+        with tempfile.TemporaryDirectory() as root:
+            cache = ResultCache(root)
+            sweep = ParameterSweep(SimpleMovingAverage, {'short_window': [0, 3, 5, 8], 'long_window': range(15, 55)},
+                                   trade_amount=0.5, max_workers=1, cache=cache)
+            with self.assertRaisesRegex(ValueError, 'window must be positive'):
+                sweep.run(make_ohlcv(400))
+            self.assertLess(len(list(cache._entries())), 10)
+
+    def test_moving_averages_reject_non_positive_windows(self):
+        """Test a zero or negative window is rejected instead of producing shifted averages."""
+        closes = np.arange(1.0, 11.0)
+        np.testing.assert_allclose(moving_averages(closes, [1, 3])[1, 2:], np.arange(2.0, 10.0))
+        for window in (0, -2):
+            with self.assertRaisesRegex(ValueError, 'window must be positive'):
+                moving_averages(closes, [3, window])
+
+    def test_sma_grid_matches_backtests(self):
+        """Test batched SMA grid evaluation matches individual backtests."""
+        ohlcv_data = make_ohlcv(500)
+        grid = evaluate_sma_grid(ohlcv_data, [3, 5, 8, 20], [10, 20, 35],
+                                 trade_amount=0.5, chunk_size=4)
+        self.assertTrue(np.isnan(grid['final_balance'].loc[20, 10]))
+        for short_window in [3, 5, 8]:
+            for long_window in [10, 20, 35]:
+                expected = Backtester(initial_balance=10000.0).run_vectorized(
+                    SimpleMovingAverage(short_window, long_window), ohlcv_data, trade_amount=0.5
+                )
+                self.assertEqual(grid['total_trades'].loc[short_window, long_window], expected['total_trades'])
+                self.assertAlmostEqual(grid['final_balance'].loc[short_window, long_window],
+                                       expected['final_balance'], places=6)
+                self.assertAlmostEqual(grid['win_rate'].loc[short_window, long_window], expected['win_rate'])
+
+
+class TestWalkForward(unittest.TestCase):
+    """Test walk-forward optimization."""
+    
+    def test_rolling_and_anchored_folds(self):
+        """Test folds cover consecutive complete test windows."""
+        self.assertEqual(walk_forward_folds(100, 40, 20), [(0, 40, 40, 60), (20, 60, 60, 80), (40, 80, 80, 100)])
+        self.assertEqual(walk_forward_folds(100, 40, 20, step=30, anchored=True), [(0, 40, 40, 60), (0, 70, 70, 90)])
+        self.assertEqual(walk_forward_folds(50, 40, 20), [])
+        
+    def test_parallel_folds_match_serial_evaluation(self):
+        """Test each fold picks the in-sample best and chains out-of-sample returns."""
+        candles = OHLCVBuffer.from_ohlcv(make_ohlcv(1000))
+        param_grid = {'short_window': [3, 5, 8], 'long_window': [15, 25]}
+        engine = WalkForward(SimpleMovingAverage, param_grid, train_size=400, test_size=200,
+                             trade_amount=0.5, max_workers=2)
+        summary = engine.run(candles)
+        
+        folds = summary['folds']
+        self.assertEqual(len(folds), 3)
+        growth = 1.0
+        for row, fold in zip(folds.itertuples(), walk_forward_folds(1000, 400, 200)):
+            expected = evaluate_fold(SimpleMovingAverage, parameter_grid(param_grid), candles, fold,
+                                     10000.0, 0.5, 'return_percentage')
+            self.assertEqual((row.short_window, row.long_window),
+                             (expected['params']['short_window'], expected['params']['long_window']))
+            self.assertAlmostEqual(row.return_percentage, expected['out_of_sample']['return_percentage'])
+            growth *= 1 + row.return_percentage / 100
+        self.assertAlmostEqual(summary['return_percentage'], (growth - 1) * 100)
+        self.assertEqual(len(engine.equity_curve), 600)
+        self.assertAlmostEqual(engine.equity_curve[-1], summary['final_balance'])
+        self.assertEqual(summary['total_trades'], folds['total_trades'].sum())
+
+    def test_failing_backtest_cancels_the_other_folds(self):
+        """Test an error in one training backtest is raised without running the remaining folds."""
+        with tempfile.TemporaryDirectory() as root:
+            cache = ResultCache(root)
+            engine = WalkForward(SimpleMovingAverage, {'short_window': [0, 3, 5], 'long_window': range(15, 55)},
+                                 train_size=400, test_size=200, trade_amount=0.5, max_workers=1, cache=cache)
+            with self.assertRaisesRegex(ValueError, 'window must be positive'):
+                engine.run(make_ohlcv(1000))
+            self.assertLess(len(list(cache._entries())), 10)
+
+    def test_test_windows_are_warmed_up_on_the_training_window(self):
+        """Test a test window trades on a signal in its first candles and counts only its own bars."""
+        candles = OHLCVBuffer.from_ohlcv(make_ohlcv(1000))
+        signals = SimpleMovingAverage(3, 25).generate_signals(candles)
+        buy = 100 + int(np.flatnonzero(signals[100:] > 0)[0])
+        fold = (buy - 100, buy - 5, buy - 5, buy + 95)
+
+        outcome = evaluate_fold(SimpleMovingAverage, [{'short_window': 3, 'long_window': 25}], candles, fold,
+                                10000.0, 0.5, 'return_percentage')
+        self.assertEqual(len(outcome['equity_curve']), 100)
+        self.assertEqual(outcome['equity_curve'][0], 10000.0)
+
+        window = candles[fold[0]:fold[3]]
+        vectorized = Backtester().run_vectorized(SimpleMovingAverage(3, 25), window, trade_amount=0.5, start=95)
+        looped = asyncio.run(Backtester().run(SimpleMovingAverage(3, 25), window.to_list(), trade_amount=0.5,
+                                              start=95))
+        self.assertEqual(vectorized['trades'].column('timestamp')[0], candles.timestamp[buy])
+        self.assertEqual(len(looped['trades']), len(vectorized['trades']))
+        self.assertAlmostEqual(looped['final_balance'], vectorized['final_balance'])
+        self.assertAlmostEqual(outcome['out_of_sample']['final_balance'], vectorized['final_balance'])
+
+    def test_non_finite_scores_never_win(self):
+        """Test NaN training scores are skipped, falling back to the first combination."""
+        combinations = [{'short_window': 3}, {'short_window': 5}, {'short_window': 8}]
+        params, results = best_combination(combinations, [{'score': np.nan}, {'score': 1.0}, {'score': 0.5}], 'score')
+        self.assertEqual(params, {'short_window': 5})
+        self.assertEqual(results['score'], 1.0)
+        params, _ = best_combination(combinations, [{'score': np.nan}, {'score': np.inf}, {'score': np.nan}], 'score')
+        self.assertEqual(params, {'short_window': 3})
+
+
+class TestResultCache(unittest.TestCase):
+    """Test content-addressed backtest result cache."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.cache = ResultCache(self.tmpdir.name)
+        self.ohlcv_data = make_ohlcv(400)
+
+    def tearDown(self):
+        """Remove cached files."""
+        self.tmpdir.cleanup()
+
+    def test_hit_returns_summary_and_ledger(self):
+        """Test stored results come back intact and every key input changes the key."""
+        results = Backtester(initial_balance=10000.0).run_vectorized(
+            SimpleMovingAverage(3, 15), self.ohlcv_data, trade_amount=0.5
+        )
+        digest = candles_digest(self.ohlcv_data)
+        key = result_key(digest, SimpleMovingAverage, {'short_window': 3, 'long_window': 15}, 10000.0, 0.5)
+        self.assertIsNone(self.cache.get(key))
+        self.cache.put(key, results)
+
+        cached = self.cache.get(key)
+        self.assertEqual({k: v for k, v in cached.items() if k != 'trades'},
+                         {k: v for k, v in results.items() if k != 'trades'})
+        self.assertGreater(len(cached['trades']), 0)
+        self.assertEqual(list(cached['trades']), list(results['trades']))
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+        other_keys = [
+            result_key(candles_digest(self.ohlcv_data[:-1]), SimpleMovingAverage,
+                       {'short_window': 3, 'long_window': 15}, 10000.0, 0.5),
+            result_key(digest, SimpleMovingAverage, {'short_window': 3, 'long_window': 20}, 10000.0, 0.5),
+            result_key(digest, SimpleMovingAverage, {'short_window': 3, 'long_window': 15}, 5000.0, 0.5),
+            result_key(digest, SimpleMovingAverage, {'short_window': 3, 'long_window': 15}, 10000.0, 0.25),
+            result_key(digest, SimpleMovingAverage, {'short_window': 3, 'long_window': 15}, 10000.0, 0.5,
+                       FillModel(taker_fee=0.001)),
+        ]
+        with patch.object(SimpleMovingAverage, 'version', 2):
+            other_keys.append(result_key(digest, SimpleMovingAverage,
+                                         {'short_window': 3, 'long_window': 15}, 10000.0, 0.5))
+        self.assertNotIn(key, other_keys)
+        self.assertEqual(len(set(other_keys)), len(other_keys))
+
+    def test_sweeps_only_run_uncached_combinations(self):
+        """Test repeated and overlapping sweeps reuse cached backtests."""
+        grid = {'short_window': [3, 5], 'long_window': [15, 25]}
+        first = ParameterSweep(SimpleMovingAverage, grid, trade_amount=0.5, max_workers=2,
+                               cache=self.cache).run(self.ohlcv_data)
+
+        # Nothing left to run, so no worker pool is started
+        with patch('src.optimization.ProcessPoolExecutor', side_effect=AssertionError):
+            second = ParameterSweep(SimpleMovingAverage, grid, trade_amount=0.5,
+                                    cache=self.cache).run(self.ohlcv_data)
+        self.assertEqual(second.to_dict('records'), first.to_dict('records'))
+        self.assertEqual(self.cache.hits, 4)
+
+        overlapping = ParameterSweep(SimpleMovingAverage, {'short_window': [3, 5, 8], 'long_window': [15, 25]},
+                                     trade_amount=0.5, max_workers=2, cache=self.cache).run(self.ohlcv_data)
+        self.assertEqual(len(overlapping), 6)
+        self.assertEqual(self.cache.hits, 8)
+        best = overlapping.iloc[0]
+        expected = run_backtest(SimpleMovingAverage, {'short_window': int(best['short_window']),
+                                                      'long_window': int(best['long_window'])},
+                                self.ohlcv_data, 10000.0, 0.5)
+        self.assertAlmostEqual(best['final_balance'], expected['final_balance'])
+
+    def test_fee_bearing_sweeps_miss_fee_free_results(self):
+        """Test the fill model is part of what a sweep looks up in the cache."""
+        grid = {'short_window': [3], 'long_window': [15]}
+        ParameterSweep(SimpleMovingAverage, grid, trade_amount=0.5, max_workers=1,
+                       cache=self.cache).run(self.ohlcv_data)
+        fills = FillModel(taker_fee=0.01)
+        with_fees = ParameterSweep(SimpleMovingAverage, grid, trade_amount=0.5, max_workers=1,
+                                   cache=self.cache, fill_model=fills).run(self.ohlcv_data)
+
+        self.assertEqual(self.cache.hits, 0)
+        expected = Backtester(initial_balance=10000.0, fill_model=fills).run_vectorized(
+            SimpleMovingAverage(3, 15), self.ohlcv_data, trade_amount=0.5
+        )
+        self.assertAlmostEqual(with_fees['final_balance'][0], expected['final_balance'])
+
+    def test_evicts_least_recently_used_entries(self):
+        """Test the cache stays within its size by dropping the entries read longest ago."""
+        results = Backtester(initial_balance=10000.0).run_vectorized(
+            SimpleMovingAverage(3, 15), self.ohlcv_data, trade_amount=0.5
+        )
+        keys = [f"{i:02x}" * 20 for i in range(3)]
+        self.cache.put(keys[0], results)
+        self.cache.put(keys[1], results)
+        entry_size = self.cache.path(keys[0]).stat().st_size
+        for age, key in enumerate(keys[:2]):
+            os.utime(self.cache.path(key), (1000 + age, 1000 + age))
+
+        # Reading the oldest entry makes the second one least recently used
+        self.assertIsNotNone(self.cache.get(keys[0]))
+        self.cache.max_bytes = 2 * entry_size + entry_size // 2
+        self.cache.put(keys[2], results)
+
+        self.assertIsNotNone(self.cache.get(keys[0]))
+        self.assertIsNone(self.cache.get(keys[1]))
+        self.assertIsNotNone(self.cache.get(keys[2]))
+        self.assertLessEqual(self.cache.size(), self.cache.max_bytes)
+
+    def test_overwriting_an_entry_keeps_the_size_count(self):
+        """Test storing a key twice counts only the newest entry."""
+        results = Backtester(initial_balance=10000.0).run_vectorized(
+            SimpleMovingAverage(3, 15), self.ohlcv_data, trade_amount=0.5
+        )
+        key = "ab" * 20
+        for _ in range(3):
+            self.cache.put(key, results)
+        self.assertEqual(self.cache._size, self.cache.size())
+
+
+class TestTradingBot(unittest.TestCase):
+    """Test live trading loop."""
+    
+    def test_trading_loop_feeds_new_closed_candles(self):
+        """Test each closed candle reaches the strategy exactly once."""
+        ohlcv_data = make_ohlcv(60, start=0)
+        clock = FakeClock(49.5 * 60)
+        strategy = SimpleMovingAverage(short_window=5, long_window=10)
+        strategy.on_candle = AsyncMock(return_value='hold')
+        bot = TradingBot({'name': 'binance'}, {'symbol': 'BTC/USDT'}, strategy, clock=clock)
+        bot.exchange.fetch_ohlcv = AsyncMock(side_effect=[ohlcv_data[:50], ohlcv_data[49:50], ohlcv_data[49:]])
+        
+        for now in (49.5, 49.8, 59.5):
+            clock.now = now * 60
+            run_async_test(bot._trading_loop())
+        
+        fed = [call.args[0] for call in strategy.on_candle.await_args_list]
+        self.assertEqual(fed, ohlcv_data[:-1])
+        # Later cycles only ask for candles since the last one received
+        self.assertIsNone(bot.exchange.fetch_ohlcv.await_args_list[0].kwargs['since'])
+        self.assertEqual(bot.exchange.fetch_ohlcv.await_args_list[2].kwargs['since'], ohlcv_data[49][0])
+        
+    def test_failed_evaluation_does_not_refeed_candles(self):
+        """Test a strategy error resumes after the failing candle instead of refeeding the batch."""
+        ohlcv_data = make_ohlcv(60, start=0)
+        clock = FakeClock(49.5 * 60)
+        strategy = SimpleMovingAverage(short_window=5, long_window=10)
+        
+        async def on_candle(candle):
+            if candle[0] == ohlcv_data[40][0]:
+                raise RuntimeError("strategy failed")
+            return 'hold'
+        
+        strategy.on_candle = AsyncMock(side_effect=on_candle)
+        bot = TradingBot({'name': 'binance'}, {'symbol': 'BTC/USDT'}, strategy, clock=clock)
+        bot.exchange.fetch_ohlcv = AsyncMock(side_effect=[ohlcv_data[:50], ohlcv_data[49:]])
+        
+        run_async_test(bot._trading_loop())
+        self.assertEqual(bot.markets[0].last_candle_timestamp, ohlcv_data[40][0])
+        clock.now = 59.5 * 60
+        run_async_test(bot._trading_loop())
+        
+        fed = [call.args[0] for call in strategy.on_candle.await_args_list]
+        self.assertEqual(fed, ohlcv_data[:59])
+        
+    def test_markets_share_fetches_and_slow_symbol_times_out(self):
+        """Test one fetch per symbol per cycle and isolation from slow symbols."""
+        exchange = FakeExchange(make_ohlcv(50), delays={'SLOW/USDT': 1.0})
+        bot = TradingBot({'name': 'binance'}, {'fetch_timeout': 0.05},
+                         exchange=make_connector(exchange))
+        strategies = [SimpleMovingAverage(5, 10), SimpleMovingAverage(3, 20), SimpleMovingAverage(5, 10)]
+        bot.add_market('BTC/USDT', '1m', strategies[0])
+        bot.add_market('BTC/USDT', '1m', strategies[1])
+        bot.add_market('SLOW/USDT', '1m', strategies[2])
+        
+        run_async_test(bot._trading_loop())
+        
+        self.assertEqual(sorted(call['symbol'] for call in exchange.calls), ['BTC/USDT', 'SLOW/USDT'])
+        self.assertEqual(bot.markets[0].last_candle_timestamp, exchange.candles[-1][0])
+        self.assertEqual(bot.markets[1].last_candle_timestamp, exchange.candles[-1][0])
+        self.assertIsNone(bot.markets[2].last_candle_timestamp)
+        self.assertEqual(len(bot.get_candles('BTC/USDT', '1m')), 50)
+
+
+class TestStrategyExecutor(unittest.TestCase):
+    """Test strategy evaluation inline, on threads and in worker processes."""
+    
+    def feed_in_batches(self, executor, strategy, candles, kill_worker_at=None):
+        """Feed candles in uneven batches, setting positions like the bot does."""
+        signals = []
+        
+        async def run():
+            try:
+                bounds = [0, 37, 38] + list(range(40, len(candles) + 1, 3))
+                for start, stop in zip(bounds, bounds[1:]):
+                    if start == kill_worker_at:
+                        for pid in list(executor._workers[0]._processes):
+                            os.kill(pid, signal_module.SIGKILL)
+                    signal, durations = await executor.evaluate(strategy, candles[start:stop], candles[:stop])
+                    self.assertEqual(len(durations), stop - start)
+                    signals.append(signal)
+                    if signal == 'buy':
+                        strategy.set_position('long', candles.close[stop - 1])
+                    elif signal == 'sell':
+                        strategy.set_position(None)
+            finally:
+                executor.close()
+        
+        run_async_test(run())
+        return signals
+    
+    def test_modes_give_the_same_signals(self):
+        """Test thread and process workers keep strategy state between calls."""
+        candles = OHLCVBuffer.from_ohlcv(make_ohlcv(300))
+        
+        def make_strategy():
+            strategy = SimpleMovingAverage(short_window=3, long_window=7)
+            strategy.bind('BTC/USDT', '1m', IndicatorRegistry())
+            return strategy
+        
+        expected = self.feed_in_batches(StrategyExecutor('inline'), make_strategy(), candles)
+        self.assertIn('buy', expected)
+        for mode in ('thread', 'process'):
+            with self.subTest(mode=mode):
+                self.assertEqual(self.feed_in_batches(StrategyExecutor(mode, 2), make_strategy(), candles), expected)
+        
+    def test_dead_workers_are_replaced_and_strategies_rebuilt(self):
+        """Test a killed worker process is replaced and the strategy resumes from its history."""
+        candles = OHLCVBuffer.from_ohlcv(make_ohlcv(300))
+        
+        def make_strategy():
+            strategy = SimpleMovingAverage(short_window=3, long_window=7)
+            strategy.bind('BTC/USDT', '1m', IndicatorRegistry())
+            return strategy
+        
+        expected = self.feed_in_batches(StrategyExecutor('inline'), make_strategy(), candles)
+        executor = StrategyExecutor('process', 1)
+        self.assertEqual(self.feed_in_batches(executor, make_strategy(), candles, kill_worker_at=100), expected)
+    
+    def test_threads_serve_one_market_each(self):
+        """Test strategies sharing indicator series are never fed on two threads at once."""
+        candles = OHLCVBuffer.from_ohlcv(make_ohlcv(300))
+
+        threads = {}
+
+        class RecordingStrategy(SimpleMovingAverage):
+            async def on_candle(self, candle):
+                threads.setdefault(self.symbol, set()).add(threading.current_thread().name)
+                return await super().on_candle(candle)
+
+        def make_strategies(registry):
+            strategies = []
+            for symbol in ('BTC/USDT', 'BTC/USDT', 'ETH/USDT'):
+                strategy = RecordingStrategy(short_window=3, long_window=7)
+                strategy.bind(symbol, '1m', registry)
+                strategies.append(strategy)
+            return strategies
+
+        async def feed(executor, strategies):
+            signals = []
+            try:
+                for start in range(0, len(candles), 20):
+                    batch = candles[start:start + 20]
+                    results = await asyncio.gather(*(executor.evaluate(s, batch) for s in strategies))
+                    signals.append([signal for signal, _ in results])
+            finally:
+                executor.close()
+            return signals
+
+        expected = run_async_test(feed(StrategyExecutor('inline'), make_strategies(IndicatorRegistry())))
+        threads.clear()
+        self.assertEqual(run_async_test(feed(StrategyExecutor('thread', 4), make_strategies(IndicatorRegistry()))), expected)
+        self.assertEqual(threads, {'BTC/USDT': {'strategy-0_0'}, 'ETH/USDT': {'strategy-1_0'}})
+
+    def test_rejects_unknown_mode(self):
+        """Test unsupported modes are rejected."""
+        with self.assertRaises(ValueError):
+            StrategyExecutor('gpu')
+    
+    def test_loop_lag_monitor_sees_blocking_code(self):
+        """Test a blocking call shows up as event loop lag."""
+        monitor = LoopLagMonitor(MetricsRegistry().histogram('lag', 'Lag'), interval=0.01, warning=10.0)
+        
+        async def run():
+            monitor.start()
+            await asyncio.sleep(0.02)
+            time.sleep(0.1)
+            await asyncio.sleep(0.02)
+            await monitor.stop()
+        
+        run_async_test(run())
+        self.assertGreater(monitor.max_lag, 0.05)
+        self.assertGreater(monitor.histogram.count(), 1)
+
+
+class TestCandleScheduler(unittest.TestCase):
+    """Test candle-close-aligned scheduling."""
+    
+    def test_wakes_after_each_close(self):
+        """Test waits end just after consecutive candle closes."""
+        clock = FakeClock(1000.5)
+        scheduler = CandleScheduler('1m', grace=1.0, clock=clock)
+        
+        self.assertEqual(run_async_test(scheduler.wait()), 1020000)
+        self.assertEqual(clock.now, 1021.0)
+        clock.now += 5
+        self.assertEqual(run_async_test(scheduler.wait()), 1080000)
+        self.assertEqual(clock.now, 1081.0)
+        self.assertEqual(scheduler.missed_cycles, 0)
+        
+    def test_reports_missed_cycles(self):
+        """Test closes that pass during a long cycle are counted as missed."""
+        clock = FakeClock(1000.5)
+        scheduler = CandleScheduler('1m', grace=1.0, clock=clock)
+        run_async_test(scheduler.wait())
+        
+        clock.now += 150
+        self.assertEqual(run_async_test(scheduler.wait()), 1140000)
+        self.assertEqual(scheduler.missed_cycles, 1)
+        self.assertAlmostEqual(scheduler.last_drift, 30.0)
+
+
+class TestMarketDataStream(unittest.TestCase):
+    """Test push-based market data streaming."""
+    
+    def test_stream_delivers_closed_candles_and_reconnects(self):
+        """Test streamed candles are deduplicated, gaps backfilled and reconnects resumed."""
+        ohlcv_data = make_ohlcv(10, start=0)
+        key = ('BTC/USDT', '1m')
+        
+        async def scenario():
+            server = StreamServer()
+            await server.start()
+            try:
+                connector = make_connector(FakeExchange(ohlcv_data), {'name': 'binance', 'stream_url': server.url})
+                stream = connector.stream_market_data([key], ['BTC/USDT'], last_timestamps={key: ohlcv_data[4][0]},
+                                                      clock=FakeClock(0))
+                updates = []
+                
+                async def consume():
+                    async for update in stream:
+                        updates.append(update)
+                
+                task = asyncio.ensure_future(consume())
+                await server.wait_for_clients()
+                await server.publish_candle(*key, ohlcv_data[9], closed=False)
+                await server.publish_ticker('BTC/USDT', {'last': 123.0})
+                await server.publish_candle(*key, ohlcv_data[8])
+                await server.publish_candle(*key, ohlcv_data[8])
+                await wait_until(lambda: len(updates) >= 5)
+                
+                await server.disconnect_all()
+                await wait_until(lambda: stream.reconnects >= 1)
+                await server.wait_for_clients()
+                await server.publish_candle(*key, ohlcv_data[9])
+                await wait_until(lambda: len(updates) >= 6)
+                task.cancel()
+                return updates
+            finally:
+                await server.stop()
+        
+        updates = run_async_test(scenario())
+        self.assertEqual(updates[0], {'type': 'ticker', 'symbol': 'BTC/USDT', 'ticker': {'last': 123.0}})
+        candles = [update['candle'] for update in updates if update['type'] == 'candle']
+        self.assertEqual(candles, ohlcv_data[5:10])
+        
+    def test_falls_back_to_polling(self):
+        """Test closed candles are polled when the stream cannot be reached."""
+        ohlcv_data = make_ohlcv(20, start=0)
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            url = f"ws://127.0.0.1:{sock.getsockname()[1]}/ws"
+        connector = make_connector(FakeExchange(ohlcv_data), {
+            'name': 'binance', 'stream_url': url, 'stream_max_failures': 2
+        })
+        stream = connector.stream_market_data([('BTC/USDT', '1m')], ['BTC/USDT'], clock=FakeClock(10.5 * 60))
+        
+        async def collect():
+            candles = []
+            async for update in stream:
+                if update['type'] == 'candle':
+                    candles.append(update['candle'])
+                if len(candles) == 12:
+                    return candles
+        
+        self.assertEqual(run_async_test(collect()), ohlcv_data[:12])
+        self.assertEqual(stream.mode, 'poll')
+        
+    def test_malformed_messages_are_skipped(self):
+        """Test frames that are not valid updates are dropped without ending the stream."""
+        ohlcv_data = make_ohlcv(10, start=0)
+        key = ('BTC/USDT', '1m')
+
+        async def scenario():
+            server = StreamServer()
+            await server.start()
+            try:
+                connector = make_connector(FakeExchange(ohlcv_data), {'name': 'binance', 'stream_url': server.url})
+                stream = connector.stream_market_data([key], ['BTC/USDT'], last_timestamps={key: ohlcv_data[7][0]},
+                                                      clock=FakeClock(0))
+                updates = []
+
+                async def consume():
+                    async for update in stream:
+                        updates.append(update)
+
+                task = asyncio.ensure_future(consume())
+                await server.wait_for_clients()
+                await server.publish_raw('{"type": "candle", truncated')
+                await server.publish_raw('[1, 2, 3]')
+                await server.publish_raw('{"type": "candle", "symbol": "BTC/USDT", "timeframe": "1m", "candle": [1, 2]}')
+                await server.publish_raw('{"type": "ticker", "symbol": ["BTC/USDT"], "ticker": {}}')
+                await server.publish_candle(*key, ohlcv_data[8])
+                await wait_until(lambda: len(updates) >= 1)
+                task.cancel()
+                return stream, updates
+            finally:
+                await server.stop()
+
+        stream, updates = run_async_test(scenario())
+        self.assertEqual([update['candle'] for update in updates], [ohlcv_data[8]])
+        self.assertEqual(stream.reconnects, 0)
+
+    def test_bot_reacts_to_streamed_candles(self):
+        """Test the bot feeds each pushed candle to its strategy as it arrives."""
+        ohlcv_data = make_ohlcv(20, start=0)
+        strategy = SimpleMovingAverage(short_window=5, long_window=10)
+        strategy.on_candle = AsyncMock(return_value='hold')
+        
+        async def scenario():
+            server = StreamServer()
+            await server.start()
+            try:
+                connector = make_connector(FakeExchange(ohlcv_data), {'name': 'binance', 'stream_url': server.url})
+                bot = TradingBot({}, {'symbol': 'BTC/USDT', 'data_mode': 'stream'}, strategy,
+                                 exchange=connector, clock=FakeClock(10.5 * 60))
+                task = asyncio.ensure_future(bot.start())
+                await server.wait_for_clients()
+                await server.publish_ticker('BTC/USDT', {'last': 123.0})
+                for candle in ohlcv_data[10:12]:
+                    await server.publish_candle('BTC/USDT', '1m', candle)
+                await wait_until(lambda: bot.markets[0].last_candle_timestamp == ohlcv_data[11][0])
+                await bot.stop()
+                await task
+                return bot
+            finally:
+                await server.stop()
+        
+        bot = run_async_test(scenario())
+        fed = [call.args[0] for call in strategy.on_candle.await_args_list]
+        self.assertEqual(fed, ohlcv_data[:12])
+        self.assertEqual(run_async_test(bot._current_price('BTC/USDT')), 123.0)
+
+    def test_slow_markets_do_not_hold_up_the_stream(self):
+        """Test updates keep flowing while a market is busy and its candles are processed in order."""
+        ohlcv_data = make_ohlcv(20, start=0)
+        strategy = SimpleMovingAverage(short_window=5, long_window=10)
+        strategy.on_candle = AsyncMock(return_value='hold')
+
+        async def scenario():
+            server = StreamServer()
+            await server.start()
+            try:
+                connector = make_connector(FakeExchange(ohlcv_data), {'name': 'binance', 'stream_url': server.url})
+                bot = TradingBot({}, {'symbol': 'BTC/USDT', 'data_mode': 'stream'}, strategy,
+                                 exchange=connector, clock=FakeClock(10.5 * 60))
+                release = asyncio.Event()
+                started = []
+                process_market = bot._process_market
+
+                async def slow_process_market(market, candles, closed_before):
+                    started.append(closed_before)
+                    if closed_before == ohlcv_data[10][0]:
+                        await release.wait()
+                    await process_market(market, candles, closed_before)
+
+                bot._process_market = slow_process_market
+                task = asyncio.ensure_future(bot.start())
+                await server.wait_for_clients()
+                for candle in ohlcv_data[10:12]:
+                    await server.publish_candle('BTC/USDT', '1m', candle)
+                await server.publish_ticker('BTC/USDT', {'last': 123.0})
+                await wait_until(lambda: 'BTC/USDT' in bot._tickers)
+                # The second candle waits for the first instead of overtaking it
+                self.assertEqual(started[1:], [ohlcv_data[10][0]])
+
+                release.set()
+                await wait_until(lambda: bot.markets[0].last_candle_timestamp == ohlcv_data[11][0])
+                self.assertEqual(started[1:], [ohlcv_data[10][0], ohlcv_data[11][0]])
+                await bot.stop()
+                await task
+            finally:
+                await server.stop()
+
+        run_async_test(scenario())
+        fed = [call.args[0] for call in strategy.on_candle.await_args_list]
+        self.assertEqual(fed, ohlcv_data[:12])
+
+
+class TestReplayExchange(unittest.TestCase):
+    """Test the paper exchange and accelerated replays of the live bot."""
+
+    def test_paper_exchange_hides_the_future_and_fills_orders(self):
+        """Test only past candles are served and orders settle against them."""
+        candles = synthetic_ohlcv(10, timeframe='1m')
+        clock = FakeClock((candles.timestamp[5] + 30000) / 1000)
+        exchange = PaperExchange({('BTC/USDT', '1m'): candles}, clock,
+                                 fill_model=FillModel(taker_fee=0.001, slippage=0.01))
+
+        async def scenario():
+            ohlcv_data = await exchange.fetch_ohlcv('BTC/USDT', '1m', since=candles.timestamp[3])
+            self.assertEqual(ohlcv_data[:2], candles[3:5].to_list())
+            # The forming candle only shows its open
+            self.assertEqual(ohlcv_data[2], [candles[5][0]] + [candles[5][1]] * 4 + [0.0])
+            self.assertEqual((await exchange.fetch_ticker('BTC/USDT'))['last'], candles[5][1])
+
+            order = await exchange.create_market_order('BTC/USDT', 'buy', 2.0)
+            price = candles[5][1] * 1.01
+            self.assertEqual((order['status'], order['average']), ('closed', price))
+            balance = await exchange.fetch_balance()
+            self.assertAlmostEqual(balance['USDT']['free'], 10000.0 - 2 * price * 1.001)
+            self.assertEqual(balance['total']['BTC'], 2.0)
+            with self.assertRaises(ccxt.InsufficientFunds):
+                await exchange.create_market_order('BTC/USDT', 'sell', 3.0)
+
+            # A sell limit above every later high rests until cancelled
+            limit = await exchange.create_limit_order('BTC/USDT', 'sell', 1.0, 1e6)
+            self.assertEqual((await exchange.fetch_balance())['BTC']['used'], 1.0)
+            clock.now += 120
+            self.assertEqual([o['id'] for o in await exchange.fetch_open_orders('BTC/USDT')], [limit['id']])
+            await exchange.cancel_order(limit['id'], 'BTC/USDT')
+            self.assertEqual((await exchange.fetch_balance())['BTC']['used'], 0.0)
+
+            # A buy limit at the next candle's low fills once that candle has closed
+            target = float(candles.low[8])
+            order = await exchange.create_limit_order('BTC/USDT', 'buy', 1.0, target)
+            clock.now = (candles.timestamp[8] + 59000) / 1000
+            self.assertEqual(len(await exchange.fetch_open_orders()), 1)
+            clock.now += 1
+            self.assertEqual(await exchange.fetch_open_orders(), [])
+            filled = exchange.orders[order['id']]
+            self.assertEqual((filled['status'], filled['lastTradeTimestamp']), ('closed', candles[8][0]))
+            self.assertEqual(filled['average'], min(candles[8][1], target))
+            self.assertEqual(len(exchange.trades), 2)
+
+        run_async_test(scenario())
+
+    def test_bot_trades_a_replay_on_a_virtual_clock(self):
+        """Test the unchanged bot trades a fast replay like the backtester trades the candles."""
+        candles = synthetic_ohlcv(150, timeframe='1h', volatility=0.01)
+        # An hour of candles every 18ms
+        connector = ReplayConnector({('BTC/USDT', '1h'): candles}, speed=200000)
+        self.assertIsInstance(connector.clock, VirtualClock)
+        bot = TradingBot({}, {'symbol': 'BTC/USDT', 'timeframe': '1h', 'amount': 1.0,
+                              'loop_lag_interval': 0},
+                         SimpleMovingAverage(3, 8), exchange=connector, clock=connector.clock)
+        report = run_async_test(run_replay(bot))
+
+        self.assertEqual(bot.markets[0].last_candle_timestamp, candles[-1][0])
+        self.assertGreaterEqual(report['cycles'], 49)
+        self.assertGreater(report['speedup'], 10000)
+        self.assertEqual(report['orders'], len(report['trades']))
+        self.assertGreater(report['orders'], 0)
+
+        # Signals from the first live candle on fill at the next candle's open
+        start = connector.clock.start * 1000
+        expected = Backtester().run_vectorized(SimpleMovingAverage(3, 8), candles, trade_amount=0.5)['trades']
+        expected_bars = [int((t - candles[0][0]) // 3600000) + 1 for t in expected.timestamp
+                         if t + 3600000 > start]
+        filled_bars = [int((t - candles[0][0]) // 3600000) for t in report['trades'].timestamp]
+        self.assertEqual(filled_bars[-len(expected_bars):], expected_bars)
+        holding = report['trades'].side[-1] == BUY
+        self.assertEqual(report['balance']['BTC'], 1.0 if holding else 0.0)
 
 
 def run_async_test(coro):